@@ -0,0 +1,221 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Measure the throughput of Dorothy's harvests and sweeps against the local Okta API simulator
+
+"""
+Each scenario executes a module's execute command with click's test runner, answering its prompts, against a fresh
+data store and a synthetic Okta environment served by okta_simulator.py. Throughput is reported as objects and API
+calls per second for each max-workers setting.
+
+Example usage:
+
+    python benchmarks/harvest_benchmark.py --users 5000 --latency 0.02 --workers 1 4 8
+    python benchmarks/harvest_benchmark.py --output baseline.json
+    python benchmarks/harvest_benchmark.py --baseline baseline.json --tolerance 0.2
+
+With --baseline, the exit status is 1 if any scenario's objects per second dropped by more than the tolerance
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Import Dorothy from this repository without installing it
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from click.testing import CliRunner  # noqa: E402
+from tabulate import tabulate  # noqa: E402
+
+from dorothy.cache import ResultCache  # noqa: E402
+from dorothy.config import load_settings  # noqa: E402
+from dorothy.core import OktaOrg, setup_session_instance  # noqa: E402
+from dorothy.events import setup_logging  # noqa: E402
+from dorothy.main import ADMIN_ROLES, LOGS_DIR, POLICY_TYPES, ROOT_DIR, Dorothy  # noqa: E402
+from dorothy.modules.discovery import (  # noqa: E402
+    find_admins,
+    find_users_without_mfa,
+    get_groups,
+    get_policies,
+    get_users,
+)
+from dorothy.store import DataStore  # noqa: E402
+from okta_simulator import OktaSimulator, SyntheticOrg  # noqa: E402
+
+# Name, execute command, answers to the prompts and the number of objects harvested or checked
+SCENARIOS = [
+    ("get-users", get_users.execute, "y\nn\nn\n", lambda obj, org: obj.store.count_objects("users")),
+    ("get-groups", get_groups.execute, "y\nn\nn\n", lambda obj, org: obj.store.count_objects("groups")),
+    ("find-admins", find_admins.execute, "2\ny\nn\n", lambda obj, org: org.users),
+    ("find-users-without-mfa", find_users_without_mfa.execute, "2\ny\nn\nn\n", lambda obj, org: org.users),
+    (
+        "get-policies",
+        get_policies.execute,
+        "y\nn\nn\n",
+        lambda obj, org: obj.store.count_objects("policies") + obj.store.count_objects("rules"),
+    ),
+]
+
+
+def dorothy_object(base_url, data_dir, max_workers):
+    """Create the object that is passed to Dorothy's commands, with the result cache disabled"""
+
+    settings = load_settings({"settings": {"max_workers": max_workers, "cache_max_age": 0}})
+    store = DataStore.for_profile(data_dir, "benchmark")
+
+    return Dorothy(
+        okta=OktaOrg("benchmark-token", base_url),
+        base_url=base_url,
+        api_token="benchmark-token",
+        root_dir=ROOT_DIR,
+        data_dir=data_dir,
+        config_dir=data_dir,
+        admin_roles=ADMIN_ROLES,
+        policy_types=POLICY_TYPES,
+        profile_id="benchmark",
+        session=setup_session_instance(
+            base_url, rate_limit_headroom=settings["rate_limit_headroom"], max_workers=max_workers
+        ),
+        settings=settings,
+        store=store,
+        cache=ResultCache(store, max_age=0),
+        es=None,
+    )
+
+
+def run_scenario(simulator, scenario, max_workers):
+    """Execute a scenario once and return the number of objects, API calls and seconds"""
+
+    name, command, answers, count_objects = scenario
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        obj = dorothy_object(f"{simulator.base_url}/api/v1", Path(data_dir), max_workers)
+        simulator.reset_counters()
+
+        start = time.perf_counter()
+        result = CliRunner().invoke(command, input=answers, obj=obj)
+        elapsed = time.perf_counter() - start
+
+        if result.exception:
+            raise RuntimeError(f"{name} failed: {result.exception!r}\n{result.output}") from result.exception
+        if "[!]" in result.output:
+            raise RuntimeError(f"{name} reported an error:\n{result.output}")
+
+        objects = count_objects(obj, simulator.org)
+        obj.session.close()
+        obj.store.close()
+
+    return objects, simulator.requests, elapsed
+
+
+def run_benchmarks(simulator, scenarios, workers, repeat):
+    results = []
+
+    for scenario in scenarios:
+        for max_workers in workers:
+            runs = [run_scenario(simulator, scenario, max_workers) for _ in range(repeat)]
+            objects, calls, _ = runs[0]
+            elapsed = statistics.median(run[2] for run in runs)
+            results.append(
+                {
+                    "scenario": scenario[0],
+                    "max_workers": max_workers,
+                    "objects": objects,
+                    "calls": calls,
+                    "seconds": round(elapsed, 3),
+                    "objects_per_second": round(objects / elapsed, 1),
+                    "calls_per_second": round(calls / elapsed, 1),
+                }
+            )
+            print(
+                f"{scenario[0]} (max workers {max_workers}): {results[-1]['objects_per_second']} objects/s",
+                file=sys.stderr,
+            )
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the results whose objects per second dropped by more than the tolerance compared to the baseline"""
+
+    previous = {(r["scenario"], r["max_workers"]): r["objects_per_second"] for r in baseline}
+    regressions = []
+
+    for result in results:
+        before = previous.get((result["scenario"], result["max_workers"]))
+        if before and result["objects_per_second"] < before * (1 - tolerance):
+            regressions.append((result["scenario"], result["max_workers"], before, result["objects_per_second"]))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the throughput of Dorothy's harvests and sweeps")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--policies", type=int, default=5, help="Number of policies of each type")
+    parser.add_argument("--latency", type=float, default=0.01, help="Seconds added to each simulated response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum random seconds added to each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected 429 response")
+    parser.add_argument("--assignees", action="store_true", help="Let find-admins use the role assignees API")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="max-workers settings to compare")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each scenario. The median time is reported")
+    parser.add_argument("--scenarios", nargs="+", choices=[s[0] for s in SCENARIOS], help="Scenarios to run")
+    parser.add_argument("--output", type=Path, help="Save the results to a JSON file")
+    parser.add_argument("--baseline", type=Path, help="JSON file with results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed drop in objects per second")
+    args = parser.parse_args()
+
+    # Log to the log file like the Dorothy shell does so that the cost of logging is included
+    setup_logging(LOGS_DIR)
+
+    org = SyntheticOrg(users=args.users, groups=args.groups, policies=args.policies)
+    simulator = OktaSimulator(
+        org, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, assignees=args.assignees
+    )
+    simulator.start()
+
+    scenarios = [s for s in SCENARIOS if not args.scenarios or s[0] in args.scenarios]
+
+    try:
+        results = run_benchmarks(simulator, scenarios, args.workers, args.repeat)
+    finally:
+        simulator.stop()
+
+    print(tabulate([r.values() for r in results], headers=list(results[0].keys()), tablefmt="pretty"))
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+
+        for scenario, max_workers, before, after in regressions:
+            print(f"Regression: {scenario} (max workers {max_workers}) dropped from {before} to {after} objects/s")
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Measure how long it takes to import Dorothy and check that importing it has no side effects
+
+"""
+Each run imports dorothy.main in a new interpreter with python -X importtime and HOME set to an empty temporary
+directory. The run fails if the import creates any files in HOME or imports a module that should only be imported
+when it's used, e.g. the Elasticsearch client or one of Dorothy's modules.
+
+Example usage:
+
+    python benchmarks/import_benchmark.py --repeat 10
+    python benchmarks/import_benchmark.py --output baseline.json
+    python benchmarks/import_benchmark.py --baseline baseline.json --tolerance 0.2
+
+The exit status is 1 if a run failed or, with --baseline, if the median import time increased by more than the
+tolerance
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Import Dorothy from this repository without installing it
+sys.path.insert(0, str(REPO_DIR))
+
+from dorothy.registry import MODULES  # noqa: E402
+
+# Third-party packages that are only imported when a feature needs them
+DEFERRED_PACKAGES = ["aiohttp", "elasticsearch", "tabulate", "yaml"]
+
+# Print the modules that were imported but shouldn't have been after importing Dorothy
+IMPORT_SCRIPT = """
+import json, sys
+import dorothy.main
+print(json.dumps([name for name in json.loads(sys.argv[1]) if name in sys.modules]))
+"""
+
+
+def parse_importtime(output):
+    """Return the self and cumulative microseconds and the nesting level of each module in the output of python -X
+    importtime"""
+
+    modules = {}
+
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        self_us, cumulative_us, name = line.partition("import time:")[2].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us), len(name) - len(name.lstrip()))
+
+    return modules
+
+
+def dorothy_import_us(modules):
+    """Return the microseconds spent importing Dorothy's package and its main module, including their imports"""
+
+    return sum(
+        cumulative_us
+        for name, (_, cumulative_us, level) in modules.items()
+        if level == 1 and name.startswith("dorothy")
+    )
+
+
+def run_import():
+    """Import Dorothy in a new interpreter. Returns the import times, unexpected imports and files created"""
+
+    deferred = DEFERRED_PACKAGES + [module.import_path for module in MODULES]
+
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, PYTHONPATH=str(REPO_DIR), PYTHONDONTWRITEBYTECODE="1")
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT, json.dumps(deferred)],
+            cwd=home,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+
+        if result.returncode:
+            raise RuntimeError(f"Importing Dorothy failed:\n{result.stderr}")
+
+        created = sorted(str(path.relative_to(home)) for path in Path(home).rglob("*"))
+
+    return parse_importtime(result.stderr), json.loads(result.stdout), created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long it takes to import Dorothy")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of imports. The median time is reported")
+    parser.add_argument("--top", type=int, default=10, help="Number of the slowest modules to show")
+    parser.add_argument("--output", type=Path, help="Save the results to a JSON file")
+    parser.add_argument("--baseline", type=Path, help="JSON file with results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed increase in import time")
+    args = parser.parse_args()
+
+    runs = [run_import() for _ in range(args.repeat)]
+    modules, unexpected, created = runs[-1]
+
+    import_ms = statistics.median(dorothy_import_us(run[0]) for run in runs) / 1000
+    results = {"import_ms": round(import_ms, 1), "modules": len(modules)}
+
+    print(f"Import time of dorothy.main: {results['import_ms']} ms (median of {args.repeat}, {len(modules)} modules)")
+    print("Slowest modules (self ms):")
+    for name, (self_us, _, _) in sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[: args.top]:
+        print(f"  {self_us / 1000:8.1f}  {name}")
+
+    failed = False
+
+    if unexpected:
+        print(f"Modules that should only be imported when they're used: {', '.join(unexpected)}")
+        failed = True
+
+    if created:
+        print(f"Files created by importing Dorothy: {', '.join(created)}")
+        failed = True
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        before = json.loads(args.baseline.read_text())["import_ms"]
+
+        if results["import_ms"] > before * (1 + args.tolerance):
+            print(f"Regression: import time increased from {before} to {results['import_ms']} ms")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
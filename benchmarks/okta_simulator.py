@@ -0,0 +1,532 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Local stand-in for the Okta API that serves a synthetic Okta environment of any size
+
+"""
+The simulator serves the Okta API endpoints used by Dorothy's modules with Link header pagination, rate limit headers,
+optional latency and injected 429 responses. It only uses the standard library.
+
+Example usage:
+
+    python benchmarks/okta_simulator.py --users 10000 --groups 500 --latency 0.05 --port 8080
+
+Then create a Dorothy configuration profile with the URL http://127.0.0.1:8080 and any API token. The simulator can
+also be started from Python with OktaSimulator(SyntheticOrg(users=10000)).start()
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+API_PREFIX = "/api/v1"
+# Okta object IDs are 20 alphanumeric characters. E.g. 00u1ab2cd3EF4gh5I6j7
+OKTA_ID_PATTERN = re.compile(r"^[0-9A-Za-z]{20}$")
+# Clauses of Okta filter and search expressions supported by the simulator. E.g. profile.department eq "IT"
+EXPRESSION_PATTERN = re.compile(r'([\w.]+) (eq|gt|lt|sw) "([^"]*)"')
+POLICY_TYPES = ["OKTA_SIGN_ON", "PASSWORD", "MFA_ENROLL", "OAUTH_AUTHORIZATION_POLICY", "IDP_DISCOVERY"]
+DEPARTMENTS = ["Engineering", "Finance", "IT", "Legal", "Marketing", "Sales", "Support"]
+ADMIN_ROLE_TYPES = ["SUPER_ADMIN", "ORG_ADMIN", "APP_ADMIN", "USER_ADMIN", "HELP_DESK_ADMIN", "READ_ONLY_ADMIN"]
+FACTOR_TYPES = [("push", "OKTA"), ("token:software:totp", "GOOGLE"), ("sms", "OKTA")]
+
+
+def okta_id(prefix, number):
+    """Return a 20 character Okta style ID. E.g. 00u00000000000000042"""
+
+    return f"{prefix}{number:0{20 - len(prefix)}d}"
+
+
+def timestamp(days_ago):
+    return (datetime(2024, 1, 1, tzinfo=timezone.utc) - timedelta(days=days_ago)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+@dataclass
+class SyntheticOrg:
+    """Synthetic Okta environment. Objects are generated deterministically from the sizes"""
+
+    users: int = 1000
+    groups: int = 100
+    zones: int = 10
+    apps: int = 50
+    # Number of policies of each type and rules for each policy
+    policies: int = 3
+    rules: int = 3
+    # Every nth user and group has an admin role assigned
+    admin_every: int = 50
+    # Every nth user has no MFA factors enrolled
+    no_mfa_every: int = 10
+    objects: dict = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self.objects["users"] = [
+            {
+                "id": okta_id("00u", i),
+                "status": "ACTIVE",
+                "created": timestamp(365 + i % 365),
+                "lastUpdated": timestamp(i % 365),
+                "profile": {
+                    "login": f"user{i}@example.com",
+                    "email": f"user{i}@example.com",
+                    "firstName": "User",
+                    "lastName": str(i),
+                    "department": DEPARTMENTS[i % len(DEPARTMENTS)],
+                },
+                "_links": {},
+            }
+            for i in range(self.users)
+        ]
+        self.objects["groups"] = [
+            {
+                "id": okta_id("00g", i),
+                "type": "OKTA_GROUP",
+                "lastUpdated": timestamp(i % 365),
+                "lastMembershipUpdated": timestamp(i % 30),
+                "profile": {"name": f"Group {i}", "description": f"Synthetic group {i}"},
+            }
+            for i in range(self.groups)
+        ]
+        self.objects["zones"] = [
+            {"id": okta_id("nzo", i), "type": "IP", "name": f"Zone {i}", "status": "ACTIVE", "gateways": []}
+            for i in range(self.zones)
+        ]
+        self.objects["apps"] = [
+            {
+                "id": okta_id("0oa", i),
+                "name": f"app{i}",
+                "label": f"App {i}",
+                "status": "ACTIVE",
+                "signOnMode": "SAML_2_0",
+            }
+            for i in range(self.apps)
+        ]
+        self.objects["policies"] = []
+        self.rules_by_policy = {}
+
+        for t, policy_type in enumerate(POLICY_TYPES):
+            for i in range(self.policies):
+                policy_id = okta_id("00p", t * 1000 + i)
+                self.objects["policies"].append(
+                    {
+                        "id": policy_id,
+                        "type": policy_type,
+                        "name": f"{policy_type} policy {i}",
+                        "status": "ACTIVE",
+                        "priority": i + 1,
+                        "system": i == 0,
+                    }
+                )
+                self.rules_by_policy[policy_id] = [
+                    {
+                        "id": okta_id("0pr", (t * 1000 + i) * 100 + r),
+                        "type": "SIGN_ON",
+                        "name": f"Rule {r}",
+                        "status": "ACTIVE",
+                        "priority": r + 1,
+                    }
+                    for r in range(self.rules)
+                ]
+
+        self.index = {
+            name: {obj["id"]: position for position, obj in enumerate(objects)}
+            for name, objects in self.objects.items()
+        }
+
+    def get(self, collection, object_id):
+        position = self.index.get(collection, {}).get(object_id)
+        return None if position is None else self.objects[collection][position]
+
+    def roles(self, collection, object_id):
+        position = self.index[collection].get(object_id, 1)
+
+        if position % self.admin_every:
+            return []
+
+        role_type = ADMIN_ROLE_TYPES[(position // self.admin_every) % len(ADMIN_ROLE_TYPES)]
+        return [
+            {
+                "id": okta_id("ra1", position),
+                "label": role_type.replace("_", " ").title(),
+                "type": role_type,
+                "status": "ACTIVE",
+                "assignmentType": "USER" if collection == "users" else "GROUP",
+            }
+        ]
+
+    def factors(self, user_id):
+        position = self.index["users"].get(user_id, 0)
+
+        if position % self.no_mfa_every == 0:
+            return []
+
+        factor_type, provider = FACTOR_TYPES[position % len(FACTOR_TYPES)]
+        return [{"id": okta_id("mfa", position), "factorType": factor_type, "provider": provider, "status": "ACTIVE"}]
+
+    def admin_user_ids(self):
+        return [user["id"] for position, user in enumerate(self.objects["users"]) if position % self.admin_every == 0]
+
+
+def matches(obj, expression):
+    """Return True if an object matches a filter or search expression. Clauses can be joined with "and" or "or" but
+    not both"""
+
+    if not expression:
+        return True
+
+    results = []
+
+    for path, operator, value in EXPRESSION_PATTERN.findall(expression):
+        actual = obj
+        for key in path.split("."):
+            actual = actual.get(key) if isinstance(actual, dict) else None
+
+        actual = "" if actual is None else str(actual)
+        results.append(
+            {"eq": actual == value, "gt": actual > value, "lt": actual < value, "sw": actual.startswith(value)}[
+                operator
+            ]
+        )
+
+    return any(results) if " or " in expression else all(results)
+
+
+class OktaSimulator:
+    """HTTP server that simulates the Okta API for a synthetic Okta environment
+
+    latency and jitter add a delay in seconds to every response. Each endpoint family (method and path with object IDs
+    replaced) allows rate_limit requests per rate_limit_window seconds, after which 429 responses are returned until
+    the window resets. error_rate is the probability of returning a 429 response regardless of the rate limit
+    """
+
+    def __init__(
+        self,
+        org,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        rate_limit=10000,
+        rate_limit_window=60,
+        error_rate=0.0,
+        assignees=True,
+    ):
+        self.org = org
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.error_rate = error_rate
+        self.assignees = assignees
+        self.requests = 0
+        self.throttled = 0
+        self.buckets = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(0)
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve requests in a background thread and return the base URL"""
+
+        self._thread = threading.Thread(target=self.server.serve_forever, name="okta-simulator", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.throttled = 0
+            self.buckets = {}
+
+    def rate_limit_headers(self, family):
+        """Spend one request from the rate limit of an endpoint family. Returns the headers and True if the request
+        exceeds the rate limit"""
+
+        now = time.time()
+
+        with self._lock:
+            self.requests += 1
+            start, count = self.buckets.get(family, (now, 0))
+
+            if now >= start + self.rate_limit_window:
+                start, count = now, 0
+
+            count += 1
+            self.buckets[family] = (start, count)
+            exceeded = count > self.rate_limit
+            injected = not exceeded and self.error_rate and self._random.random() < self.error_rate
+
+            if exceeded or injected:
+                self.throttled += 1
+
+        # Injected 429 responses reset after a second so that clients that wait for the reset aren't held up
+        reset = start + self.rate_limit_window if exceeded else now + 1
+        headers = {
+            "X-Rate-Limit-Limit": str(self.rate_limit),
+            "X-Rate-Limit-Remaining": "0" if injected else str(max(self.rate_limit - count, 0)),
+            "X-Rate-Limit-Reset": str(int(reset)),
+        }
+
+        return headers, exceeded or injected
+
+    def _handler_class(self):
+        simulator = self
+
+        class Handler(OktaRequestHandler):
+            pass
+
+        Handler.simulator = simulator
+        return Handler
+
+
+class OktaRequestHandler(BaseHTTPRequestHandler):
+    """Request handler for OktaSimulator"""
+
+    # Keep connections open between requests like the Okta API
+    protocol_version = "HTTP/1.1"
+    # Send the headers and body without waiting for the client to acknowledge the headers
+    disable_nagle_algorithm = True
+    simulator = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PUT(self):
+        self.handle_request("PUT")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+    def handle_request(self, method):
+        simulator = self.simulator
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        if simulator.latency or simulator.jitter:
+            time.sleep(simulator.latency + simulator._random.random() * simulator.jitter)
+
+        if not url.path.startswith(API_PREFIX):
+            return self.send_json(404, okta_error("E0000022", "The endpoint does not support the provided HTTP method"))
+
+        path = url.path.replace(API_PREFIX, "", 1).rstrip("/")
+        segments = path.split("/")[1:]
+        family = f'{method} {"/".join("{id}" if OKTA_ID_PATTERN.match(s) else s for s in segments)}'
+        headers, throttled = simulator.rate_limit_headers(family)
+
+        if throttled:
+            return self.send_json(
+                429, okta_error("E0000047", "API call exceeded rate limit due to too many requests"), headers
+            )
+
+        if not self.headers.get("Authorization", "").startswith("SSWS "):
+            return self.send_json(401, okta_error("E0000011", "Invalid token provided"), headers)
+
+        status, body, links = self.route(method, segments, query)
+        self.send_json(status, body, headers, links)
+
+    def route(self, method, segments, query):
+        """Return the status code, body and Link header values for a request"""
+
+        org = self.simulator.org
+        collection = segments[0] if segments else ""
+        object_id = segments[1] if len(segments) > 1 else None
+        rest = segments[2:]
+
+        if method != "GET":
+            # Lifecycle operations, role assignments and deletes
+            if collection in ("users", "groups") and rest == ["roles"]:
+                return 201, {"id": okta_id("ra1", 0), "type": "SUPER_ADMIN", "status": "ACTIVE"}, None
+            if object_id and (collection == "policies" or org.get(collection, object_id)):
+                return (200, {}, None) if collection == "users" and "lifecycle" in rest else (204, None, None)
+            return 404, okta_error("E0000007", f"Not found: Resource not found: {object_id} ({collection})"), None
+
+        if collection == "iam" and segments[1:] == ["assignees", "users"]:
+            return self.assignees(query)
+
+        if object_id is None:
+            if collection == "policies":
+                policies = [p for p in org.objects["policies"] if p["type"] == query.get("type")]
+                return 200, policies, None
+            if collection in ("users", "groups", "zones", "apps"):
+                return self.list_objects(collection, query)
+            return 404, okta_error("E0000007", f"Not found: Resource not found: {collection}"), None
+
+        if collection == "users" and object_id == "me":
+            object_id = org.objects["users"][0]["id"] if org.objects["users"] else None
+
+        if collection == "policies" and rest[:1] == ["rules"]:
+            rules = org.rules_by_policy.get(object_id)
+            if rules is None:
+                return 404, okta_error("E0000007", f"Not found: Resource not found: {object_id} (Policy)"), None
+            if len(rest) == 1:
+                return 200, rules, None
+            rule = next((r for r in rules if r["id"] == rest[1]), None)
+            return (200, rule, None) if rule else (404, okta_error("E0000007", "Not found"), None)
+
+        obj = org.get(collection, object_id)
+        if obj is None:
+            return 404, okta_error("E0000007", f"Not found: Resource not found: {object_id} ({collection})"), None
+
+        if not rest:
+            if collection == "policies" and query.get("expand") == "rules":
+                obj = dict(obj, _embedded={"rules": org.rules_by_policy[object_id]})
+            return 200, obj, None
+        if rest == ["roles"]:
+            return 200, org.roles(collection, object_id), None
+        if collection == "users" and rest == ["factors"]:
+            return 200, org.factors(object_id), None
+        if collection == "users" and rest == ["groups"]:
+            return 200, org.objects["groups"][: 1 + org.index["users"][object_id] % 3], None
+
+        return 404, okta_error("E0000007", "Not found"), None
+
+    def list_objects(self, collection, query):
+        """Return a page of objects with a Link header for the next page"""
+
+        objects = self.simulator.org.objects[collection]
+        limit = min(int(query.get("limit", 200)), 200)
+        expression = query.get("search") or query.get("filter")
+        after = query.get("after")
+        start = self.simulator.org.index[collection].get(after, -1) + 1 if after else 0
+
+        page = []
+        position = start
+        while position < len(objects) and len(page) < limit:
+            obj = objects[position]
+            if matches(obj, expression) and (query.get("q") is None or query["q"] in json.dumps(obj)):
+                page.append(obj)
+            position += 1
+
+        base = f"{self.simulator.base_url}{API_PREFIX}/{collection}"
+        links = [f'<{base}?{urlencode(query)}>; rel="self"']
+
+        if position < len(objects) and page:
+            next_query = dict(query, after=page[-1]["id"], limit=limit)
+            links.append(f'<{base}?{urlencode(next_query)}>; rel="next"')
+
+        return 200, page, links
+
+    def assignees(self, query):
+        """Return a page of users with admin roles assigned. The next page is linked in the body"""
+
+        if not self.simulator.assignees:
+            return 403, okta_error("E0000006", "You do not have permission to perform the requested action"), None
+
+        user_ids = self.simulator.org.admin_user_ids()
+        start = int(query.get("after", 0))
+        end = start + int(query.get("limit", 100))
+        body = {
+            "value": [{"id": user_id, "orn": f"orn:okta:directory:users:{user_id}"} for user_id in user_ids[start:end]]
+        }
+        body["_links"] = {}
+
+        if end < len(user_ids):
+            href = f"{self.simulator.base_url}{API_PREFIX}/iam/assignees/users?after={end}&limit={end - start}"
+            body["_links"]["next"] = {"href": href}
+
+        return 200, body, None
+
+    def send_json(self, status, body, headers=None, links=None):
+        data = b"" if body is None else json.dumps(body).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        for link in links or []:
+            self.send_header("Link", link)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def okta_error(code, summary):
+    return {"errorCode": code, "errorSummary": summary, "errorLink": code, "errorId": "sim", "errorCauses": []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic Okta environment for testing and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--zones", type=int, default=10)
+    parser.add_argument("--apps", type=int, default=50)
+    parser.add_argument("--policies", type=int, default=3, help="Number of policies of each type")
+    parser.add_argument("--rules", type=int, default=3, help="Number of rules for each policy")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum random seconds added to each response")
+    parser.add_argument("--rate-limit", type=int, default=10000, help="Requests per endpoint per window")
+    parser.add_argument("--rate-limit-window", type=int, default=60, help="Rate limit window in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of an injected 429 response")
+    parser.add_argument("--no-assignees", action="store_true", help="Disable the IAM role assignees API")
+    args = parser.parse_args()
+
+    org = SyntheticOrg(
+        users=args.users, groups=args.groups, zones=args.zones, apps=args.apps, policies=args.policies, rules=args.rules
+    )
+    simulator = OktaSimulator(
+        org,
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+        error_rate=args.error_rate,
+        assignees=not args.no_assignees,
+    )
+
+    print(f"Serving a synthetic Okta environment with {args.users} users at {simulator.base_url}. Press Ctrl-C to stop")
+
+    try:
+        simulator.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -17,29 +17,13 @@
 # under the License.
 #
 
-import logging.config
 from pathlib import Path
 
-import yaml
-
-import dorothy.modules
-from .core import setup_logging
-
 __version__ = "0.3.2"
 
+# Importing Dorothy has no side effects. Directories are created when they are first written to and logging is set
+# up when the Dorothy shell starts
 ROOT_DIR = Path(__file__).parent
 DATA_DIR = Path.home() / "dorothy" / "data"
 LOGS_DIR = Path.home() / "dorothy" / "logs"
 CONFIG_DIR = Path.home() / "dorothy" / "config"
-
-# Create directories if they don't exist
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-LOGS_DIR.mkdir(parents=True, exist_ok=True)
-CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-
-logging_config = setup_logging(ROOT_DIR, CONFIG_DIR, LOGS_DIR)
-
-# Setup logger
-with open(logging_config, "r") as f:
-    config = yaml.safe_load(f.read())
-    logging.config.dictConfig(config)
@@ -0,0 +1,436 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Asyncio client for the Okta API with a synchronous facade
+
+"""
+The async client requires aiohttp, which is an optional dependency: pip install aiohttp
+
+Example usage in a coroutine:
+
+    async with AsyncOktaClient(base_url, api_token) as client:
+        users = [user async for user in client.iter_users(search='status eq "ACTIVE"')]
+        roles = await client.map_bounded(lambda user: client.list_roles("user", user["id"]), users)
+"""
+
+import asyncio
+import logging.config
+import time
+from collections import deque
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from dorothy.metrics import RequestMetrics
+from dorothy.ratelimit import (
+    IDEMPOTENT_METHODS,
+    MAX_RETRIES,
+    MAX_RETRY_WAIT,
+    RETRY_STATUS_CODES,
+    RateLimiter,
+    backoff_wait,
+    reset_wait,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+
+class OktaApiError(Exception):
+    """Error response returned by the Okta API"""
+
+    def __init__(self, status_code, reason, error_code=None, error_summary=None):
+        self.status_code = status_code
+        self.reason = reason
+        self.error_code = error_code
+        self.error_summary = error_summary
+
+        super().__init__(
+            f"Response Code: {status_code} | Response Reason: {reason} | Error Code: {error_code} | "
+            f"Error Summary: {error_summary}"
+        )
+
+
+class AsyncOktaClient:
+    """Asyncio client with the same operations as OktaOrg and the Okta object data classes
+
+    Paginated listings are async generators. All other operations are coroutines that return the decoded JSON response
+    and raise OktaApiError for error responses. The number of requests in flight is bounded by a semaphore and every
+    request goes through the same rate limiter as the synchronous session instance. Requests are retried like the
+    session instance's requests (see OktaRetry): idempotent requests after a 429, 502, 503 or 504 response or a
+    connection error, and all requests that couldn't connect to Okta.
+    """
+
+    def __init__(self, base_url, api_token, rate_limiter=None, max_in_flight=50, timeout=7, metrics=None):
+        if aiohttp is None:
+            raise RuntimeError("The async Okta client requires aiohttp. Install it with: pip install aiohttp")
+
+        self.base_url = base_url
+        self.api_token = api_token
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.metrics = metrics or RequestMetrics()
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """Create the aiohttp session. Connections are reused for all requests sent by the client"""
+
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "Authorization": f"SSWS {self.api_token}",
+        }
+        self.session = aiohttp.ClientSession(
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+    async def close(self):
+        """Close the aiohttp session"""
+
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method, url, params=None, payload=None):
+        """Send a request to the Okta API and return the decoded JSON response and the URL of the next page"""
+
+        if not url.startswith("http"):
+            url = f"{self.base_url}{url}"
+
+        retries = 0
+
+        while True:
+            async with self._semaphore:
+                delay = self.rate_limiter.reserve(url)
+                if delay > 0:
+                    LOGGER.info(
+                        f"Rate limit budget for {self.rate_limiter.endpoint(url)} is exhausted. Waiting {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+
+                sent = time.perf_counter()
+
+                try:
+                    async with self.session.request(method, url, params=params, json=payload) as response:
+                        self.metrics.record(
+                            method, url, response.status, response.headers, time.perf_counter() - sent, max(delay, 0)
+                        )
+                        self.rate_limiter.record(str(response.url), response.status, response.headers)
+
+                        # Some operations (e.g. lifecycle operations and deletes) return an empty body
+                        body = await response.read()
+                        data = await response.json(content_type=None) if body else None
+
+                        if self.should_retry(method, response.status, retries):
+                            retries += 1
+                            wait = self.retry_wait(response, retries)
+                            cause = f"status {response.status}"
+                        elif response.status >= 400:
+                            data = data if isinstance(data, dict) else {}
+                            raise OktaApiError(
+                                response.status, response.reason, data.get("errorCode"), data.get("errorSummary")
+                            )
+                        else:
+                            next_page = response.links.get("next")
+                            next_url = str(next_page["url"]) if next_page else None
+
+                            return data, next_url
+
+                except aiohttp.ClientConnectionError as e:
+                    self.metrics.record(method, url, None, {}, time.perf_counter() - sent, max(delay, 0))
+
+                    if not self.should_retry_error(method, e, retries):
+                        raise
+
+                    retries += 1
+                    wait = backoff_wait(retries)
+                    cause = repr(e)
+
+            # Wait outside the semaphore so that requests to other endpoints aren't held up
+            LOGGER.info(f"Retrying {method} {url} after {cause} in {wait:.1f}s (retry {retries})")
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def should_retry(method, status_code, retries):
+        """Return True if a response should be retried. Only idempotent requests are retried"""
+
+        return status_code in RETRY_STATUS_CODES and method.upper() in IDEMPOTENT_METHODS and retries < MAX_RETRIES
+
+    @staticmethod
+    def should_retry_error(method, error, retries):
+        """Return True if a request that failed with a connection error should be retried. Like OktaRetry, requests
+        that couldn't connect are retried for all methods, but other connection errors (e.g. the server disconnected)
+        only for idempotent methods, because the request might have been processed"""
+
+        if retries >= MAX_RETRIES:
+            return False
+
+        return isinstance(error, aiohttp.ClientConnectorError) or method.upper() in IDEMPOTENT_METHODS
+
+    @staticmethod
+    def retry_wait(response, retries):
+        """Return the seconds to wait before a retry from the Retry-After header, the rate limit reset time of a 429
+        response or the exponential backoff"""
+
+        try:
+            return min(float(response.headers["Retry-After"]), MAX_RETRY_WAIT)
+        except (KeyError, ValueError):
+            pass
+
+        wait = reset_wait(response.headers) if response.status == 429 else None
+
+        return backoff_wait(retries) if wait is None else wait
+
+    async def paginate(self, path, params=None):
+        """Yield objects from every page of a listing, following the Link header to the next page"""
+
+        url = path
+
+        while url:
+            objects, url = await self.request("GET", url, params=params)
+            # The URL of the next page already includes the query parameters
+            params = None
+
+            for obj in objects:
+                yield obj
+
+    async def map_bounded(self, func, items, limit=None):
+        """Await func(item) for each item with at most limit calls in flight and return the results in order"""
+
+        semaphore = asyncio.Semaphore(limit or self.max_in_flight)
+
+        async def run(item):
+            async with semaphore:
+                return await func(item)
+
+        return await asyncio.gather(*(run(item) for item in items))
+
+    # Users
+
+    async def get_current_user(self):
+        """Get the user linked to the current API token"""
+        user, _ = await self.request("GET", "/users/me")
+        return user
+
+    async def get_user(self, user_id):
+        """Get a user using the user's ID"""
+        user, _ = await self.request("GET", f"/users/{user_id}")
+        return user
+
+    def iter_users(self, query=None, search_filter=None, search=None, limit=None):
+        """Yield all users. If no parameters are provided, all users that aren't DEPROVISIONED are listed"""
+        params = {"q": query, "filter": search_filter, "search": search, "limit": limit}
+        return self.paginate("/users", {k: v for k, v in params.items() if v is not None})
+
+    async def list_user_groups(self, user_id):
+        """List the user's group memberships"""
+        groups, _ = await self.request("GET", f"/users/{user_id}/groups")
+        return groups
+
+    async def list_factors(self, user_id):
+        """List the user's enrolled MFA factors"""
+        factors, _ = await self.request("GET", f"/users/{user_id}/factors")
+        return factors
+
+    async def delete_factor(self, user_id, factor_id):
+        """Delete an enrolled MFA factor for the user"""
+        await self.request("DELETE", f"/users/{user_id}/factors/{factor_id}")
+
+    async def execute_lifecycle_operation(self, user_id, operation, send_email=False):
+        """Execute a lifecycle operation (e.g. SUSPEND) or DELETE on a user object"""
+
+        params = {} if send_email else {"sendEmail": "False"}
+
+        if operation == "DELETE":
+            await self.request("DELETE", f"/users/{user_id}", params=params)
+        else:
+            await self.request("POST", f"/users/{user_id}/lifecycle/{operation.lower()}", params=params, payload={})
+
+    # Groups
+
+    def iter_groups(self):
+        """Yield all groups"""
+        return self.paginate("/groups")
+
+    # Roles
+
+    async def list_roles(self, object_type, unique_id):
+        """List the admin roles assigned to a user or group"""
+
+        if object_type not in ("user", "group"):
+            raise ValueError("Unexpected type. Type must be 'user' or 'group'")
+
+        roles, _ = await self.request("GET", f"/{object_type}s/{unique_id}/roles")
+        return roles
+
+    async def assign_admin_role(self, object_type, unique_id, role_type):
+        """Assign an admin role to a user or group"""
+
+        if object_type not in ("user", "group"):
+            raise ValueError("Unexpected type. Type must be 'user' or 'group'")
+
+        role, _ = await self.request("POST", f"/{object_type}s/{unique_id}/roles", payload={"type": role_type})
+        return role
+
+    # Network zones, applications and policies
+
+    def iter_zones(self):
+        """Yield all network zones"""
+        return self.paginate("/zones")
+
+    async def get_zone(self, zone_id):
+        """Get a network zone"""
+        zone, _ = await self.request("GET", f"/zones/{zone_id}")
+        return zone
+
+    def iter_apps(self):
+        """Yield all applications"""
+        return self.paginate("/apps")
+
+    async def get_app(self, app_id):
+        """Get an application"""
+        app, _ = await self.request("GET", f"/apps/{app_id}")
+        return app
+
+    def iter_policies(self, policy_type):
+        """Yield all policies with the policy type"""
+        return self.paginate("/policies", {"type": policy_type})
+
+    async def get_policy(self, policy_id, rules=False):
+        """Get a policy and optionally, up to 20 of its rules"""
+        policy, _ = await self.request("GET", f"/policies/{policy_id}", params={"expand": "rules"} if rules else None)
+        return policy
+
+    async def get_policy_rule(self, policy_id, rule_id):
+        """Get a policy rule"""
+        rule, _ = await self.request("GET", f"/policies/{policy_id}/rules/{rule_id}")
+        return rule
+
+    async def change_state(self, object_type, object_id, operation):
+        """Activate or deactivate a network zone, application or policy. E.g. change_state("zone", id, "ACTIVATE")"""
+
+        if object_type not in ("zone", "app", "policy"):
+            raise ValueError("Unexpected type. Type must be 'zone', 'app' or 'policy'")
+
+        collection = "policies" if object_type == "policy" else f"{object_type}s"
+        await self.request("POST", f"/{collection}/{object_id}/lifecycle/{operation.lower()}", payload={})
+
+    async def change_rule_state(self, policy_id, rule_id, operation):
+        """Activate or deactivate a policy rule"""
+        await self.request("POST", f"/policies/{policy_id}/rules/{rule_id}/lifecycle/{operation.lower()}", payload={})
+
+
+class SyncOktaClient:
+    """Synchronous facade over AsyncOktaClient for use in click commands
+
+    Coroutines are executed on an event loop owned by the facade. Async generators are collected into lists.
+
+    Example usage:
+
+        with SyncOktaClient(
+            ctx.obj.base_url, ctx.obj.api_token, ctx.obj.session.rate_limiter, metrics=ctx.obj.session.metrics
+        ) as client:
+            users = client.iter_users()
+            factors = client.map_bounded(client.client.list_factors, [user["id"] for user in users])
+    """
+
+    def __init__(self, base_url, api_token, rate_limiter=None, max_in_flight=50, timeout=7, metrics=None):
+        self.client = AsyncOktaClient(base_url, api_token, rate_limiter, max_in_flight, timeout, metrics)
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.client.open())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Close the async client and the event loop"""
+
+        self.loop.run_until_complete(self.client.close())
+        self.loop.close()
+
+    def map_bounded(self, func, items, limit=None):
+        """Run a coroutine function for each item concurrently and return the results in order"""
+        return self.loop.run_until_complete(self.client.map_bounded(func, items, limit))
+
+    def imap(self, func, items, limit=None):
+        """Yield (item, result) tuples for a coroutine function run for each item, in the same order as the items
+
+        Up to limit coroutines run concurrently. Items are taken from the iterable as results are yielded, so lazily
+        loaded items (e.g. a harvest) aren't all loaded at once. Coroutines that haven't finished are cancelled if the
+        caller stops iterating early
+        """
+
+        limit = limit or self.client.max_in_flight
+        pending = deque()
+
+        try:
+            for item in items:
+                pending.append((item, self.loop.create_task(func(item))))
+
+                if len(pending) >= limit:
+                    done_item, task = pending.popleft()
+                    yield done_item, self.loop.run_until_complete(task)
+
+            while pending:
+                done_item, task = pending.popleft()
+                yield done_item, self.loop.run_until_complete(task)
+
+        finally:
+            for _, task in pending:
+                task.cancel()
+            if pending:
+                self.loop.run_until_complete(asyncio.gather(*(task for _, task in pending), return_exceptions=True))
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+
+        if not callable(attribute):
+            return attribute
+
+        def run(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+
+            if hasattr(result, "__anext__"):
+                return self.loop.run_until_complete(collect(result))
+            if asyncio.iscoroutine(result):
+                return self.loop.run_until_complete(result)
+            return result
+
+        return run
+
+
+async def collect(async_iterator):
+    """Collect all items from an async generator into a list"""
+    return [item async for item in async_iterator]
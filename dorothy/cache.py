@@ -0,0 +1,100 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Cache the roles and MFA factors retrieved for users and groups between sweeps
+
+import logging.config
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# Kinds of results that are cached for each user or group. Each kind is stored in a table of the data store
+CACHE_KINDS = ("roles", "factors")
+
+
+class ResultCache:
+    """Cache of the roles and MFA factors retrieved for each user and group of a configuration profile
+
+    Results are stored in the data store of the profile. Entries are keyed on the object's ID and are only used while
+    the object's lastUpdated timestamp is unchanged and the entry is younger than max_age hours. Role assignments and
+    factor enrollments don't change lastUpdated, so the roles and factors of users and groups changed outside Dorothy
+    can be up to max_age hours stale. A max_age of 0, the default, disables the cache.
+    """
+
+    def __init__(self, store, max_age=0):
+        self.store = store
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        # The cache is shared by worker threads, so the counters are updated under a lock
+        self._lock = threading.Lock()
+
+    def get(self, kind, obj):
+        """Return the cached result for an Okta object or None if there is no valid entry"""
+
+        if not self.max_age:
+            return None
+
+        entry = self.store.get_result(kind, obj["id"])
+
+        if entry is None:
+            self._count(hit=False)
+            return None
+
+        last_updated, cached, result = entry
+
+        if last_updated != obj.get("lastUpdated") or time.time() - cached > self.max_age * 3600:
+            self._count(hit=False)
+            return None
+
+        self._count(hit=True)
+        return result
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, kind, obj, value):
+        """Cache the result for an Okta object. Objects without a lastUpdated timestamp aren't cached"""
+
+        if not self.max_age or not obj.get("lastUpdated"):
+            return
+
+        self.store.put_result(kind, obj["id"], obj["lastUpdated"], value)
+
+    def invalidate(self, kind, object_id):
+        """Remove the cached result for an object. E.g. after assigning a role to it"""
+
+        self.store.delete_result(kind, object_id)
+
+    def clear(self, kind=None):
+        """Remove all cached results, or all cached results of one kind"""
+
+        self.store.delete_results(kind)
+
+    def save(self):
+        """Commit the cached results and drop expired entries"""
+
+        self.store.delete_results(cached_before=time.time() - self.max_age * 3600)
+
+        LOGGER.info(f"Saved result cache to {self.store.file_path} (hits: {self.hits}, misses: {self.misses})")
@@ -0,0 +1,242 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Record the Okta API requests and responses of a session to a cassette file and replay them without an Okta tenant
+
+import json
+import logging.config
+import os
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from requests import Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+LOGGER = logging.getLogger(__name__)
+
+# Set to record the requests of the session or to the path of a cassette file to replay it
+RECORD_ENV_VAR = "DOROTHY_RECORD"
+REPLAY_ENV_VAR = "DOROTHY_REPLAY"
+CASSETTE_HEADER = "dorothy_cassette"
+CASSETTE_VERSION = 1
+# Values of JSON fields with these words in their name are replaced in recorded requests and responses. The URLs
+# returned by lifecycle operations (e.g. activationUrl and resetPasswordUrl) embed a one-time token
+REDACTED_FIELDS = ("token", "password", "secret", "passcode", "answer", "sharedsecret", "activationurl")
+REDACTED = "REDACTED"
+# Response headers that aren't recorded
+SKIPPED_HEADERS = ("set-cookie", "content-encoding", "transfer-encoding", "content-length")
+
+
+def redact(data):
+    """Return a copy of decoded JSON data with the values of sensitive fields replaced"""
+
+    if isinstance(data, dict):
+        return {
+            key: REDACTED if any(word in key.lower() for word in REDACTED_FIELDS) else redact(value)
+            for key, value in data.items()
+        }
+    if isinstance(data, list):
+        return [redact(value) for value in data]
+
+    return data
+
+
+def decode_body(body):
+    """Return the decoded and redacted JSON body of a request or response, or its text if it isn't JSON"""
+
+    if not body:
+        return None
+
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+
+    try:
+        return redact(json.loads(body))
+    except ValueError:
+        return body
+
+
+class Cassette:
+    """Requests and responses recorded from the Okta API
+
+    Interactions are matched on the method, path, query parameters and body of the request. The host isn't matched,
+    so a cassette recorded against one Okta tenant can be replayed with any configuration profile. If the same request
+    was recorded more than once, the responses are replayed in the recorded order and the last one is repeated.
+
+    The API token is never recorded. Request headers aren't recorded and sensitive fields in request and response
+    bodies, e.g. activation tokens and passwords, are redacted
+    """
+
+    def __init__(self, file_path, mode):
+        self.file_path = file_path
+        self.mode = mode
+        self.interactions = defaultdict(deque)
+        self.recorded = 0
+        self.missed = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def record_to(cls, file_path, base_url):
+        """Start a new cassette file for recording"""
+
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        header = {"version": CASSETTE_VERSION, "base_url": base_url, "recorded": datetime.now(timezone.utc).isoformat()}
+
+        with open(file_path, "w") as f:
+            f.write(f"{json.dumps({CASSETTE_HEADER: header})}\n")
+
+        return cls(file_path, "record")
+
+    @classmethod
+    def load(cls, file_path):
+        """Load a cassette file for replaying"""
+
+        cassette = cls(file_path, "replay")
+
+        with open(file_path, "r") as f:
+            for line in f:
+                interaction = json.loads(line)
+
+                if CASSETTE_HEADER in interaction:
+                    continue
+
+                request = interaction["request"]
+                key = cassette.key(request["method"], request["url"], request["body"])
+                cassette.interactions[key].append(interaction["response"])
+                cassette.recorded += 1
+
+        return cassette
+
+    @staticmethod
+    def key(method, url, body):
+        """Return the key used to match a request. The query parameters are sorted and the host is ignored"""
+
+        parsed = urlparse(url)
+        query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+
+        return f"{method.upper()} {parsed.path}?{query} {json.dumps(body, sort_keys=True)}"
+
+    def record(self, request, response):
+        """Append a request and its response to the cassette file"""
+
+        interaction = {
+            "request": {"method": request.method, "url": request.url, "body": decode_body(request.body)},
+            "response": {
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS},
+                "body": decode_body(response.content),
+            },
+        }
+
+        with self._lock:
+            with open(self.file_path, "a") as f:
+                f.write(f"{json.dumps(interaction)}\n")
+            self.recorded += 1
+
+    def replay(self, request):
+        """Return the recorded response for a request or None if it wasn't recorded"""
+
+        key = self.key(request.method, request.url, decode_body(request.body))
+
+        with self._lock:
+            responses = self.interactions.get(key)
+
+            if not responses:
+                self.missed += 1
+                return None
+
+            # Keep the last response for any further identical requests
+            return responses.popleft() if len(responses) > 1 else responses[0]
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter that sends requests as usual and records them in a cassette"""
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        self.cassette.record(request, response)
+
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that returns the responses recorded in a cassette without sending any requests"""
+
+    def __init__(self, cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        recorded = self.cassette.replay(request)
+
+        if recorded is None:
+            path = urlparse(request.url).path
+            LOGGER.error(f"No response recorded for {request.method} {request.url} in {self.cassette.file_path}")
+            recorded = {
+                "status": 404,
+                "reason": "Not Recorded",
+                "headers": {"Content-Type": "application/json"},
+                "body": {
+                    "errorCode": "E0000007",
+                    "errorSummary": f"No response recorded for {request.method} {path} in the cassette",
+                    "errorCauses": [],
+                },
+            }
+
+        body = recorded["body"]
+        if body is not None and not isinstance(body, str):
+            body = json.dumps(body)
+
+        response = Response()
+        response.status_code = recorded["status"]
+        response.reason = recorded["reason"]
+        response.headers = CaseInsensitiveDict(recorded["headers"])
+        response._content = body.encode() if body is not None else b""
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+
+        return response
+
+    def close(self):
+        pass
+
+
+def cassette_from_env(data_dir, profile_id, base_url):
+    """Return the cassette to record to or replay from, as set with the DOROTHY_RECORD or DOROTHY_REPLAY environment
+    variables, or None"""
+
+    replay_path = os.environ.get(REPLAY_ENV_VAR)
+
+    if replay_path:
+        return Cassette.load(replay_path)
+
+    if os.environ.get(RECORD_ENV_VAR, "").lower() in ("1", "true", "on"):
+        file_name = f'{profile_id}_{datetime.now().strftime("%Y-%m-%d_%H-%M-%S")}.ndjson'
+        return Cassette.record_to(data_dir / "cassettes" / file_name, base_url)
+
+    return None
@@ -0,0 +1,287 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Save the progress of long-running checks so that they can be resumed after an error or interrupt
+
+import itertools
+import json
+import logging.config
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+import click
+
+from dorothy.core import Harvest, load_json_file, index_event
+
+LOGGER = logging.getLogger(__name__)
+
+# Save a checkpoint after this many objects are checked or this many seconds have passed, whichever is first
+CHECKPOINT_OBJECTS = 500
+CHECKPOINT_SECONDS = 30
+
+
+@dataclass
+class Checkpoint:
+    """Progress of a module that checks users or groups one by one (e.g. find-admins)
+
+    The source of the objects (a harvest, the data store, a file or a list of objects), the number of objects checked
+    so far and the partial results are saved to the data directory periodically and when the check is stopped. The
+    results found since the last save are appended to a results file next to the checkpoint, and a list of objects is
+    written to a file of its own once, so that only the position of the check is rewritten by each save
+    """
+
+    file_path: Path
+    # Where the objects come from. E.g. {"type": "store", "table": "users"}
+    source: dict
+    # Number of objects checked so far
+    processed: int = 0
+    # Partial results. E.g. the admin users found so far
+    results: list = field(default_factory=list)
+    started: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    # Number of objects that were already checked when the check was resumed
+    resumed_at: int = 0
+    # The objects being checked
+    objects: object = field(default=None, repr=False)
+    _last_save: float = field(default_factory=time.time, repr=False)
+    # Number of results and size in bytes of the results file when the checkpoint was last saved
+    _saved_results: int = field(default=0, repr=False)
+    _results_size: int = field(default=0, repr=False)
+
+    @property
+    def results_path(self):
+        """Path of the file that the results are appended to. One JSON result per line"""
+
+        return self.file_path.with_suffix(".results.ndjson")
+
+    @property
+    def objects_path(self):
+        """Path of the file that a list of objects being checked is saved to"""
+
+        return self.file_path.with_suffix(".objects.json")
+
+    @staticmethod
+    def path(ctx, name):
+        """Return the path of the checkpoint file for a module"""
+
+        return ctx.obj.data_dir / f"{ctx.obj.profile_id}_{name}_checkpoint.json"
+
+    @classmethod
+    def start(cls, ctx, name, source, objects):
+        """Start a new checkpoint, replacing any existing checkpoint for the module"""
+
+        return cls(cls.path(ctx, name), source, objects=objects)
+
+    @classmethod
+    def load(cls, ctx, name):
+        """Load the checkpoint of a module and reopen its source or return None if there is no checkpoint"""
+
+        file_path = cls.path(ctx, name)
+
+        try:
+            with open(file_path, "r") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            LOGGER.error(f"Ignoring unreadable checkpoint {file_path}: {e}")
+            return None
+
+        checkpoint = cls(file_path, data["source"], data["processed"], started=data["started"])
+
+        # Results appended after the checkpoint was last saved (e.g. if Dorothy was killed while saving) are ignored
+        try:
+            with open(checkpoint.results_path, "rb") as f:
+                lines = f.read(data["results_size"]).decode().splitlines()
+            checkpoint.results = [json.loads(line) for line in lines]
+        except (OSError, ValueError) as e:
+            LOGGER.error(f"Ignoring checkpoint {file_path} with unreadable results: {e}")
+            return None
+
+        checkpoint.resumed_at = checkpoint.processed
+        checkpoint._saved_results = len(checkpoint.results)
+        checkpoint._results_size = data["results_size"]
+        checkpoint.objects = checkpoint.remaining_objects(ctx)
+
+        return checkpoint
+
+    def remaining_objects(self, ctx):
+        """Return the objects that haven't been checked yet"""
+
+        source_type = self.source["type"]
+
+        if source_type == "harvest":
+            # Continue from the page with the next object instead of harvesting all pages again
+            return Harvest.from_cursor(ctx, self.source["cursor"])
+        elif source_type == "store":
+            objects = ctx.obj.store.objects(self.source["table"])
+        elif source_type == "file":
+            objects = load_json_file(self.source["file_path"])
+        else:
+            with open(self.objects_path, "r") as f:
+                objects = json.load(f)
+
+        return SkippedObjects(objects, self.processed)
+
+    def advance(self, result=None):
+        """Record that an object was checked and save the checkpoint if it's due"""
+
+        self.processed += 1
+
+        if result is not None:
+            self.results.append(result)
+
+        if self.processed % CHECKPOINT_OBJECTS == 0 or time.time() - self._last_save > CHECKPOINT_SECONDS:
+            self.save()
+
+    def save(self):
+        """Save the checkpoint to the data directory"""
+
+        # The position in a harvest is saved as the page to resume from and the objects to skip on that page
+        if isinstance(self.objects, Harvest):
+            self.source["cursor"] = self.objects.cursor(self.processed - self.resumed_at)
+
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # A list of objects is only written by the first save
+        if "objects" in self.source:
+            with open(self.objects_path, "w") as f:
+                json.dump(self.source.pop("objects"), f)
+
+        # Append the new results after the results of the last save. Anything written after them by a save that was
+        # interrupted is overwritten
+        with open(self.results_path, "ab") as f:
+            f.truncate(self._results_size)
+            for result in itertools.islice(self.results, self._saved_results, None):
+                f.write(json.dumps(result).encode() + b"\n")
+            self._results_size = f.tell()
+        self._saved_results = len(self.results)
+
+        checkpoint = {
+            "source": self.source,
+            "processed": self.processed,
+            "results_size": self._results_size,
+            "started": self.started,
+            "updated": datetime.now(timezone.utc).isoformat(),
+        }
+
+        tmp_path = self.file_path.with_name(f"{self.file_path.name}.tmp")
+
+        # Write to a temporary file first so that an interrupted save doesn't corrupt the checkpoint
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.file_path)
+
+        self._last_save = time.time()
+        LOGGER.info(f"Saved checkpoint to {self.file_path} after {self.processed} objects")
+
+    def delete(self):
+        """Delete the checkpoint and its results and objects files"""
+
+        for file_path in (self.file_path, self.results_path, self.objects_path):
+            if file_path.exists():
+                file_path.unlink()
+
+    def harvest(self, ctx, module):
+        """Iterate over a harvest, recording the progress, and return the harvested objects or None if it was stopped
+
+        The IDs of the objects harvested so far are saved as the results. The objects themselves are saved to the data
+        store page by page, so the objects harvested before the harvest was resumed are loaded from there
+        """
+
+        harvest = self.objects
+        objects = [obj for obj in (ctx.obj.store.get_object(harvest.table, i) for i in self.results) if obj]
+        completed = False
+
+        try:
+            for obj in harvest:
+                objects.append(obj)
+                self.advance(obj["id"])
+
+            completed = not harvest.error
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            self.close(ctx, completed, module, f"Harvest stopped after {self.processed} {harvest.object_name}")
+
+        return objects if completed else None
+
+    def close(self, ctx, completed, module, summary=None):
+        """Delete the checkpoint if the check was completed or save it so that the check can be resumed"""
+
+        if completed:
+            self.delete()
+            return
+
+        self.save()
+
+        summary = summary or f"Check stopped after {self.processed} objects ({len(self.results)} found)"
+        msg = f"{summary}. Progress saved to {self.file_path}. Execute the module again to resume"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=module, event_type="INFO", event=msg)
+        click.echo(f"[*] {msg}")
+
+
+class SkippedObjects:
+    """Iterable over the objects of a data store table, file or list after skipping the objects already checked"""
+
+    def __init__(self, objects, skip):
+        self.objects = objects
+        self.skip = skip
+
+    def __len__(self):
+        return max(len(self.objects) - self.skip, 0)
+
+    def __iter__(self):
+        return itertools.islice(self.objects, self.skip, None)
+
+
+def resume_checkpoint(ctx, name, module):
+    """Offer to resume the check of a module from its checkpoint. Returns the checkpoint or None"""
+
+    checkpoint = Checkpoint.load(ctx, name)
+
+    if checkpoint is None:
+        return None
+
+    if checkpoint.source["type"] == "file" and not Path(checkpoint.source["file_path"]).exists():
+        msg = f'File not found, {checkpoint.source["file_path"]}. Unable to resume from checkpoint'
+        LOGGER.error(msg)
+        index_event(ctx.obj.es, module=module, event_type="ERROR", event=msg)
+        click.secho(f"[!] {msg}", fg="red")
+        checkpoint.delete()
+        return None
+
+    if click.confirm(
+        f"[*] A previous check was stopped after {checkpoint.processed} objects ({len(checkpoint.results)} found) "
+        f"on {checkpoint.started}. Do you want to resume it?",
+        default=True,
+    ):
+        msg = f"Resuming check from checkpoint {checkpoint.file_path}"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=module, event_type="INFO", event=msg)
+        click.echo(f"[*] {msg}")
+        return checkpoint
+
+    checkpoint.delete()
+    return None
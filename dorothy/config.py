@@ -23,31 +23,195 @@ import hashlib
 import json
 import logging.config
 import os
+import re
+import time
 from datetime import datetime
+from pathlib import Path
 
 import click
-from tabulate import tabulate
 
 LOGGER = logging.getLogger(__name__)
 
+# Default values for settings that can be changed for each configuration profile
+DEFAULT_SETTINGS = {
+    # Percentage of each Okta API rate limit to leave unused for other API clients (e.g. production traffic)
+    "rate_limit_headroom": 10,
+    # Number of worker threads used to check users and groups in parallel. 1 checks them one at a time
+    "max_workers": 1,
+    # Hours to reuse the roles and MFA factors retrieved for unchanged users and groups. 0 disables the cache. Okta
+    # doesn't update lastUpdated when roles are assigned or factors are enrolled, so roles and factors changed outside
+    # Dorothy can be reported stale for up to this many hours. Off by default
+    "cache_max_age": 0,
+    # Days to keep saved data files. 0 keeps files forever
+    "retention_max_age": 0,
+    # MB of saved data files to keep. The oldest files are deleted first. 0 doesn't limit the size
+    "retention_max_size": 0,
+    # Number of saved data files to keep for each type of data (e.g. harvested_users). 0 keeps all files
+    "retention_keep_last": 0,
+}
+# Minimum and maximum values of numeric settings. None doesn't limit the value. A headroom of 100% or more would block
+# every request until the rate limit is reset
+SETTING_RANGES = {
+    "rate_limit_headroom": (0, 99),
+    "max_workers": (1, None),
+    "cache_max_age": (0, None),
+    "retention_max_age": (0, None),
+    "retention_max_size": (0, None),
+    "retention_keep_last": (0, None),
+}
+
+# Manifest of the files in the data directory so that the directory doesn't have to be scanned at startup
+MANIFEST_FILE = "manifest.json"
+# Saved data files are named <profile ID>_<object type>_<M-D-YYYY_H-M>.<extension>
+SAVED_FILE_PATTERN = re.compile(
+    r"^(?P<profile_id>[^_]+)_(?P<object_type>.+)_\d+-\d+-\d+_\d+-\d+\.(json|ndjson)(\.gz|\.zst)?$"
+)
+
 
 def check_saved_data(data_dir):
     """Check size of data directory"""
 
-    dir_size = 0
-    files = list(data_dir.rglob("*"))
+    manifest = load_manifest(data_dir)
+    dir_size = sum(entry["size"] for entry in manifest.values())
 
-    for file in files:
-        dir_size += os.path.getsize(file)
+    # The data store of each configuration profile changes size without being written by write_json_file
+    dir_size += sum(os.path.getsize(file) for file in data_dir.glob("*.db"))
 
     dir_size = round(dir_size / 1024 / 1024)
 
     if dir_size > 100:
         click.secho(
-            f"[!] Data directory {data_dir} is over 100 MB. Consider deleting files that are no longer needed", fg="red"
+            f"[!] Data directory {data_dir} is over 100 MB. Consider deleting files that are no longer needed or "
+            f'setting a retention policy with "manage-config change-setting"',
+            fg="red",
         )
 
 
+def load_manifest(data_dir):
+    """Load the manifest of saved data files. The manifest is rebuilt from the data directory if it doesn't exist"""
+
+    try:
+        with open(data_dir / MANIFEST_FILE, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return rebuild_manifest(data_dir)
+
+
+def save_manifest(data_dir, manifest):
+    """Save the manifest of saved data files"""
+
+    file_path = data_dir / MANIFEST_FILE
+    tmp_path = data_dir / f"{MANIFEST_FILE}.tmp"
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    # Write to a temporary file first so that an interrupted save doesn't corrupt the manifest
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, file_path)
+
+
+def rebuild_manifest(data_dir):
+    """Build the manifest by scanning the data directory once. E.g. for files saved by earlier versions of Dorothy"""
+
+    manifest = {}
+
+    if not data_dir.exists():
+        return manifest
+
+    for file in data_dir.iterdir():
+        match = SAVED_FILE_PATTERN.match(file.name)
+
+        if match and file.is_file():
+            stat = file.stat()
+            manifest[file.name] = {
+                "profile_id": match.group("profile_id"),
+                "object_type": match.group("object_type"),
+                "size": stat.st_size,
+                "created": stat.st_mtime,
+            }
+
+    LOGGER.info(f"Rebuilt manifest of {len(manifest)} saved data files in {data_dir}")
+    save_manifest(data_dir, manifest)
+
+    return manifest
+
+
+def record_saved_file(file_path, profile_id, object_type):
+    """Add a file written to the data directory to the manifest"""
+
+    file_path = Path(file_path)
+    manifest = load_manifest(file_path.parent)
+    manifest[file_path.name] = {
+        "profile_id": profile_id,
+        "object_type": object_type,
+        "size": file_path.stat().st_size,
+        "created": time.time(),
+    }
+    save_manifest(file_path.parent, manifest)
+
+
+def remove_saved_files(data_dir, file_names):
+    """Delete saved data files and remove them from the manifest"""
+
+    manifest = load_manifest(data_dir)
+
+    for file_name in file_names:
+        file_path = data_dir / file_name
+        if file_path.exists():
+            file_path.unlink()
+        manifest.pop(file_name, None)
+
+        LOGGER.info(f"File deleted ({file_path})")
+
+    save_manifest(data_dir, manifest)
+
+
+def apply_retention_policy(data_dir, profile_id, settings):
+    """Delete the saved data files of a configuration profile that the retention policy in its settings doesn't keep
+
+    Returns the names of the deleted files
+    """
+
+    manifest = load_manifest(data_dir)
+    # Newest files first
+    files = sorted(
+        ((name, entry) for name, entry in manifest.items() if entry["profile_id"] == profile_id),
+        key=lambda item: item[1]["created"],
+        reverse=True,
+    )
+
+    expired = set()
+    now = time.time()
+
+    if settings["retention_max_age"]:
+        expired.update(name for name, entry in files if now - entry["created"] > settings["retention_max_age"] * 86400)
+
+    if settings["retention_keep_last"]:
+        kept = {}
+        for name, entry in files:
+            kept[entry["object_type"]] = kept.get(entry["object_type"], 0) + 1
+            if kept[entry["object_type"]] > settings["retention_keep_last"]:
+                expired.add(name)
+
+    if settings["retention_max_size"]:
+        total_size = 0
+        for name, entry in files:
+            if name in expired:
+                continue
+            total_size += entry["size"]
+            if total_size > settings["retention_max_size"] * 1024 * 1024:
+                expired.add(name)
+
+    if expired:
+        remove_saved_files(data_dir, expired)
+
+        msg = f"Deleted {len(expired)} saved data files based on the retention policy"
+        LOGGER.info(msg)
+        click.echo(f"[*] {msg}")
+
+    return sorted(expired)
+
+
 def load_config_profiles(config_dir):
     """Load all configuration profiles from the config dir"""
 
@@ -72,12 +236,42 @@ def load_config_profiles(config_dir):
         config_profiles.append((index + 1, config["description"], config["okta_url"]))
 
     if config_profiles:
+        from tabulate import tabulate
+
         headers = ["#", "Description", "URL"]
         click.echo(tabulate(config_profiles, headers=headers, tablefmt="pretty"))
 
     return config_files
 
 
+def find_profile(config_dir, name=None):
+    """Find a configuration profile by its ID or description, or the only profile if no name is given
+
+    Returns the profile and an error message, one of which is None
+    """
+
+    config_files = []
+    for file in config_dir.glob("*.json"):
+        with open(file, "r") as f:
+            config_files.append(json.load(f))
+
+    if name:
+        matches = [config for config in config_files if name in (config["id"], config["description"])]
+    else:
+        matches = config_files
+
+    if len(matches) == 1:
+        return matches[0], None
+
+    if not matches and name:
+        return None, f'No configuration profile "{name}" found in directory {config_dir}'
+    if not matches:
+        return None, f"No configuration profiles found in directory {config_dir}"
+
+    descriptions = ", ".join(f'"{config["description"]}" ({config["id"]})' for config in matches)
+    return None, f"More than one configuration profile matches. Choose one of {descriptions}"
+
+
 def choose_profile(config_files):
     """Show brief info on each Okta environment found in loaded configuration profiles"""
 
@@ -127,6 +321,8 @@ def create_profile(config_dir):
         "api_token": api_token,
     }
 
+    config_dir.mkdir(parents=True, exist_ok=True)
+
     if click.confirm("[*] Do you want to store the API token in the local config file?", default=True):
         with open(file_path, "w") as f:
             json.dump(config, f, indent=4)
@@ -141,3 +337,51 @@ def create_profile(config_dir):
             json.dump(config_without_token, f, indent=4)
 
     return config
+
+
+def load_settings(config):
+    """Load the settings from a configuration profile, using default values for any settings that aren't set"""
+
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(config.get("settings", {}))
+
+    return settings
+
+
+def parse_setting(name, value):
+    """Cast the value entered for a setting to the same type as the setting's default value
+
+    Raises ValueError if the value can't be cast or is outside the range of the setting
+    """
+
+    setting_type = type(DEFAULT_SETTINGS[name])
+
+    if setting_type is bool:
+        if value.lower() in ("true", "yes", "1"):
+            return True
+        elif value.lower() in ("false", "no", "0"):
+            return False
+        raise ValueError(f"Invalid boolean value: {value}")
+
+    parsed = setting_type(value)
+    minimum, maximum = SETTING_RANGES.get(name, (None, None))
+
+    if (minimum is not None and parsed < minimum) or (maximum is not None and parsed > maximum):
+        raise ValueError(f"Value out of range for {name}: {value}")
+
+    return parsed
+
+
+def save_settings(config_dir, profile_id, settings):
+    """Save settings to a configuration profile"""
+
+    file_path = config_dir / f"{profile_id}.json"
+
+    with open(file_path, "r") as f:
+        config = json.load(f)
+
+    # Only store settings that differ from the default values
+    config["settings"] = {k: v for k, v in settings.items() if DEFAULT_SETTINGS.get(k) != v}
+
+    with open(file_path, "w") as f:
+        json.dump(config, f, indent=4)
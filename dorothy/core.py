@@ -19,23 +19,72 @@
 
 # Miscellaneous functions used by a number of modules
 
+import copy
+import gzip
 import hashlib
+import io
 import json
 import logging.config
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from importlib import import_module
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import urlparse
 
 import click
 import requests
-import yaml
-from elasticsearch import Elasticsearch
 from requests.adapters import HTTPAdapter
-from tabulate import tabulate
+
+# zstd compression for saved data is used if the optional zstandard package is installed: pip install zstandard
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from dorothy.cassette import RecordingAdapter, ReplayAdapter
+from dorothy.config import record_saved_file
+from dorothy.metrics import RequestMetrics
+from dorothy.ratelimit import OktaRetry, RateLimiter
+from dorothy.registry import MODULES
 
 LOGGER = logging.getLogger(__name__)
 URL_OR_API_TOKEN_ERROR = "ERROR. Verify that the Okta URL and API token in your configuration profile are correct"
+# Key of the header record in files written by write_json_file and the version of the file format
+SNAPSHOT_HEADER = "dorothy_snapshot"
+SNAPSHOT_VERSION = 1
+# Magic bytes at the start of compressed files
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Maximum number of users that Okta returns in a single page
+MAX_USERS_LIMIT = 200
+
+# Options for modules that harvest users. They are sent to Okta to only harvest the matching users
+USER_HARVEST_OPTIONS = {
+    "search": {
+        "value": None,
+        "required": False,
+        "help": 'Okta search expression. E.g. status eq "ACTIVE" or profile.department eq "IT"',
+    },
+    "filter": {
+        "value": None,
+        "required": False,
+        "help": 'Okta filter expression. E.g. status eq "LOCKED_OUT". Ignored if a search expression is set',
+    },
+    "query": {
+        "value": None,
+        "required": False,
+        "help": "Find users whose first name, last name or email starts with the query. Ignored if a search or filter "
+        "expression is set",
+    },
+    "limit": {
+        "value": None,
+        "required": False,
+        "help": f"Number of users returned in each page (1-{MAX_USERS_LIMIT})",
+    },
+}
 
 
 @dataclass
@@ -47,6 +96,9 @@ class Module:
     def print_info(self):
         """Print the module's available options and current values"""
 
+        # tabulate is imported when a table is printed because it's slow to import
+        from tabulate import tabulate
+
         # Print module options in table format
         headers = ["Option", "Value", "Required", "Description"]
         options = [(k.replace("_", "-"), v["value"], v["required"], v["help"]) for k, v in self.module_options.items()]
@@ -64,8 +116,11 @@ class Module:
                 v = list(v.strip().split(","))
                 self.module_options[k]["value"] = v
             # Only set the option's value if the user entered one to avoid overwriting previous settings
-            elif v:
+            elif isinstance(v, str) and v:
                 self.module_options[k]["value"] = v.strip()
+            # Values already converted by click (e.g. integers) are stored as they are
+            elif v is not None:
+                self.module_options[k]["value"] = v
             else:
                 pass
 
@@ -96,6 +151,260 @@ class Module:
                 return error
 
 
+def user_harvest_options():
+    """Return a new copy of the options for modules that harvest users"""
+
+    return copy.deepcopy(USER_HARVEST_OPTIONS)
+
+
+def user_harvest_params(module_options):
+    """Return the keyword arguments for OktaOrg.iter_users from the configured options of a module"""
+
+    return {
+        "query": module_options["query"]["value"],
+        "search_filter": module_options["filter"]["value"],
+        "search": module_options["search"]["value"],
+        "limit": module_options["limit"]["value"],
+    }
+
+
+def describe_user_harvest(module_options):
+    """Describe which users will be harvested with the configured options of a module. E.g. for log messages"""
+
+    conditions = [
+        f'{name} {module_options[name]["value"]}'
+        for name in ("search", "filter", "query")
+        if module_options[name]["value"]
+    ]
+
+    if conditions:
+        return f'Okta users matching {", ".join(conditions)}'
+    return "all Okta users"
+
+
+@dataclass
+class ApiResponse:
+    """Result of a request sent to the Okta API. The response body is decoded once and stored in data"""
+
+    ok: bool
+    status_code: int = None
+    reason: str = None
+    # Decoded JSON response body
+    data: object = None
+    links: dict = field(default_factory=dict)
+    # Seconds taken to send the request and receive the response
+    elapsed: float = 0.0
+    # Exception raised if the request couldn't be sent. E.g. a connection error
+    exception: Exception = None
+
+    @property
+    def next_url(self):
+        """URL of the next page of results"""
+
+        return self.links.get("next", {}).get("url")
+
+    def error_details(self):
+        """Format the details of an error response"""
+
+        if self.exception is not None:
+            return f"    {URL_OR_API_TOKEN_ERROR}\n    Error: {self.exception}"
+
+        data = self.data if isinstance(self.data, dict) else {}
+
+        return (
+            f"    Response Code: {self.status_code} | Response Reason: {self.reason}\n"
+            f'    Error Code: {data.get("errorCode")} | Error Summary: {data.get("errorSummary")}'
+        )
+
+
+@lru_cache(maxsize=None)
+def okta_headers(api_token):
+    """Build the headers for requests to the Okta API. Headers are only built once for each API token"""
+
+    return {
+        "Accept": "application/json",
+        "Content-Type": "application/json",
+        "Authorization": f"SSWS {api_token}",
+    }
+
+
+def api_request(ctx, method, url, params=None, payload=None):
+    """Send a request to the Okta API and return an ApiResponse
+
+    url can be a full URL (e.g. the next page of results) or a path relative to the Okta API base URL
+    """
+
+    if not url.startswith("http"):
+        url = f"{ctx.obj.base_url}{url}"
+
+    start = time.perf_counter()
+
+    try:
+        response = ctx.obj.session.request(
+            method, url, headers=okta_headers(ctx.obj.api_token), params=params, json=payload, timeout=7
+        )
+    except Exception as e:
+        LOGGER.error(e, exc_info=True)
+        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
+        return ApiResponse(ok=False, elapsed=time.perf_counter() - start, exception=e)
+
+    # Some responses (e.g. for lifecycle operations and deletes) don't have a JSON body
+    try:
+        data = response.json()
+    except ValueError:
+        data = None
+
+    elapsed = time.perf_counter() - start
+    LOGGER.debug(f"{method} {urlparse(url).path} {response.status_code} {elapsed:.3f}s")
+
+    return ApiResponse(
+        ok=response.ok,
+        status_code=response.status_code,
+        reason=response.reason,
+        data=data,
+        links=response.links,
+        elapsed=elapsed,
+    )
+
+
+def report_error(ctx, msg, response, module=__name__):
+    """Log, index and print an error message with the details of the error response"""
+
+    msg = f"{msg}\n{response.error_details()}"
+    LOGGER.error(msg)
+    index_event(ctx.obj.es, module=module, event_type="ERROR", event=msg)
+    click.secho(f"[!] {msg}", fg="red")
+
+    return msg
+
+
+def iter_pages(ctx, url, params=None):
+    """Yield an ApiResponse for each page of a paginated listing
+
+    The next page is requested in a background thread while the caller processes the current page. Iteration stops
+    after the last page or the first error response
+    """
+
+    prefetch_ctx = worker_context(ctx)
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dorothy-prefetch")
+    future = executor.submit(api_request, prefetch_ctx, "GET", url, params)
+
+    try:
+        while future:
+            response = future.result()
+
+            if response.ok and response.next_url:
+                # The URL of the next page already includes the query parameters
+                future = executor.submit(api_request, prefetch_ctx, "GET", response.next_url)
+            else:
+                future = None
+
+            yield response
+
+            if not response.ok:
+                return
+
+    finally:
+        if future:
+            future.cancel()
+        executor.shutdown(wait=True)
+        prefetch_ctx.obj.session.close()
+
+
+@dataclass
+class Harvest:
+    """Iterable over all objects in a paginated listing (e.g. /users) that yields objects page by page
+
+    Iterate over the harvest to start processing objects from the first page while the next page is still being
+    retrieved. After iteration, error is True if a page couldn't be retrieved
+    """
+
+    ctx: object
+    url: str
+    # Name of the objects for messages. E.g. "users"
+    object_name: str
+    params: dict = None
+    # Only log and index the number of objects in each page instead of printing it
+    mute: bool = False
+    # Table of the data store to save the objects in. E.g. "users"
+    table: str = None
+    # The listing returns all objects, so objects that aren't returned are deleted from the data store
+    full: bool = False
+    # Number of objects to skip on the first page. E.g. when resuming from a checkpoint
+    skip: int = 0
+    # Time the harvest was started. A resumed harvest keeps the start time of the original harvest
+    started: float = None
+    error: bool = False
+    count: int = 0
+    _pages: list = field(default_factory=list, repr=False)
+
+    @classmethod
+    def from_cursor(cls, ctx, cursor, mute=True):
+        """Create a harvest that resumes from a cursor returned by cursor()"""
+
+        return cls(ctx, mute=mute, **cursor)
+
+    def cursor(self, consumed):
+        """Return the position in the listing after the first consumed objects, e.g. to save in a checkpoint
+
+        The position is the URL of the page with the next object and the number of objects to skip on that page
+        """
+
+        position = {
+            "url": self.url,
+            "object_name": self.object_name,
+            "params": self.params,
+            "table": self.table,
+            "full": self.full,
+            "skip": self.skip,
+            "started": self.started,
+        }
+
+        for start, url, params, skip in reversed(self._pages):
+            if start <= consumed:
+                position.update(url=url, params=params, skip=skip + consumed - start)
+                break
+
+        return position
+
+    def __iter__(self):
+        self.error = False
+        self.count = 0
+        self.started = self.started or time.time()
+        # Position of the first object yielded from each page, the URL and parameters of the page and the number of
+        # objects skipped on the page
+        self._pages = []
+        page_url, page_params, skip = self.url, self.params, self.skip
+
+        for response in iter_pages(self.ctx, self.url, self.params):
+            if not response.ok:
+                report_error(self.ctx, f"Error retrieving {self.object_name}", response)
+                self.error = True
+                return
+
+            msg = f"Retrieved information for {len(response.data)} {self.object_name}"
+            LOGGER.info(msg)
+            index_event(self.ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+            if not self.mute:
+                click.secho(f"[*] {msg}", fg="green")
+
+            if self.table:
+                self.ctx.obj.store.save_objects(self.table, response.data)
+
+            objects = response.data[skip:]
+            self._pages.append((self.count, page_url, page_params, skip))
+            # The URL of the next page already includes the query parameters
+            page_url, page_params, skip = response.next_url, None, 0
+
+            self.count += len(objects)
+            yield from objects
+
+        # Only reached if all pages were retrieved and the caller didn't stop iterating early
+        if self.table and self.full:
+            self.ctx.obj.store.prune_objects(self.table, self.started)
+            self.ctx.obj.store.record_harvest(self.table)
+
+
 @dataclass
 class OktaOrg:
     """Data class for an Okta organization"""
@@ -106,134 +415,73 @@ class OktaOrg:
     def get_current_user(self, ctx):
         """Get the user linked to the current API token"""
 
-        payload = {}
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
-        url = f"{self.base_url}/users/me"
-
-        try:
-            response = ctx.obj.session.get(url, headers=headers, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        response = api_request(ctx, "GET", "/users/me")
 
         if not response.ok:
-            msg = (
-                f"Error retrieving user information\n"
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, "Error retrieving user information", response)
             return
 
-        if response.ok:
-            user = OktaUser(response.json())
-            user.print_info()
-            return user
+        user = OktaUser(response.data)
+        user.print_info()
+        return user
 
     def get_user(self, ctx, user_id):
         """Get a user from the Okta environment using the user's ID"""
 
-        payload = {}
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
-
-        url = f"{self.base_url}/users/{user_id}"
-
-        try:
-            response = ctx.obj.session.get(url, headers=headers, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        response = api_request(ctx, "GET", f"/users/{user_id}")
 
         if not response.ok:
-            msg = (
-                f"Error retrieving user information\n"
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, "Error retrieving user information", response)
             click.echo("[*] This error is expected if the user object was deleted")
             user = None
             return user
 
-        if response.ok:
-            user = OktaUser(response.json())
-            user.print_info()
-            return user
+        user = OktaUser(response.data)
+        user.print_info()
+        return user
 
-    def get_users(self, ctx, query=None, search_filter=None, search=None):
-        """Get all users from the Okta environment with pagination in most cases
+    def list_role_assignees(self, ctx):
+        """List the IDs of all users with one or more admin roles assigned, directly or through a group
 
-        If no parameters are provided, all users that do not have a status of DEPROVISIONED are listed
+        The IAM role assignees API returns the users with admin roles without checking the roles of every user. None is
+        returned if the API isn't available for the Okta environment or the API token
         """
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
-        # Default 'limit' value (number of results returned) is 200
-        params = {}
-        payload = {}
-
-        url = f"{self.base_url}/users"
-
-        next_page = 1
-        harvested_users = []
-
-        while next_page:
-            try:
-                response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-            except Exception as e:
-                LOGGER.error(e, exc_info=True)
-                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-                click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-                response = None
-
-            if response.ok:
-                msg = f"Retrieved information for {len(response.json())} users"
+        user_ids = []
+        url = "/iam/assignees/users"
+
+        while url:
+            response = api_request(ctx, "GET", url)
+
+            if not response.ok or not isinstance(response.data, dict):
+                msg = f"Unable to list users with admin roles using the role assignees API\n{response.error_details()}"
                 LOGGER.info(msg)
                 index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-                click.secho(f"[*] {msg}", fg="green")
-            else:
-                msg = (
-                    f"Error retrieving users\n"
-                    f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                    f'    Error Code: {response.json().get("errorCode")} | '
-                    f'Error Summary: {response.json().get("errorSummary")}'
-                )
-                LOGGER.error(msg)
-                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-                click.secho(f"[!] {msg}", fg="red")
-                return
+                return None
 
-            users = response.json()
-            links = response.links
+            user_ids.extend(assignee["id"] for assignee in response.data.get("value", []))
+            # The next page is returned in the response body instead of the Link header
+            url = response.data.get("_links", {}).get("next", {}).get("href") or response.next_url
 
-            harvested_users.extend(users)
-            time.sleep(1)
+        msg = f"Found {len(user_ids)} users with admin roles assigned using the role assignees API"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
 
-            if links.get("next"):
-                next_page = links["next"]["url"]
-                url = next_page
-            else:
-                next_page = None
-                click.echo("[*] No more users found")
+        return user_ids
+
+    def get_users(self, ctx, checkpoint):
+        """Get all users from the Okta environment with pagination in most cases
+
+        The users are harvested from the checkpoint's harvest (see iter_users()), which saves the next page and the
+        users harvested so far so that an interrupted harvest can be resumed
+        """
+
+        harvested_users = checkpoint.harvest(ctx, __name__)
+
+        if harvested_users is None:
+            return
+
+        click.echo("[*] No more users found")
 
         if harvested_users:
             msg = f"Total users harvested: {len(harvested_users)}"
@@ -252,61 +500,39 @@ class OktaOrg:
 
         return harvested_users
 
-    def get_groups(self, ctx):
-        """Get all groups from the Okta environment"""
+    def iter_users(self, ctx, query=None, search_filter=None, search=None, limit=None, mute=True):
+        """Iterate over all users from the Okta environment page by page without storing them
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
+        The query, filter and search expressions are evaluated by Okta so that only the matching users are returned
+        """
 
-        params = {}
-        payload = {}
+        # Okta returns 200 users per page if no limit is set
+        params = {"q": query, "filter": search_filter, "search": search, "limit": limit or MAX_USERS_LIMIT}
+        params = {k: v for k, v in params.items() if v is not None}
+        full = not (query or search_filter or search)
 
-        url = f"{self.base_url}/groups"
+        return Harvest(ctx, "/users", "users", params=params, mute=mute, table="users", full=full)
 
-        next_page = 1
-        harvested_groups = []
+    def iter_groups(self, ctx, search_filter=None, mute=True):
+        """Iterate over all groups from the Okta environment page by page without storing them"""
 
-        while next_page:
-            try:
-                response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-            except Exception as e:
-                LOGGER.error(e, exc_info=True)
-                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-                click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-                response = None
+        params = {"filter": search_filter} if search_filter else None
 
-            if response.ok:
-                msg = f"Retrieved information for {len(response.json())} groups"
-                LOGGER.info(msg)
-                index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-                click.secho(f"[*] {msg}", fg="green")
-            else:
-                msg = (
-                    f"Error retrieving groups\n"
-                    f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                    f'    Error Code: {response.json().get("errorCode")} | '
-                    f'Error Summary: {response.json().get("errorSummary")}'
-                )
-                LOGGER.error(msg),
-                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-                click.secho(f"[!] {msg}", fg="red")
-                return
+        return Harvest(ctx, "/groups", "groups", params=params, mute=mute, table="groups", full=not search_filter)
 
-            groups = response.json()
-            links = response.links
+    def get_groups(self, ctx, checkpoint):
+        """Get all groups from the Okta environment
 
-            harvested_groups.extend(groups)
-            time.sleep(1)
+        The groups are harvested from the checkpoint's harvest (see iter_groups()), which saves the next page and the
+        groups harvested so far so that an interrupted harvest can be resumed
+        """
 
-            if links.get("next"):
-                next_page = links["next"]["url"]
-                url = next_page
-            else:
-                next_page = None
-                click.echo("[*] No more groups found")
+        harvested_groups = checkpoint.harvest(ctx, __name__)
+
+        if harvested_groups is None:
+            return
+
+        click.echo("[*] No more groups found")
 
         if harvested_groups:
             msg = f"Total groups harvested: {len(harvested_groups)}"
@@ -333,48 +559,18 @@ class OktaOrg:
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.echo(f"[*] {msg}")
 
-        harvested_policies = []
-
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
-
-        params = {"type": policy_type}
-        payload = {}
-
-        url = f"{self.base_url}/policies"
-
-        try:
-            response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
-
-        if response.ok:
-            msg = f"Retrieved {len(response.json())} policies with policy type, {policy_type}"
-            LOGGER.info(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-            click.secho(f"[*] {msg}", fg="green")
+        response = api_request(ctx, "GET", "/policies", params={"type": policy_type})
 
-            for policy in response.json():
-                harvested_policies.append(policy)
+        if not response.ok:
+            report_error(ctx, f"Error retrieving policies for policy type, {policy_type}", response)
+            return
 
-        else:
-            msg = (
-                f"Error retrieving policies for policy type, {policy_type}\n"
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | '
-                f'Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+        harvested_policies = list(response.data)
 
-            return
+        msg = f"Retrieved {len(harvested_policies)} policies with policy type, {policy_type}"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.secho(f"[*] {msg}", fg="green")
 
         if not harvested_policies:
             msg = "No policies found"
@@ -389,20 +585,11 @@ class OktaOrg:
 
         if rules:
             msg = f"Attempting to get policy and policy rules for policy {policy_id}"
-            LOGGER.info(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-            click.echo(f"[*] {msg}")
         else:
             msg = f"Attempting to get policy {policy_id}"
-            LOGGER.info(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-            click.echo(f"[*] {msg}")
-
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.echo(f"[*] {msg}")
 
         """
         The expand=rules query parameter returns up to twenty Rules for the specified Policy. If the Policy has more
@@ -415,45 +602,26 @@ class OktaOrg:
         else:
             params = {}
 
-        payload = {}
-        url = f"{self.base_url}/policies/{policy_id}"
+        response = api_request(ctx, "GET", f"/policies/{policy_id}", params=params)
 
-        try:
-            response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
-
-        if response.ok:
-            policy = response.json()
-
-            if rules:
-                msg = (
-                    f'Retrieved policy ID {policy_id} ({policy["name"]}) with {len(policy["_embedded"]["rules"])} rules'
-                )
-            else:
-                msg = f'Retrieved policy ID {policy_id} ({policy["name"]})'
-            LOGGER.info(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-            click.secho(f"[*] {msg}", fg="green")
-
-            return policy
-
-        else:
-            msg = (
-                f"Error retrieving policy {policy_id})\n"
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | '
-                f'Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+        if not response.ok:
+            report_error(ctx, f"Error retrieving policy {policy_id}", response)
             click.secho(
                 "[!] The policy might have more than the maximum (20) number of rules that can be retrieved", fg="red"
             )
+            return
+
+        policy = response.data
+
+        if rules:
+            msg = f'Retrieved policy ID {policy_id} ({policy["name"]}) with {len(policy["_embedded"]["rules"])} rules'
+        else:
+            msg = f'Retrieved policy ID {policy_id} ({policy["name"]})'
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.secho(f"[*] {msg}", fg="green")
+
+        return policy
 
     def get_policy_rule(self, ctx, policy_id, rule_id):
         """Get a policy rule object using the policy ID and rule ID"""
@@ -463,103 +631,38 @@ class OktaOrg:
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.echo(f"[*] {msg}")
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
+        response = api_request(ctx, "GET", f"/policies/{policy_id}/rules/{rule_id}")
 
-        params = {}
-        payload = {}
-
-        url = f"{self.base_url}/policies/{policy_id}/rules/{rule_id}"
+        if not response.ok:
+            report_error(ctx, f"Error retrieving rule {rule_id} from policy {policy_id}", response)
+            return
 
-        try:
-            response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        msg = f"Retrieved policy rule {rule_id} from policy {policy_id}"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.secho(f"[*] {msg}", fg="green")
 
-        if response.ok:
-            msg = f"Retrieved policy rule {rule_id} from policy {policy_id}"
-            LOGGER.info(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-            click.secho(f"[*] {msg}", fg="green")
+        rule = response.data
 
-            rule = response.json()
+        OktaPolicyRule(rule).print_info()
 
-            OktaPolicyRule(rule).print_info()
+        return rule
 
-            return rule
+    def iter_zones(self, ctx, mute=True):
+        """Iterate over all network zones from the Okta environment page by page without storing them"""
 
-        else:
-            msg = (
-                f"Error retrieving rule, {policy_id}\n"
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | '
-                f'Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+        return Harvest(ctx, "/zones", "zones", mute=mute, table="zones", full=True)
 
     def get_zones(self, ctx):
         """Get all network zones from the Okta environment"""
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
-
-        params = {}
-        payload = {}
-
-        url = f"{self.base_url}/zones"
-
-        next_page = 1
-        harvested_zones = []
-
-        while next_page:
-            try:
-                response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-            except Exception as e:
-                LOGGER.error(e, exc_info=True)
-                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-                click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-                response = None
-
-            if response.ok:
-                msg = f"Retrieved information for {len(response.json())} zones"
-                LOGGER.info(msg)
-                index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-                click.secho(f"[*] {msg}", fg="green")
-            else:
-                msg = (
-                    f"Error retrieving zones\n"
-                    f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                    f'    Error Code: {response.json().get("errorCode")} | '
-                    f'Error Summary: {response.json().get("errorSummary")}'
-                )
-                LOGGER.error(msg)
-                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-                click.secho(f"[!] {msg}", fg="red")
-                return
-
-            zones = response.json()
-            links = response.links
+        harvest = self.iter_zones(ctx, mute=False)
+        harvested_zones = list(harvest)
 
-            harvested_zones.extend(zones)
-            time.sleep(1)
+        if harvest.error:
+            return
 
-            if links.get("next"):
-                next_page = links["next"]["url"]
-                url = next_page
-            else:
-                next_page = None
-                click.echo("[*] No more zones found")
+        click.echo("[*] No more zones found")
 
         if harvested_zones:
             msg = f"Total zones harvested: {len(harvested_zones)}"
@@ -587,103 +690,38 @@ class OktaOrg:
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.echo(f"[*] {msg}")
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
-
-        params = {}
-        payload = {}
+        response = api_request(ctx, "GET", f"/zones/{zone_id}")
 
-        url = f"{self.base_url}/zones/{zone_id}"
+        if not response.ok:
+            report_error(ctx, f"Error retrieving zone {zone_id}", response)
+            return
 
-        try:
-            response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        msg = f"Retrieved zone {zone_id}"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.secho(f"[*] {msg}", fg="green")
 
-        if response.ok:
-            msg = f"Retrieved zone {zone_id}"
-            LOGGER.info(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-            click.secho(f"[*] {msg}", fg="green")
+        zone = OktaZone(response.data)
 
-            zone = OktaZone(response.json())
+        zone.print_info()
 
-            zone.print_info()
+        return zone
 
-            return zone
+    def iter_apps(self, ctx, mute=True):
+        """Iterate over all applications from the Okta environment page by page without storing them"""
 
-        else:
-            msg = (
-                f"Error retrieving zone {zone_id}\n"
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | '
-                f'Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+        return Harvest(ctx, "/apps", "applications", mute=mute, table="apps", full=True)
 
     def get_apps(self, ctx):
         """Get all applications from the Okta environment"""
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
-
-        params = {}
-        payload = {}
-
-        url = f"{self.base_url}/apps"
-
-        next_page = 1
-        harvested_apps = []
+        harvest = self.iter_apps(ctx, mute=False)
+        harvested_apps = list(harvest)
 
-        while next_page:
-            try:
-                response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-            except Exception as e:
-                LOGGER.error(e, exc_info=True)
-                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-                click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-                response = None
-
-            if response.ok:
-                msg = f"Retrieved information for {len(response.json())} applications"
-                LOGGER.info(msg)
-                index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-                click.secho(f"[*] {msg}", fg="green")
-            else:
-                msg = (
-                    f"Error retrieving applications\n"
-                    f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                    f'    Error Code: {response.json().get("errorCode")} | '
-                    f'Error Summary: {response.json().get("errorSummary")}'
-                )
-                LOGGER.error(msg)
-                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-                click.secho(f"[!] {msg}", fg="red")
-                return
-
-            apps = response.json()
-            links = response.links
-
-            harvested_apps.extend(apps)
-            time.sleep(1)
+        if harvest.error:
+            return
 
-            if links.get("next"):
-                next_page = links["next"]["url"]
-                url = next_page
-            else:
-                next_page = None
-                click.echo("[*] No more applications found")
+        click.echo("[*] No more applications found")
 
         if harvested_apps:
             msg = f"Total applications harvested: {len(harvested_apps)}"
@@ -710,47 +748,22 @@ class OktaOrg:
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.echo(f"[*] {msg}")
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {self.api_token}",
-        }
-
-        params = {}
-        payload = {}
+        response = api_request(ctx, "GET", f"/apps/{app_id}")
 
-        url = f"{self.base_url}/apps/{app_id}"
-
-        try:
-            response = ctx.obj.session.get(url, headers=headers, params=params, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
-
-        if response.ok:
-            msg = f"Retrieved application {app_id}"
-            LOGGER.info(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-            click.secho(f"[*] {msg}", fg="green")
+        if not response.ok:
+            report_error(ctx, f"Error retrieving app {app_id}", response)
+            return
 
-            app = OktaApp(response.json())
+        msg = f"Retrieved application {app_id}"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.secho(f"[*] {msg}", fg="green")
 
-            app.print_info()
+        app = OktaApp(response.data)
 
-            return app
+        app.print_info()
 
-        else:
-            msg = (
-                f"Error retrieving app {app_id}\n"
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | '
-                f'Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+        return app
 
 
 @dataclass
@@ -774,43 +787,18 @@ class OktaUser:
     def get_groups(self, ctx):
         """Get the user's group memberships"""
 
-        payload = {}
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {ctx.obj.api_token}",
-        }
-
-        url = f"{ctx.obj.base_url}/users/{self.obj['id']}/groups"
-
         msg = f"Attempting to get group memberships for user ID {self.obj['id']}"
         LOGGER.info(msg)
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.echo(f"[*] {msg}")
 
-        try:
-            response = ctx.obj.session.get(url, headers=headers, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        response = api_request(ctx, "GET", f"/users/{self.obj['id']}/groups")
 
         if not response.ok:
-            msg = (
-                f"""Error retrieving user's group memberships\n"""
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, "Error retrieving user's group memberships", response)
             return
 
-        groups = []
-
-        if response.ok:
-            groups = response.json()
+        groups = response.data
 
         if groups:
             click.echo(f"[*] Group memberships for user ID {self.obj['id']}:")
@@ -820,9 +808,19 @@ class OktaUser:
 
         return groups
 
-    def list_roles(self, ctx, mute=False):
-        """List the admin roles assigned to the user"""
+    def list_roles(self, ctx, mute=False, cached=False):
+        """List the admin roles assigned to the user. Set cached to use the profile's result cache"""
+
+        if cached:
+            assigned_roles = ctx.obj.cache.get("roles", self.obj)
+            if assigned_roles is not None:
+                return assigned_roles, False
+
         assigned_roles, error = list_assigned_roles(ctx, self.obj["id"], object_type="user", mute=mute)
+
+        if cached and not error:
+            ctx.obj.cache.put("roles", self.obj, assigned_roles)
+
         return assigned_roles, error
 
     def assign_admin_role(self, ctx, role_type):
@@ -832,32 +830,18 @@ class OktaUser:
     def execute_lifecycle_operation(self, ctx, operation):
         """Execute a lifecycle operation on the user object to change its state"""
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {ctx.obj.api_token}",
-        }
-
         # Set sendEmail to False. The default value for sendEmail is True, which will send the one-time token to the
         # target user
         if click.confirm("[*] Do you want to send an email notification to the user/administrator?", default=False):
             params = {}
         else:
             params = {"sendEmail": "False"}
-        payload = {}
 
-        try:
-            if operation == "DELETE":
-                url = f'{ctx.obj.base_url}/users/{self.obj["id"]}'
-                response = ctx.obj.session.delete(url, headers=headers, params=params, json=payload, timeout=7)
-            else:
-                url = f'{ctx.obj.base_url}/users/{self.obj["id"]}/lifecycle/{operation.lower()}'
-                response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        if operation == "DELETE":
+            response = api_request(ctx, "DELETE", f'/users/{self.obj["id"]}', params=params, payload={})
+        else:
+            url = f'/users/{self.obj["id"]}/lifecycle/{operation.lower()}'
+            response = api_request(ctx, "POST", url, params=params, payload={})
 
         if response.ok:
             msg = f'Operation {operation} executed on user ID {self.obj["id"]}'
@@ -868,30 +852,19 @@ class OktaUser:
             ctx.obj.okta.get_user(ctx, self.obj["id"])
 
         else:
-            msg = (
-                f'Error executing {operation} on user ID {self.obj["id"]}\n'
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, f'Error executing {operation} on user ID {self.obj["id"]}', response)
 
             ctx.obj.okta.get_user(ctx, self.obj["id"])
 
             return
 
-    def list_enrolled_factors(self, ctx, mute=False):
-        """List the user's enrolled MFA factors"""
+    def list_enrolled_factors(self, ctx, mute=False, cached=False):
+        """List the user's enrolled MFA factors. Set cached to use the profile's result cache"""
 
-        payload = {}
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {ctx.obj.api_token}",
-        }
-
-        url = f'{ctx.obj.base_url}/users/{self.obj["id"]}/factors'
+        if cached:
+            enrolled_factors = ctx.obj.cache.get("factors", self.obj)
+            if enrolled_factors is not None:
+                return enrolled_factors, False
 
         msg = f'Attempting to get enrolled MFA factors for user {self.obj["id"]}'
         LOGGER.info(msg)
@@ -902,72 +875,40 @@ class OktaUser:
         enrolled_factors = []
         error = False
 
-        try:
-            response = ctx.obj.session.get(url, headers=headers, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        response = api_request(ctx, "GET", f'/users/{self.obj["id"]}/factors')
 
         if not response.ok:
-            msg = (
-                f'Error retrieving enrolled MFA factors for user {self.obj["id"]}\n'
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, f'Error retrieving enrolled MFA factors for user {self.obj["id"]}', response)
             error = True
             return enrolled_factors, error
 
-        if response.ok:
-            enrolled_factors = response.json()
+        enrolled_factors = response.data
+
+        if cached:
+            ctx.obj.cache.put("factors", self.obj, enrolled_factors)
 
         return enrolled_factors, error
 
     def reset_factor(self, ctx, factor_id):
         """Delete an enrolled MFA factor for the user"""
 
-        payload = {}
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {ctx.obj.api_token}",
-        }
-
-        url = f'{ctx.obj.base_url}/users/{self.obj["id"]}/factors/{factor_id}'
-
         msg = f'Attempting to delete enrolled MFA factor {factor_id} for user {self.obj["id"]}'
         LOGGER.info(msg)
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.echo(f"[*] {msg}")
 
-        try:
-            response = ctx.obj.session.delete(url, headers=headers, data=payload, timeout=7)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        response = api_request(ctx, "DELETE", f'/users/{self.obj["id"]}/factors/{factor_id}')
 
         if not response.ok:
-            msg = (
-                f'Error deleting MFA factor {factor_id} for user {self.obj["id"]}\n'
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, f'Error deleting MFA factor {factor_id} for user {self.obj["id"]}', response)
             return
 
-        if response.ok:
-            msg = f'MFA factor {factor_id} deleted for user {self.obj["id"]}'
-            LOGGER.info(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-            click.secho(f"[*] {msg}", fg="green")
+        ctx.obj.cache.invalidate("factors", self.obj["id"])
+
+        msg = f'MFA factor {factor_id} deleted for user {self.obj["id"]}'
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.secho(f"[*] {msg}", fg="green")
 
 
 @dataclass
@@ -986,10 +927,19 @@ class OktaGroup:
             f'    Description: {self.obj["profile"].get("description", "unknown")}'
         )
 
-    def list_roles(self, ctx, mute=False):
-        """List the admin roles assigned to the group"""
+    def list_roles(self, ctx, mute=False, cached=False):
+        """List the admin roles assigned to the group. Set cached to use the profile's result cache"""
+
+        if cached:
+            assigned_roles = ctx.obj.cache.get("roles", self.obj)
+            if assigned_roles is not None:
+                return assigned_roles, False
 
         assigned_roles, error = list_assigned_roles(ctx, self.obj["id"], object_type="group", mute=mute)
+
+        if cached and not error:
+            ctx.obj.cache.put("roles", self.obj, assigned_roles)
+
         return assigned_roles, error
 
     def assign_admin_role(self, ctx, role_type):
@@ -1017,25 +967,8 @@ class OktaZone:
     def change_state(self, ctx, operation):
         """Activate or deactivate the Okta network"""
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {ctx.obj.api_token}",
-        }
-
-        params = {}
-        payload = {}
-
-        url = f'{ctx.obj.base_url}/zones/{self.obj["id"]}/lifecycle/{operation.lower()}'
-
-        try:
-            response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-            time.sleep(1)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        response = api_request(ctx, "POST", f'/zones/{self.obj["id"]}/lifecycle/{operation.lower()}', payload={})
+        time.sleep(1)
 
         if response.ok:
             msg = f'Zone {self.obj["id"]} {operation.lower()}d'
@@ -1046,14 +979,7 @@ class OktaZone:
             ctx.obj.okta.get_zone(ctx, self.obj["id"])
 
         else:
-            msg = (
-                f'Error executing {operation} for zone {self.obj["id"]}\n'
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, f'Error executing {operation} for zone {self.obj["id"]}', response)
 
             ctx.obj.okta.get_zone(ctx, self.obj["id"])
 
@@ -1080,25 +1006,8 @@ class OktaApp:
     def change_state(self, ctx, operation):
         """Activate or deactivate the Okta application"""
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {ctx.obj.api_token}",
-        }
-
-        params = {}
-        payload = {}
-
-        url = f'{ctx.obj.base_url}/apps/{self.obj["id"]}/lifecycle/{operation.lower()}'
-
-        try:
-            response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-            time.sleep(1)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        response = api_request(ctx, "POST", f'/apps/{self.obj["id"]}/lifecycle/{operation.lower()}', payload={})
+        time.sleep(1)
 
         if response.ok:
             msg = f'Application {self.obj["id"]} {operation.lower()}d'
@@ -1109,14 +1018,7 @@ class OktaApp:
             ctx.obj.okta.get_app(ctx, self.obj["id"])
 
         else:
-            msg = (
-                f'Error executing {operation} for application {self.obj["id"]}\n'
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, f'Error executing {operation} for application {self.obj["id"]}', response)
 
             ctx.obj.okta.get_app(ctx, self.obj["id"])
 
@@ -1143,25 +1045,8 @@ class OktaPolicy:
     def change_state(self, ctx, operation):
         """Activate or deactivate the Okta policy"""
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {ctx.obj.api_token}",
-        }
-
-        params = {}
-        payload = {}
-
-        url = f'{ctx.obj.base_url}/policies/{self.obj["id"]}/lifecycle/{operation.lower()}'
-
-        try:
-            response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-            time.sleep(1)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        response = api_request(ctx, "POST", f'/policies/{self.obj["id"]}/lifecycle/{operation.lower()}', payload={})
+        time.sleep(1)
 
         if response.ok:
             msg = f'Policy {self.obj["id"]} {operation.lower()}d'
@@ -1170,14 +1055,7 @@ class OktaPolicy:
             click.secho(f"[*] {msg}", fg="green")
 
         else:
-            msg = (
-                f'Error executing {operation} for policy {self.obj["id"]}\n'
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, f'Error executing {operation} for policy {self.obj["id"]}', response)
 
             return
 
@@ -1201,25 +1079,9 @@ class OktaPolicyRule:
     def change_state(self, ctx, policy_id, operation):
         """Activate or deactivate the Okta policy rule"""
 
-        headers = {
-            "Accept": "application/json",
-            "Content-Type": "application/json",
-            "Authorization": f"SSWS {ctx.obj.api_token}",
-        }
-
-        params = {}
-        payload = {}
-
-        url = f'{ctx.obj.base_url}/policies/{policy_id}/rules/{self.obj["id"]}/lifecycle/{operation.lower()}'
-
-        try:
-            response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-            time.sleep(1)
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-            click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-            response = None
+        url = f'/policies/{policy_id}/rules/{self.obj["id"]}/lifecycle/{operation.lower()}'
+        response = api_request(ctx, "POST", url, payload={})
+        time.sleep(1)
 
         if response.ok:
             msg = f'Policy rule {self.obj["id"]} in policy {policy_id} {operation.lower()}d'
@@ -1230,14 +1092,7 @@ class OktaPolicyRule:
             ctx.obj.okta.get_policy_rule(ctx, policy_id, self.obj["id"])
 
         else:
-            msg = (
-                f'Error executing {operation} for rule {self.obj["id"]} in policy {policy_id}\n'
-                f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-                f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-            )
-            LOGGER.error(msg)
-            index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-            click.secho(f"[!] {msg}", fg="red")
+            report_error(ctx, f'Error executing {operation} for rule {self.obj["id"]} in policy {policy_id}', response)
 
             ctx.obj.okta.get_policy_rule(ctx, policy_id, self.obj["id"])
 
@@ -1247,47 +1102,130 @@ class OktaPolicyRule:
 def list_modules(obj):
     """List all of Dorothy's modules"""
 
-    # Yield all .py files in modules directory and subdirectories
-    modules_dir = obj.root_dir / "modules"
-    files = list(modules_dir.rglob("*.py"))
+    # Modules are listed from the registry so that they don't have to be imported
+    modules = [("Discovery", "whoami", "Get info for user linked with current API token")]
+    modules.extend((", ".join(module.tactics), module.name, module.description) for module in MODULES)
+    modules.append(("-", "manage-config", "Manage Dorothy's configuration profiles"))
 
-    module_files = []
-    # Filter the module names in this list
-    exclude = ["__init__", "defense_evasion", "discovery", "persistence", "impact", "manage_config"]
-    for index, file in enumerate(files):
-        if file.stem not in exclude:
-            module_files.append(file)
+    from tabulate import tabulate
 
-    modules = [("Discovery", "whoami", "Get info for user linked with current API token")]
+    # Print modules in table format
+    headers = ["Tactics", "Module Name", "Description"]
+    click.echo(tabulate(modules, headers=headers, tablefmt="pretty"))
+
+
+class OktaSession(requests.Session):
+    """Session instance that throttles requests to stay within the Okta API rate limits and records request metrics"""
+
+    def __init__(self, rate_limiter=None, metrics=None):
+        super().__init__()
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.metrics = metrics or RequestMetrics()
+        # Cassette that requests are recorded to or replayed from. Set by setup_session_instance()
+        self.cassette = None
+        # Session instances of worker threads share the transport adapters of the main session instance
+        self.shared_adapters = False
+
+    def request(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        self.rate_limiter.wait(url)
+        sent = time.perf_counter()
 
-    for module in module_files:
-        description = getattr(
-            import_module(f"dorothy.modules.{module.parent.name}.{module.stem}"), "MODULE_DESCRIPTION", "Missing"
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException:
+            self.metrics.record(method, url, None, {}, time.perf_counter() - sent, sent - start)
+            raise
+
+        self.metrics.record(
+            method, url, response.status_code, response.headers, time.perf_counter() - sent, sent - start
         )
-        tactics = getattr(import_module(f"dorothy.modules.{module.parent.name}.{module.stem}"), "TACTICS", "Missing")
+        self.rate_limiter.update(response)
 
-        modules.append((str(tactics).strip("[]").replace("'", ""), module.stem.replace("_", "-"), description))
+        return response
 
-    modules.append(("-", "manage-config", "Manage Dorothy's configuration profiles"))
+    def resize_pools(self, max_workers):
+        """Resize the connection pools of the transport adapters after the max_workers setting is changed"""
 
-    # Print modules in table format
-    headers = ["Tactics", "Module Name", "Description"]
-    click.echo(tabulate(modules, headers=headers, tablefmt="pretty"))
+        for adapter in set(self.adapters.values()):
+            if isinstance(adapter, HTTPAdapter) and adapter._pool_maxsize != pool_size(max_workers):
+                adapter.poolmanager.clear()
+                adapter.init_poolmanager(adapter._pool_connections, pool_size(max_workers), block=adapter._pool_block)
+
+    def close(self):
+        # The connection pools are closed with the main session instance
+        if not self.shared_adapters:
+            super().close()
 
 
-def setup_session_instance(url):
-    """Setup HTTPAdapter and session instance"""
+def pool_size(max_workers):
+    """Return the number of connections to keep alive, one for each worker thread plus one for the main thread or the
+    thread that prefetches the next page of results"""
 
-    # Setup a Transport Adapter (HTTPAdapter) with max_retries set
-    okta_adapter = HTTPAdapter(max_retries=3)
-    # Setup session instance
-    session = requests.Session()
-    # Use okta_adapter for all requests to endpoints that start with the base URL
-    session.mount(url, okta_adapter)
+    return max(max_workers, 1) + 1
+
+
+def setup_session_instance(url, rate_limit_headroom=10, cassette=None, max_workers=1):
+    """Setup HTTPAdapter and session instance
+
+    If a cassette is passed, requests are recorded to it or, in replay mode, answered from it without being sent
+    """
+
+    # Setup session instance that keeps a percentage of each rate limit free for other API clients
+    session = OktaSession(RateLimiter(headroom=rate_limit_headroom))
+    session.cassette = cassette
+
+    if cassette and cassette.mode == "replay":
+        # Replay every request, including the next pages of results that are linked with the tenant's URL
+        replay_adapter = ReplayAdapter(cassette)
+        for prefix in ("http://", "https://"):
+            session.mount(prefix, replay_adapter)
+        return session
+
+    # Setup a Transport Adapter (HTTPAdapter) that retries idempotent requests with backoff and keeps a connection
+    # alive for each thread that sends requests in parallel
+    adapter_args = {
+        "max_retries": OktaRetry(rate_limiter=session.rate_limiter, metrics=session.metrics),
+        "pool_maxsize": pool_size(max_workers),
+    }
+    okta_adapter = RecordingAdapter(cassette, **adapter_args) if cassette else HTTPAdapter(**adapter_args)
+    # Use okta_adapter for all requests to the tenant, not only those that start with the base URL
+    parsed_url = urlparse(url)
+    session.mount(f"{parsed_url.scheme}://{parsed_url.netloc}/", okta_adapter)
 
     return session
 
 
+@dataclass
+class WorkerContext:
+    """Minimal stand-in for a click context that is passed to functions executed by a background thread"""
+
+    # Copy of the Dorothy object with a session instance that belongs to the background thread
+    obj: object
+
+
+def worker_context(ctx):
+    """Create a context with its own session instance for use in a background thread
+
+    Session instances aren't shared between threads. The new session instance shares the rate limiter, request
+    metrics and transport adapters of the main session instance so that all threads stay within the same rate limits
+    and reuse the same pool of keep-alive connections. Close the session when it's no longer needed
+    """
+
+    session = OktaSession(ctx.obj.session.rate_limiter, ctx.obj.session.metrics)
+    session.cassette = ctx.obj.session.cassette
+
+    # Connection pools are thread-safe, so connections stay alive between fan-outs instead of being opened again
+    for prefix, adapter in ctx.obj.session.adapters.items():
+        session.mount(prefix, adapter)
+    session.shared_adapters = True
+
+    obj = copy.copy(ctx.obj)
+    obj.session = session
+
+    return WorkerContext(obj=obj)
+
+
 def whoami(ctx):
     """Get info for user linked with current API token"""
 
@@ -1319,53 +1257,174 @@ def whoami(ctx):
         click.secho(f"[!] {msg}", fg="red")
 
 
-def write_json_file(file_name: str, results: list) -> str:
-    """Write data to json file"""
+def write_json_file(file_name: str, results) -> str:
+    """Write data to a newline-delimited JSON (NDJSON) file
+
+    The first line is a header record with the profile ID, object type, time and number of objects. Each following
+    line is one object, so objects are written one at a time and can be read back one at a time. The file is
+    compressed as it is written. file_name must be in the format <data dir>/<profile ID>_<object type>. E.g.
+    ~/dorothy/data/<profile ID>_harvested_users
+    """
 
     now = datetime.now()
-    timestamp = f"_{now.month}-{now.day}-{now.year}_{now.hour}-{now.minute}.json"
+    # Files are compressed with zstd if it's available and gzip otherwise. Harvests compress 10-20x
+    extension = ".ndjson.zst" if zstandard else ".ndjson.gz"
+    timestamp = f"_{now.month}-{now.day}-{now.year}_{now.hour}-{now.minute}{extension}"
 
     file_path = file_name + timestamp
+    profile_id, _, object_type = Path(file_name).name.partition("_")
+
+    # A single object is written as a file with one record. E.g. a policy with its rules
+    if isinstance(results, dict):
+        results = [results]
 
     click.secho(f"[*] Writing results to {file_path}", fg="green")
-    with open(file_path, "w") as f:
-        json.dump(results, f, indent=4)
+
+    # The data directory is created when the first file is written to it
+    Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_file = None
+
+    if hasattr(results, "__len__"):
+        lines = (json.dumps(obj) + "\n" for obj in results)
+        count = len(results)
+    else:
+        # Results that are streamed (e.g. a harvest) are counted in a temporary file before the header is written
+        tmp_file = tempfile.TemporaryFile("w+", dir=Path(file_path).parent)
+        count = 0
+        for obj in results:
+            tmp_file.write(json.dumps(obj) + "\n")
+            count += 1
+        tmp_file.seek(0)
+        lines = tmp_file
+
+    header = {
+        SNAPSHOT_HEADER: {
+            "version": SNAPSHOT_VERSION,
+            "profile_id": profile_id,
+            "object_type": object_type,
+            "harvested": now.isoformat(),
+            "count": count,
+        }
+    }
+
+    try:
+        with open_data_file(file_path, "w") as f:
+            f.write(json.dumps(header) + "\n")
+            f.writelines(lines)
+    finally:
+        if tmp_file:
+            tmp_file.close()
+
+    record_saved_file(file_path, profile_id, object_type)
 
     return file_path
 
 
-def load_json_file(file_path: str) -> dict:
-    """Load JSON file from local host"""
+def load_json_file(file_path: str) -> "JsonSnapshot":
+    """Load a file written by write_json_file. Objects are read one at a time when iterating over the result
 
-    with open(file_path, "r") as f:
-        data = json.load(f)
+    Compressed files are detected from their first bytes. Files in the legacy format (a single JSON document) can also
+    be loaded
+    """
 
-    return data
+    return JsonSnapshot(Path(file_path))
 
 
-def setup_logging(root_dir, config_dir, logs_dir):
-    """Prepare location to write log files to"""
+def open_data_file(file_path, mode="r"):
+    """Open a saved data file in text mode with streaming compression or decompression
 
-    # Load logging_config_template.yaml before customizing it and storing a new local config file
-    logging_template = root_dir / "etc/logging_config_template.yaml"
+    Files are compressed when written if their name ends in .gz or .zst. The compression of files that are read is
+    detected from their magic bytes, so uncompressed files can still be read
+    """
+
+    file_path = Path(file_path)
 
-    # Load config template
-    with open(logging_template, "r") as f:
-        config = yaml.safe_load(f.read())
+    if mode == "w":
+        if file_path.suffix == ".gz":
+            return gzip.open(file_path, "wt")
+        if file_path.suffix == ".zst":
+            return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(open(file_path, "wb")), encoding="utf-8")
+        return open(file_path, "w")
 
-    # Set path for logging.handlers.RotatingFileHandler
-    config["handlers"]["file"]["filename"] = str(logs_dir.joinpath("dorothy.log"))
+    with open(file_path, "rb") as f:
+        magic = f.read(4)
 
-    # Write new config file
-    new_config_file = f"{config_dir}/logging_config.yaml"
-    with open(new_config_file, "w") as f:
-        yaml.dump(config, f)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(file_path, "rt")
 
-    return new_config_file
+    if magic.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError(
+                f"{file_path} is compressed with zstd. Install zstandard to read it: pip install zstandard"
+            )
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb")), encoding="utf-8")
 
+    return open(file_path, "r")
 
-def setup_elasticsearch_client(okta_url):
-    """Setup a connection in preparation of indexing Dorothy's logs in Elasticsearch"""
+
+class JsonSnapshot:
+    """Iterable over the objects in a file written by write_json_file
+
+    The header record of NDJSON files is available as header. Legacy JSON files are read in one go
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.header = None
+        self._legacy_data = None
+
+        with open_data_file(self.file_path) as f:
+            first_line = f.readline()
+
+        try:
+            record = json.loads(first_line)
+        except ValueError:
+            # Legacy files are pretty-printed, so the first line isn't a complete JSON document
+            record = None
+
+        if isinstance(record, dict) and SNAPSHOT_HEADER in record:
+            self.header = record[SNAPSHOT_HEADER]
+        elif record is None or isinstance(record, list):
+            self._legacy_data = self._load_legacy()
+
+    def _load_legacy(self):
+        with open_data_file(self.file_path) as f:
+            data = json.load(f)
+
+        return data if isinstance(data, list) else [data]
+
+    def __len__(self):
+        if self._legacy_data is not None:
+            return len(self._legacy_data)
+        if self.header is not None:
+            return self.header["count"]
+
+        return sum(1 for _ in self)
+
+    def __iter__(self):
+        if self._legacy_data is not None:
+            yield from self._legacy_data
+            return
+
+        with open_data_file(self.file_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+
+                record = json.loads(line)
+
+                if isinstance(record, dict) and SNAPSHOT_HEADER in record:
+                    continue
+
+                yield record
+
+
+def setup_elasticsearch_client(okta_url, data_dir):
+    """Setup a connection in preparation of indexing Dorothy's logs in Elasticsearch
+
+    Returns a bulk indexer that sends events to Elasticsearch in the background
+    """
 
     if click.confirm("[*] Do you want to index Dorothy's logs in Elasticsearch?", default=False):
         es_url = click.prompt("[*] Enter your Elasticsearch URL")
@@ -1373,37 +1432,36 @@ def setup_elasticsearch_client(okta_url):
         es_password = click.prompt(
             "[*] Enter your Elasticsearch password. The input for this value is hidden", hide_input=True
         )
+        # The Elasticsearch client takes a long time to import, so it's only imported if logs are indexed
+        from elasticsearch import Elasticsearch
+
+        from dorothy.indexer import BulkIndexer
+
         es_client = Elasticsearch([es_url], http_auth=(es_username, es_password), scheme="https")
+        indexer = BulkIndexer(es_client, data_dir / "elasticsearch_events.ndjson")
 
         event = f"Dorothy started using URL {okta_url}"
-        index_event(es_client, module=__name__, event_type="INFO", event=event)
+        index_event(indexer, module=__name__, event_type="INFO", event=event)
 
         click.echo(
             "[*] Create an index pattern named, 'dorothy' to review log events in Kibana. For more information, "
             "visit https://www.elastic.co/guide/en/kibana/current/index-patterns.html"
         )
-        return es_client
+        return indexer
     else:
         return
 
 
 def index_event(es, module, event_type, event):
-    """Index event in Elasticsearch"""
+    """Queue an event to be indexed in Elasticsearch by the bulk indexer"""
 
     timestamp = datetime.utcnow()
 
     if es:
-        try:
-            es.index(
-                index="dorothy",
-                id=hashlib.md5((str(timestamp) + str(event)).encode()).hexdigest(),
-                body={"timestamp": timestamp, "module": module, "event_type": event_type, "event": str(event)},
-            )
-        except Exception as e:
-            LOGGER.error(e, exc_info=True)
-            click.secho(
-                f"[!] Error indexing event in Elasticsearch. Review dorothy.log for further information", fg="red"
-            )
+        es.add(
+            hashlib.md5((str(timestamp) + str(event)).encode()).hexdigest(),
+            {"timestamp": timestamp.isoformat(), "module": module, "event_type": event_type, "event": str(event)},
+        )
 
 
 def list_assigned_roles(ctx, unique_id, object_type, mute=False):
@@ -1414,17 +1472,10 @@ def list_assigned_roles(ctx, unique_id, object_type, mute=False):
     Reference: https://help.okta.com/en/prod/Content/Topics/Security/administrators-admin-comparison.htm
     """
 
-    payload = {}
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"SSWS {ctx.obj.api_token}",
-    }
-
     if object_type == "user":
-        url = f"{ctx.obj.base_url}/users/{unique_id}/roles"
+        url = f"/users/{unique_id}/roles"
     elif object_type == "group":
-        url = f"{ctx.obj.base_url}/groups/{unique_id}/roles"
+        url = f"/groups/{unique_id}/roles"
     else:
         msg = "Unexpected type. Type must be 'user' or 'group'"
         LOGGER.error(msg)
@@ -1442,23 +1493,10 @@ def list_assigned_roles(ctx, unique_id, object_type, mute=False):
     roles = []
     error = False
 
-    try:
-        response = ctx.obj.session.get(url, headers=headers, data=payload, timeout=7)
-    except Exception as e:
-        LOGGER.error(e, exc_info=True)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-        click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-        response = None
+    response = api_request(ctx, "GET", url)
 
     if not response.ok:
-        msg = (
-            f"""Error retrieving {object_type}'s assigned roles\n"""
-            f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-            f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-        )
-        LOGGER.error(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-        click.secho(f"[!] {msg}", fg="red")
+        report_error(ctx, f"Error retrieving {object_type}'s assigned roles", response)
         click.secho(
             "[!] Only the SUPER_ADMIN role can view, assign, or remove admin roles. The user linked to the "
             "current API token might not have the SUPER_ADMIN role assigned",
@@ -1467,11 +1505,10 @@ def list_assigned_roles(ctx, unique_id, object_type, mute=False):
         error = True
         return roles, error
 
-    if response.ok:
-        roles = response.json()
+    roles = response.data
 
-        if not mute:
-            print_role_info(unique_id, roles, object_type=object_type)
+    if not mute:
+        print_role_info(unique_id, roles, object_type=object_type)
 
     return roles, error
 
@@ -1494,45 +1531,29 @@ def assign_admin_role(ctx, object_id, role_type, target):
     """Assign an admin role to a user or group"""
 
     if target == "user":
-        url = f"{ctx.obj.base_url}/users/{object_id}/roles"
+        url = f"/users/{object_id}/roles"
     elif target == "group":
-        url = f"{ctx.obj.base_url}/groups/{object_id}/roles"
+        url = f"/groups/{object_id}/roles"
     else:
         click.secho('''[!] Invalid type. Must be "user" or "group"''', fg="red")
         return
 
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"SSWS {ctx.obj.api_token}",
-    }
-
-    params = {}
-    payload = {"type": role_type}
-
-    try:
-        response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-    except Exception as e:
-        LOGGER.error(e, exc_info=True)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-        click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-        response = None
+    response = api_request(ctx, "POST", url, payload={"type": role_type})
 
     if response.ok:
+        if target == "group":
+            # The members of the group are assigned the role too, so the cached roles of any user can be stale
+            ctx.obj.cache.clear("roles")
+        else:
+            ctx.obj.cache.invalidate("roles", object_id)
+
         msg = f"Admin role, {role_type} assigned to {target} {object_id}"
         LOGGER.info(msg)
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.secho(f"[*] {msg}", fg="green")
 
     else:
-        msg = (
-            f"Error assigning admin role to target\n"
-            f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-            f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-        )
-        LOGGER.error(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-        click.secho(f"[!] {msg}", fg="red")
+        report_error(ctx, "Error assigning admin role to target", response)
         click.secho(
             "[!] Only the SUPER_ADMIN role can view, assign, or remove admin roles. The user linked to the "
             "current API token might not have the SUPER_ADMIN role assigned",
@@ -0,0 +1,413 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Keep Dorothy set up in a local daemon so that one-shot commands and shells attach to it instead of starting cold
+
+import getpass
+import io
+import json
+import logging.config
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+import click
+
+LOGGER = logging.getLogger(__name__)
+
+# Commands run with the API tokens of the configuration profiles, so only the owner can connect to the socket
+SOCKET_PATH = Path.home() / "dorothy" / "run" / "dorothy.sock"
+
+
+def send_frame(wfile, frame):
+    """Send a message as a line of JSON"""
+
+    wfile.write(json.dumps(frame).encode() + b"\n")
+    wfile.flush()
+
+
+def receive_frame(rfile):
+    """Receive a message sent with send_frame. Returns None if the connection was closed"""
+
+    line = rfile.readline()
+    return json.loads(line) if line else None
+
+
+class RemoteOutput(io.TextIOBase):
+    """Text stream that sends the output of a command to the attached client"""
+
+    def __init__(self, wfile, stream, tty):
+        self.wfile = wfile
+        self.stream = stream
+        # Whether the client's terminal is a TTY. click keeps colors and draws progress bars if it is
+        self.tty = tty
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self.tty
+
+    def write(self, text):
+        # Like other text streams, bytes aren't accepted. click checks this to tell text and binary streams apart
+        if not isinstance(text, str):
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+
+        if text:
+            send_frame(self.wfile, {"output": text, "stream": self.stream})
+        return len(text)
+
+
+class RemoteInput(io.TextIOBase):
+    """Text stream that reads lines typed or piped into the attached client, one line at a time when they're needed"""
+
+    def __init__(self, rfile, wfile):
+        self.rfile = rfile
+        self.wfile = wfile
+
+    @property
+    def encoding(self):
+        return "utf-8"
+
+    def readable(self):
+        return True
+
+    def readline(self, size=-1, hidden=False, prompt=""):
+        send_frame(self.wfile, {"read": True, "hidden": hidden, "prompt": prompt})
+        frame = receive_frame(self.rfile)
+
+        if not frame or frame.get("eof"):
+            return ""
+        return frame["input"]
+
+    def read(self, size=-1):
+        return "".join(iter(self.readline, ""))
+
+    def hidden_prompt(self, prompt):
+        """Read a line without echoing it on the client's terminal. E.g. an API token"""
+
+        line = self.readline(hidden=True, prompt=prompt)
+        if not line:
+            raise EOFError
+        return line.rstrip("\n")
+
+
+class DorothyDaemon:
+    """Local daemon that runs Dorothy's commands for clients that attach to it over a Unix domain socket
+
+    The object passed to Dorothy's commands is set up once for each configuration profile and kept between commands,
+    so the session's connections to Okta, the rate limiter, the request metrics and the data store stay warm.
+    Commands are run one at a time because their input and output are redirected to the attached client. Logs aren't
+    indexed in Elasticsearch by commands run in the daemon, and commands that switch the configuration profile are
+    refused because they would change the profile of the object that later commands for the original profile use
+    """
+
+    def __init__(self, socket_path=SOCKET_PATH):
+        self.socket_path = socket_path
+        # Dorothy objects of the configuration profiles that were used, keyed on the profile ID
+        self.profiles = {}
+        self.started = time.time()
+        self.commands = 0
+        self.running = False
+
+    def serve(self):
+        """Listen for clients until the daemon is stopped"""
+
+        # Dorothy is only imported by the daemon so that clients start quickly
+        from dorothy.events import setup_logging
+        from dorothy.main import LOGS_DIR
+
+        setup_logging(LOGS_DIR)
+
+        if is_running(self.socket_path):
+            click.secho(f"[!] Dorothy daemon is already running on {self.socket_path}", fg="red")
+            return
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)
+        try:
+            server.bind(str(self.socket_path))
+        finally:
+            os.umask(umask)
+        server.listen()
+
+        msg = f"Dorothy daemon listening on {self.socket_path}"
+        LOGGER.info(msg)
+        click.echo(f"[*] {msg}")
+
+        self.running = True
+
+        try:
+            while self.running:
+                conn, _ = server.accept()
+                with conn:
+                    self.handle(conn)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            self.socket_path.unlink()
+            self.close()
+
+        msg = "Dorothy daemon stopped"
+        LOGGER.info(msg)
+        click.echo(f"[*] {msg}")
+
+    def handle(self, conn):
+        """Handle a request from a client"""
+
+        rfile = conn.makefile("rb")
+        wfile = conn.makefile("wb")
+
+        try:
+            request = receive_frame(rfile)
+
+            if not request:
+                return
+
+            if request["command"] == "run":
+                exit_code = self.run(request, rfile, wfile)
+            elif request["command"] == "status":
+                send_frame(wfile, {"output": self.status(), "stream": "stdout"})
+                exit_code = 0
+            else:
+                self.running = False
+                exit_code = 0
+
+            send_frame(wfile, {"exit": exit_code})
+
+        except (OSError, ValueError) as e:
+            # E.g. the client was interrupted with Ctrl+C
+            LOGGER.info(f"Client disconnected from Dorothy daemon: {e}")
+
+        finally:
+            rfile.close()
+            wfile.close()
+
+    def run(self, request, rfile, wfile):
+        """Run a command with its input and output redirected to the client. Returns the exit code"""
+
+        stdin = RemoteInput(rfile, wfile)
+        streams = (sys.stdin, sys.stdout, sys.stderr, click.termui.hidden_prompt_func)
+
+        sys.stdin = stdin
+        sys.stdout = RemoteOutput(wfile, "stdout", request.get("tty", False))
+        sys.stderr = RemoteOutput(wfile, "stderr", request.get("tty", False))
+        click.termui.hidden_prompt_func = stdin.hidden_prompt
+
+        try:
+            obj, error = self.profile(request.get("profile"))
+
+            if error:
+                LOGGER.error(error)
+                click.secho(f"[!] {error}", fg="red")
+                return 1
+
+            return self.invoke(obj, request.get("args", []))
+
+        except Exception as e:
+            msg = f"Error running command in Dorothy daemon: {e!r}"
+            LOGGER.exception(msg)
+            click.secho(f"[!] {msg}", fg="red")
+            return 1
+
+        finally:
+            sys.stdin, sys.stdout, sys.stderr, click.termui.hidden_prompt_func = streams
+
+    def invoke(self, obj, args):
+        """Invoke Dorothy's main menu with a command, or start the shell if there is none. Returns the exit code"""
+
+        from dorothy.main import dorothy_shell
+
+        self.commands += 1
+        LOGGER.info(f"Running command in Dorothy daemon: {' '.join(args) or 'shell'}")
+
+        try:
+            dorothy_shell.main(args, prog_name="dorothy", obj=obj, standalone_mode=False)
+            return 0
+        except click.ClickException as e:
+            e.show()
+            return e.exit_code
+        except click.Abort:
+            click.echo("Aborted!", err=True)
+            return 1
+
+    def profile(self, name):
+        """Return the Dorothy object of a configuration profile, setting it up the first time it's used
+
+        Returns the object and an error message, one of which is None
+        """
+
+        from dorothy.config import find_profile
+        from dorothy.main import CONFIG_DIR, setup_dorothy
+
+        config, error = find_profile(CONFIG_DIR, name)
+
+        if error:
+            return None, error
+
+        if config["id"] not in self.profiles:
+            if not config.get("api_token"):
+                return None, (
+                    f'No API token found in configuration profile "{config["description"]}". The Dorothy daemon '
+                    f"can only use profiles with a stored API token"
+                )
+
+            obj = setup_dorothy(config)
+            obj.daemon = True
+            self.profiles[config["id"]] = obj
+
+            msg = f'Set up configuration profile "{config["description"]}" ({config["okta_url"]}) in Dorothy daemon'
+            LOGGER.info(msg)
+            click.echo(f"[*] {msg}")
+
+        return self.profiles[config["id"]], None
+
+    def status(self):
+        """Return a description of the daemon and the configuration profiles it has set up"""
+
+        lines = [
+            f"[*] Dorothy daemon listening on {self.socket_path} for {time.time() - self.started:.0f}s. "
+            f"{self.commands} commands run"
+        ]
+
+        for obj in self.profiles.values():
+            lines.append(
+                f"[*] Profile {obj.profile_id} ({obj.base_url}): {obj.session.metrics.session.requests} requests to "
+                f"the Okta API"
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """Close the sessions and data stores of the configuration profiles"""
+
+        for obj in self.profiles.values():
+            obj.session.close()
+            obj.store.close()
+
+        self.profiles.clear()
+
+
+def is_running(socket_path=SOCKET_PATH):
+    """Return True if a daemon is listening on the socket"""
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_path))
+        return True
+    except OSError:
+        return False
+
+
+def attach(request, socket_path=SOCKET_PATH):
+    """Send a request to the daemon and pass the input and output of the command until it exits
+
+    Returns the exit code of the command
+    """
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        click.secho(
+            f'[!] Dorothy daemon isn\'t running on {socket_path}. Start it with "dorothy-daemon start"', fg="red"
+        )
+        return 1
+
+    with sock, sock.makefile("rb") as rfile, sock.makefile("wb") as wfile:
+        send_frame(wfile, request)
+
+        while True:
+            frame = receive_frame(rfile)
+
+            if frame is None:
+                click.secho("[!] Dorothy daemon closed the connection", fg="red")
+                return 1
+
+            if "exit" in frame:
+                return frame["exit"]
+
+            if "output" in frame:
+                stream = sys.stderr if frame["stream"] == "stderr" else sys.stdout
+                stream.write(frame["output"])
+                stream.flush()
+                continue
+
+            # The command is waiting for a line of input. Hidden input, e.g. an API token, isn't echoed
+            try:
+                line = getpass.getpass(frame["prompt"]) + "\n" if frame["hidden"] else sys.stdin.readline()
+            except EOFError:
+                line = ""
+
+            send_frame(wfile, {"input": line} if line else {"eof": True})
+
+
+@click.group(context_settings={"help_option_names": ["-h", "--help"]})
+def cli():
+    """Run Dorothy's commands in a local daemon that keeps configuration profiles set up between commands"""
+
+
+@cli.command()
+def start():
+    """Start the daemon in the foreground"""
+    DorothyDaemon().serve()
+
+
+@cli.command()
+def stop():
+    """Stop the daemon"""
+    sys.exit(attach({"command": "stop"}))
+
+
+@cli.command()
+def status():
+    """Show the configuration profiles the daemon has set up"""
+    sys.exit(attach({"command": "status"}))
+
+
+@cli.command(context_settings={"ignore_unknown_options": True})
+@click.option("--profile", help="ID or description of the configuration profile. Optional if there is only one")
+@click.argument("args", nargs=-1, required=True, type=click.UNPROCESSED)
+def run(profile, args):
+    """Run a command. E.g. dorothy-daemon run discovery get-users execute"""
+    sys.exit(attach({"command": "run", "profile": profile, "args": list(args), "tty": sys.stdout.isatty()}))
+
+
+@cli.command()
+@click.option("--profile", help="ID or description of the configuration profile. Optional if there is only one")
+def shell(profile):
+    """Start Dorothy's shell in the daemon"""
+    sys.exit(attach({"command": "run", "profile": profile, "args": [], "tty": sys.stdout.isatty()}))
+
+
+if __name__ == "__main__":
+    cli(prog_name="dorothy-daemon")
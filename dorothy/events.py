@@ -0,0 +1,140 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Write log events to their destinations from a background thread so that logging doesn't block API calls
+
+import atexit
+import logging.config
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+LOGGER = logging.getLogger(__name__)
+
+# Listener that passes queued log records to the file handlers. Set by start_event_bus()
+_LISTENER = None
+
+
+class LogFileHandler(RotatingFileHandler):
+    """Rotating log file that creates the logs directory when the first log record is written"""
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+def logging_config(logs_dir):
+    """Return the configuration for logging.config.dictConfig with log records written to dorothy.log"""
+
+    return {
+        "version": 1,
+        # The logger was getting disabled by another library/module. This key is set to False to prevent this
+        "disable_existing_loggers": False,
+        "formatters": {
+            "simple": {
+                "format": "%(asctime)s | %(levelname)s | %(name)s | %(funcName)s | %(message)s",
+                "datefmt": "%d-%b-%y %H:%M:%S %Z",
+            }
+        },
+        "handlers": {
+            # Log events with a severity of WARNING or above (INFO and DEBUG won't be logged to the console)
+            "console": {
+                "class": "logging.StreamHandler",
+                "level": "WARNING",
+                "formatter": "simple",
+                "stream": "ext://sys.stdout",
+            },
+            # The log file will rotate when the max file size (2MB) is reached and a maximum of 3 log files will be
+            # stored on disk. The file isn't opened until the first log record is written
+            "file": {
+                "class": "dorothy.events.LogFileHandler",
+                "level": "DEBUG",
+                "formatter": "simple",
+                "filename": str(logs_dir / "dorothy.log"),
+                "maxBytes": 2097152,
+                "backupCount": 2,
+                "delay": True,
+            },
+        },
+        # Amend the following line to "handlers": ["console", "file"] to log errors to the console too
+        "root": {"level": "DEBUG", "handlers": ["file"]},
+    }
+
+
+def setup_logging(logs_dir):
+    """Configure logging to the log file in the logs directory and write log records from a background thread"""
+
+    logging.config.dictConfig(logging_config(logs_dir))
+    start_event_bus()
+
+
+def is_console_handler(handler):
+    """Return True for handlers that write to the terminal"""
+
+    return isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler)
+
+
+def start_event_bus():
+    """Replace the handlers of the root logger with a queue that is consumed by a background thread
+
+    Logging a message then only puts the record in the queue. The listener passes it to the original handlers (e.g.
+    the rotating log file), each applying its own level. Console handlers stay attached to the root logger, so that
+    messages logged to the terminal aren't printed in the middle of prompts and progress bars
+    """
+
+    global _LISTENER
+
+    root = logging.getLogger()
+    handlers = [handler for handler in root.handlers if not is_console_handler(handler)]
+
+    if _LISTENER or not handlers:
+        return
+
+    records = queue.SimpleQueue()
+
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(records))
+
+    _LISTENER = QueueListener(records, *handlers, respect_handler_level=True)
+    _LISTENER.start()
+
+    # Write the queued records before Dorothy exits
+    atexit.register(stop_event_bus)
+
+
+def stop_event_bus():
+    """Write the queued log records and stop the background thread"""
+
+    global _LISTENER
+
+    if _LISTENER:
+        _LISTENER.stop()
+        _LISTENER = None
+
+
+def log_handlers():
+    """Return the handlers log records are written to, including the handlers behind the queue"""
+
+    handlers = list(logging.getLogger().handlers)
+
+    if _LISTENER:
+        handlers.extend(_LISTENER.handlers)
+
+    return handlers
@@ -0,0 +1,220 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Index Dorothy's log events in Elasticsearch in bulk from a background thread
+
+import json
+import logging.config
+import queue
+import threading
+import time
+
+import click
+from elasticsearch.exceptions import ConnectionError, ConnectionTimeout, TransportError
+
+LOGGER = logging.getLogger(__name__)
+
+INDEX_NAME = "dorothy"
+# Send a bulk request when this many events or bytes are buffered or this many seconds have passed since the last one
+FLUSH_EVENTS = 500
+FLUSH_BYTES = 5 * 1024 * 1024
+FLUSH_INTERVAL = 5
+# Events are dropped if this many are waiting to be indexed, so that a slow cluster can't use up all memory
+MAX_QUEUED_EVENTS = 100000
+# Time to wait for the remaining events to be indexed when Dorothy exits
+CLOSE_TIMEOUT = 30
+
+
+class BulkIndexer:
+    """Index events in Elasticsearch with the _bulk API from a background thread
+
+    Events are buffered and sent when FLUSH_EVENTS or FLUSH_BYTES is reached, FLUSH_INTERVAL seconds have passed or
+    the indexer is closed. If Elasticsearch can't be reached, events are appended to a spill file and indexed once
+    Elasticsearch is reachable again, including the next time Dorothy starts. Documents rejected by Elasticsearch and
+    events dropped because the queue was full are counted and reported when the indexer is closed
+    """
+
+    def __init__(self, es, spill_path, index=INDEX_NAME):
+        self.es = es
+        self.spill_path = spill_path
+        self.index = index
+        self.indexed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.reachable = True
+        self._queue = queue.Queue(maxsize=MAX_QUEUED_EVENTS)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="dorothy-indexer", daemon=True)
+        self._thread.start()
+
+    def add(self, doc_id, doc):
+        """Queue an event to be indexed. Never blocks the caller"""
+
+        if self._closed.is_set():
+            self.dropped += 1
+            return
+
+        try:
+            self._queue.put_nowait((doc_id, doc))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Index the buffered events, stop the background thread and report any events that weren't indexed"""
+
+        if self._closed.is_set():
+            return
+
+        self._closed.set()
+
+        try:
+            self._queue.put(None, timeout=CLOSE_TIMEOUT)
+        except queue.Full:
+            pass
+
+        self._thread.join(timeout=CLOSE_TIMEOUT)
+
+        msg = f"Indexed {self.indexed} events in Elasticsearch"
+        if self.failed or self.dropped or self.spilled:
+            msg = (
+                f"{msg}. {self.failed} events were rejected and {self.dropped} events were dropped. "
+                f"{self.spilled} events are saved in {self.spill_path} to be indexed the next time Elasticsearch is "
+                f"reachable"
+            )
+            click.secho(f"[!] {msg}", fg="red")
+        LOGGER.info(msg)
+
+    def _run(self):
+        buffer = []
+        size = 0
+        first_queued = 0
+
+        # Index events that couldn't be indexed by a previous session first
+        self._replay()
+
+        while True:
+            # Wait for the next event or until the buffered events are due to be sent
+            timeout = max(FLUSH_INTERVAL - (time.time() - first_queued), 0) if buffer else None
+
+            try:
+                event = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                event = ()
+
+            # None is queued by close()
+            closing = event is None
+
+            if event:
+                doc_id, doc = event
+                line = json.dumps(doc)
+                buffer.append((doc_id, line))
+                size += len(line)
+
+                if len(buffer) == 1:
+                    first_queued = time.time()
+
+            if buffer and (
+                closing
+                or len(buffer) >= FLUSH_EVENTS
+                or size >= FLUSH_BYTES
+                or time.time() - first_queued >= FLUSH_INTERVAL
+            ):
+                self._flush(buffer)
+                buffer = []
+                size = 0
+
+            if closing:
+                return
+
+    def _flush(self, events):
+        # Index spilled events before new ones once Elasticsearch is reachable again
+        if not self.reachable and not self._replay():
+            self._spill(events)
+            return
+
+        if not self._send(events):
+            self._spill(events)
+
+    def _send(self, events):
+        """Send a bulk request. Returns False if Elasticsearch couldn't be reached"""
+
+        body = "".join(
+            f'{json.dumps({"index": {"_index": self.index, "_id": doc_id}})}\n{line}\n' for doc_id, line in events
+        )
+
+        try:
+            response = self.es.bulk(body=body)
+        except (ConnectionError, ConnectionTimeout) as e:
+            if self.reachable:
+                self.reachable = False
+                LOGGER.error(f"Unable to reach Elasticsearch. Saving events to {self.spill_path}: {e}")
+            return False
+        except TransportError as e:
+            # The whole request was rejected. E.g. invalid credentials
+            self.failed += len(events)
+            LOGGER.error(f"Elasticsearch rejected a bulk request with {len(events)} events: {e}")
+            return True
+
+        if not self.reachable:
+            self.reachable = True
+            LOGGER.info("Elasticsearch is reachable again")
+
+        if response.get("errors"):
+            errors = [item["index"]["error"] for item in response["items"] if "error" in item["index"]]
+            self.failed += len(errors)
+            LOGGER.error(f"Elasticsearch rejected {len(errors)} of {len(events)} events. First error: {errors[0]}")
+            self.indexed += len(events) - len(errors)
+        else:
+            self.indexed += len(events)
+
+        return True
+
+    def _spill(self, events):
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a") as f:
+            f.writelines(f"{json.dumps({'_id': doc_id, 'doc': line})}\n" for doc_id, line in events)
+
+        self.spilled += len(events)
+
+    def _replay(self):
+        """Index the events in the spill file. Returns False if Elasticsearch couldn't be reached"""
+
+        if not self.spill_path.exists():
+            return True
+
+        with open(self.spill_path, "r") as f:
+            events = [(event["_id"], event["doc"]) for event in map(json.loads, f)]
+
+        for i in range(0, len(events), FLUSH_EVENTS):
+            end = i + FLUSH_EVENTS
+            batch = events[i:end]
+
+            if not self._send(batch):
+                # Keep the events that weren't indexed in the spill file
+                with open(self.spill_path, "w") as f:
+                    f.writelines(f"{json.dumps({'_id': doc_id, 'doc': line})}\n" for doc_id, line in events[i:])
+                self.spilled = len(events) - i
+                return False
+
+        self.spill_path.unlink()
+        self.spilled = 0
+        LOGGER.info(f"Indexed {len(events)} events from {self.spill_path}")
+
+        return True
@@ -22,16 +22,32 @@
 import logging.config
 from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
-from elasticsearch import Elasticsearch
 from requests.sessions import Session
 
 import dorothy.core as core
-from dorothy.config import check_saved_data, load_config_profiles, choose_profile, create_profile
+import dorothy.metrics as metrics
+import dorothy.profiling as profiling
+from dorothy.cache import ResultCache
+from dorothy.cassette import cassette_from_env
+from dorothy.config import (
+    apply_retention_policy,
+    check_saved_data,
+    load_config_profiles,
+    choose_profile,
+    create_profile,
+    load_settings,
+)
 from dorothy.core import OktaOrg, setup_session_instance, setup_elasticsearch_client
+from dorothy.events import log_handlers, setup_logging
+from dorothy.store import DataStore
 from dorothy.wrappers import rootshell
 
+if TYPE_CHECKING:
+    from dorothy.indexer import BulkIndexer
+
 BANNER = r"""
 ██████   ██████  ██████   ██████  ████████ ██   ██ ██    ██ 
 ██   ██ ██    ██ ██   ██ ██    ██    ██    ██   ██  ██  ██  
@@ -42,6 +58,7 @@ BANNER = r"""
 
 ROOT_DIR = Path(__file__).parent
 DATA_DIR = Path.home() / "dorothy/data"
+LOGS_DIR = Path.home() / "dorothy/logs"
 CONFIG_DIR = Path.home() / "dorothy/config"
 
 # Reference for admin role types: https://developer.okta.com/docs/reference/api/roles/#role-types
@@ -89,17 +106,81 @@ class Dorothy:
     profile_id: str
     # Session instance for HTTP requests
     session: Session
-    # Elasticsearch client
-    es: Elasticsearch
+    # Settings for the configuration profile
+    settings: dict
+    # Local database of harvested objects
+    store: DataStore
+    # Cache of the roles and MFA factors retrieved for users and groups
+    cache: ResultCache
+    # Bulk indexer for Dorothy's log events in Elasticsearch
+    es: "BulkIndexer"
+    # Whether the object is kept by the Dorothy daemon and shared by the commands run for its configuration profile
+    daemon: bool = False
 
 
 LOGGER = logging.getLogger(__name__)
 
 
+def setup_session(config, settings):
+    """Create the session instance for a configuration profile, recording to or replaying from a cassette if one is
+    set"""
+
+    cassette = cassette_from_env(DATA_DIR, config["id"], config["okta_url"])
+
+    if cassette and cassette.mode == "replay":
+        click.echo(f"[*] Replaying {cassette.recorded} recorded Okta API responses from {cassette.file_path}")
+    elif cassette:
+        click.echo(f"[*] Recording Okta API requests and responses to {cassette.file_path}")
+
+    return setup_session_instance(
+        config["okta_url"],
+        rate_limit_headroom=settings["rate_limit_headroom"],
+        cassette=cassette,
+        max_workers=settings["max_workers"],
+    )
+
+
+def setup_dorothy(config, es_client=None):
+    """Create the object that is passed to Dorothy's commands for a configuration profile"""
+
+    settings = load_settings(config)
+
+    apply_retention_policy(DATA_DIR, config["id"], settings)
+
+    session = setup_session(config, settings)
+
+    store = DataStore.for_profile(DATA_DIR, config["id"])
+
+    return Dorothy(
+        okta=OktaOrg(config["api_token"], config["okta_url"]),
+        base_url=config["okta_url"],
+        api_token=config["api_token"],
+        root_dir=ROOT_DIR,
+        data_dir=DATA_DIR,
+        config_dir=CONFIG_DIR,
+        admin_roles=ADMIN_ROLES,
+        policy_types=POLICY_TYPES,
+        profile_id=config["id"],
+        session=session,
+        settings=settings,
+        store=store,
+        cache=ResultCache(store, max_age=settings["cache_max_age"]),
+        es=es_client,
+    )
+
+
+def close_dorothy(ctx):
+    """Index the remaining log events in Elasticsearch when Dorothy exits"""
+
+    if ctx.obj and ctx.obj.es:
+        ctx.obj.es.close()
+
+
 @rootshell(
     name="dorothy",
     prompt="dorothy > ",
     intro='Type "help" to get started',
+    on_finished=close_dorothy,
     context_settings={"help_option_names": ["-h", "--help"]},
 )
 @click.pass_context
@@ -107,6 +188,12 @@ LOGGER = logging.getLogger(__name__)
 def dorothy_shell(ctx):
     """Set configuration profile for target environment and setup Dorothy CLI"""
 
+    # The Dorothy daemon passes an object that is already set up. See dorothy.daemon
+    if ctx.obj is not None:
+        return
+
+    setup_logging(LOGS_DIR)
+
     # Documentation on Okta rate limits can be found here: https://developer.okta.com/docs/reference/rate-limits/
     click.secho(message=BANNER, fg="red")
     click.echo("A tool to test security monitoring and detection for Okta environments\n")
@@ -119,7 +206,7 @@ def dorothy_shell(ctx):
 
     LOGGER.info("Dorothy started")
 
-    for handler in LOGGER.root.handlers:
+    for handler in log_handlers():
         if hasattr(handler, "baseFilename"):
             logging_path = handler.baseFilename
             click.echo(f"[*] Logs will be written to {logging_path}")
@@ -138,23 +225,9 @@ def dorothy_shell(ctx):
     else:
         config = create_profile(CONFIG_DIR)
 
-    session = setup_session_instance(config["okta_url"])
+    es_client = setup_elasticsearch_client(config["okta_url"], DATA_DIR)
 
-    es_client = setup_elasticsearch_client(config["okta_url"])
-
-    ctx.obj = Dorothy(
-        okta=OktaOrg(config["api_token"], config["okta_url"]),
-        base_url=config["okta_url"],
-        api_token=config["api_token"],
-        root_dir=ROOT_DIR,
-        data_dir=DATA_DIR,
-        config_dir=CONFIG_DIR,
-        admin_roles=ADMIN_ROLES,
-        policy_types=POLICY_TYPES,
-        profile_id=config["id"],
-        session=session,
-        es=es_client,
-    )
+    ctx.obj = setup_dorothy(config, es_client)
 
     click.echo('[*] Consider executing "whoami" to get user information and roles associated with current API token')
     click.echo("""[*] Execute "list-modules" to show all of Dorothy's modules""")
@@ -178,3 +251,22 @@ def whoami(ctx):
 def clear():
     """Clear the terminal screen"""
     click.clear()
+
+
+@dorothy_shell.command()
+@click.pass_context
+def stats(ctx):
+    """Show metrics for the Okta API requests sent in this session and by recent module executions"""
+    metrics.print_stats(ctx)
+
+
+@dorothy_shell.command()
+@click.argument("mode", required=False, type=click.Choice(profiling.PROFILE_MODES))
+@click.option("--top", type=click.IntRange(1), help="Number of functions to print after each module execution")
+def profile(mode, top):
+    """Profile module executions with cProfile or by sampling stacks (off, cprofile or sample)"""
+    profiling.configure(mode, top)
+
+
+# Add the menus of Dorothy's modules to the main menu. They are imported last because they use dorothy_shell
+import dorothy.modules  # noqa: E402,F401
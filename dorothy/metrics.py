@@ -0,0 +1,327 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Collect metrics for the requests sent to the Okta API, e.g. to review how long a module took and why
+
+import hashlib
+import logging.config
+import math
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import click
+
+from dorothy.ratelimit import RateLimiter
+
+LOGGER = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets. Slower requests are counted in a final bucket
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Number of module executions kept for the stats command
+MAX_EXECUTIONS = 10
+# Number of rate limit samples kept for each session or module execution
+MAX_RATE_LIMIT_SAMPLES = 5000
+# Number of latency samples kept for each endpoint family to calculate percentiles
+MAX_LATENCY_SAMPLES = 1000
+
+
+class EndpointMetrics:
+    """Request counters and latency histogram for an endpoint family. E.g. GET /api/v1/users/{id}/roles"""
+
+    def __init__(self):
+        self.requests = 0
+        # Requests with a known latency. Responses that were retried by the transport adapter aren't timed
+        self.timed = 0
+        # Responses with status 429 (rate limit exceeded) and 5xx
+        self.throttled = 0
+        self.server_errors = 0
+        # Requests that failed without a response. E.g. a connection error
+        self.failed = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        # Time spent waiting for the rate limit to reset before sending requests
+        self.wait_time = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        # Uniform random sample of the latencies (reservoir sampling), so that percentiles don't depend on the buckets
+        self.samples = []
+        # Lowest remaining rate limit budget seen for the endpoint family, as a percentage of the limit
+        self.min_remaining = None
+
+    def record(self, status_code, elapsed, waited, remaining):
+        self.requests += 1
+        self.wait_time += waited
+
+        if status_code is None:
+            self.failed += 1
+        elif status_code == 429:
+            self.throttled += 1
+        elif status_code >= 500:
+            self.server_errors += 1
+
+        if remaining is not None:
+            self.min_remaining = remaining if self.min_remaining is None else min(self.min_remaining, remaining)
+
+        if elapsed is None:
+            return
+
+        self.timed += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+        self.histogram[bucket] += 1
+
+        if len(self.samples) < MAX_LATENCY_SAMPLES:
+            self.samples.append(elapsed)
+        else:
+            index = random.randrange(self.timed)
+            if index < MAX_LATENCY_SAMPLES:
+                self.samples[index] = elapsed
+
+    def percentile(self, percent):
+        """Return the latency at a percentile of the sampled requests (nearest rank)"""
+
+        if not self.samples:
+            return 0.0
+
+        samples = sorted(self.samples)
+        rank = max(math.ceil(len(samples) * percent / 100), 1)
+
+        return samples[rank - 1]
+
+    @property
+    def average_time(self):
+        return self.total_time / self.timed if self.timed else 0.0
+
+
+class MetricsScope:
+    """Metrics for a session or a single module execution"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.time()
+        self.finished = None
+        self.endpoints = {}
+        # (time, endpoint family, remaining rate limit budget as a percentage of the limit)
+        self.rate_limit_samples = deque(maxlen=MAX_RATE_LIMIT_SAMPLES)
+
+    def record(self, family, status_code, elapsed, waited, remaining):
+        self.endpoints.setdefault(family, EndpointMetrics()).record(status_code, elapsed, waited, remaining)
+
+        if remaining is not None:
+            self.rate_limit_samples.append((time.time(), family, remaining))
+
+    @property
+    def duration(self):
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def requests(self):
+        return sum(endpoint.requests for endpoint in self.endpoints.values())
+
+    def rows(self):
+        """Return a row of metrics for each endpoint family, busiest first"""
+
+        return [
+            (
+                family,
+                endpoint.requests,
+                endpoint.throttled,
+                endpoint.server_errors + endpoint.failed,
+                f"{endpoint.average_time * 1000:.0f}",
+                f"{endpoint.percentile(50) * 1000:.0f}",
+                f"{endpoint.percentile(95) * 1000:.0f}",
+                f"{endpoint.max_time * 1000:.0f}",
+                f"{endpoint.wait_time:.1f}",
+                "" if endpoint.min_remaining is None else f"{endpoint.min_remaining:.0f}%",
+            )
+            for family, endpoint in sorted(self.endpoints.items(), key=lambda item: -item[1].requests)
+        ]
+
+    def rate_limit_history(self, interval=60):
+        """Return the lowest remaining rate limit budget seen in each interval, as (start time, percentage) tuples"""
+
+        history = {}
+
+        for timestamp, _, remaining in self.rate_limit_samples:
+            start = timestamp - timestamp % interval
+            history[start] = min(history.get(start, 100.0), remaining)
+
+        return sorted(history.items())
+
+    def ecs_documents(self, profile_id):
+        """Return an ECS-style metric document for each endpoint family, e.g. to index in Elasticsearch"""
+
+        timestamp = datetime.fromtimestamp(self.finished or time.time(), timezone.utc).isoformat()
+        documents = []
+
+        for family, endpoint in self.endpoints.items():
+            method, _, path = family.partition(" ")
+            document = {
+                "@timestamp": timestamp,
+                "event": {
+                    "kind": "metric",
+                    "module": "dorothy",
+                    "dataset": "dorothy.requests",
+                    "start": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+                    # ECS durations are in nanoseconds
+                    "duration": int(self.duration * 1e9),
+                },
+                "http": {"request": {"method": method}},
+                "url": {"path": path},
+                "labels": {"profile_id": profile_id, "execution": self.name},
+                "dorothy": {
+                    "requests": {
+                        "count": endpoint.requests,
+                        "throttled": endpoint.throttled,
+                        "server_errors": endpoint.server_errors,
+                        "failed": endpoint.failed,
+                        "latency": {
+                            "avg_ms": round(endpoint.average_time * 1000, 1),
+                            "p50_ms": round(endpoint.percentile(50) * 1000, 1),
+                            "p95_ms": round(endpoint.percentile(95) * 1000, 1),
+                            "max_ms": round(endpoint.max_time * 1000, 1),
+                            "histogram": dict(zip([str(b) for b in LATENCY_BUCKETS] + ["inf"], endpoint.histogram)),
+                        },
+                        "rate_limit": {
+                            "wait_s": round(endpoint.wait_time, 3),
+                            "min_remaining_pct": endpoint.min_remaining,
+                        },
+                    }
+                },
+            }
+            doc_id = hashlib.md5(f"{self.name}{self.started}{family}".encode()).hexdigest()
+            documents.append((doc_id, document))
+
+        return documents
+
+
+class RequestMetrics:
+    """Metrics for all requests sent to the Okta API by a session instance and the worker sessions that share it
+
+    Requests are grouped by endpoint family: the HTTP method and the path with Okta object IDs replaced. Metrics are
+    kept for the whole session and for each module execution
+    """
+
+    def __init__(self):
+        self.session = MetricsScope("Session")
+        self.current = None
+        self.executions = deque(maxlen=MAX_EXECUTIONS)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def family(method, url):
+        """Return the endpoint family of a request. E.g. GET /api/v1/users/{id}/roles"""
+
+        return f"{method.upper()} {RateLimiter.endpoint(url)}"
+
+    def record(self, method, url, status_code, headers, elapsed, waited=0.0):
+        """Record a request. status_code is None if no response was received and elapsed is None if the latency isn't
+        known, e.g. for a response that was retried by the transport adapter"""
+
+        try:
+            remaining = 100 * int(headers["X-Rate-Limit-Remaining"]) / int(headers["X-Rate-Limit-Limit"])
+        except (KeyError, TypeError, ValueError, ZeroDivisionError):
+            remaining = None
+
+        family = self.family(method, url)
+
+        with self._lock:
+            self.session.record(family, status_code, elapsed, waited, remaining)
+            if self.current:
+                self.current.record(family, status_code, elapsed, waited, remaining)
+
+    def start_execution(self, name):
+        """Start collecting metrics for a module execution"""
+
+        with self._lock:
+            self.current = MetricsScope(name)
+
+    def finish_execution(self):
+        """Stop collecting metrics for the current module execution and return them"""
+
+        with self._lock:
+            execution, self.current = self.current, None
+
+        if execution:
+            execution.finished = time.time()
+            self.executions.append(execution)
+
+        return execution
+
+
+def start_execution(ctx, name):
+    """Start collecting request metrics for a module execution"""
+
+    session = getattr(ctx.obj, "session", None)
+
+    if session:
+        session.metrics.start_execution(name)
+
+
+def finish_execution(ctx):
+    """Stop collecting request metrics for a module execution and index them in Elasticsearch"""
+
+    session = getattr(ctx.obj, "session", None)
+    execution = session.metrics.finish_execution() if session else None
+
+    if execution is None:
+        return
+
+    LOGGER.info(f"Module {execution.name} sent {execution.requests} requests in {execution.duration:.1f}s")
+
+    if ctx.obj.es:
+        for doc_id, document in execution.ecs_documents(ctx.obj.profile_id):
+            ctx.obj.es.add(doc_id, document)
+
+
+def print_metrics(scope):
+    """Print the request metrics of a session or module execution"""
+
+    from tabulate import tabulate
+
+    headers = ["Endpoint", "Requests", "429s", "Errors", "Avg ms", "p50 ms", "p95 ms", "Max ms", "Wait s", "Min left"]
+    started = datetime.fromtimestamp(scope.started).strftime("%Y-%m-%d %H:%M:%S")
+
+    click.echo(f"[*] {scope.name} started {started}: {scope.requests} requests in {scope.duration:.1f}s")
+
+    if scope.endpoints:
+        click.echo(tabulate(scope.rows(), headers=headers, tablefmt="pretty"))
+
+
+def print_stats(ctx):
+    """Print the request metrics for the session and recent module executions"""
+
+    from tabulate import tabulate
+
+    metrics = ctx.obj.session.metrics
+
+    print_metrics(metrics.session)
+
+    history = metrics.session.rate_limit_history()
+    if history:
+        click.echo("[*] Lowest remaining rate limit budget per minute")
+        rows = [(datetime.fromtimestamp(start).strftime("%H:%M"), f"{remaining:.0f}%") for start, remaining in history]
+        click.echo(tabulate(rows[-15:], headers=["Minute", "Remaining"], tablefmt="pretty"))
+
+    for execution in metrics.executions:
+        print_metrics(execution)
@@ -17,13 +17,4 @@
 # under the License.
 #
 
-from dorothy.modules.defense_evasion import (
-    defense_evasion,
-    change_policy_state,
-    change_rule_state,
-    change_zone_state,
-    change_app_state,
-    modify_policy,
-    modify_policy_rule,
-    modify_zone,
-)
+from dorothy.modules.defense_evasion import defense_evasion
@@ -30,8 +30,6 @@ from dorothy.core import (
 from dorothy.modules.defense_evasion.defense_evasion import defense_evasion
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Deactivate or activate an Okta application"
-TACTICS = ["Defense Evasion", "Impact"]
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the application"}}
 MODULE = Module(MODULE_OPTIONS)
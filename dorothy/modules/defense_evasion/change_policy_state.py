@@ -31,8 +31,6 @@ from dorothy.core import (
 from dorothy.modules.defense_evasion.defense_evasion import defense_evasion
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Deactivate or activate an Okta policy"
-TACTICS = ["Defense Evasion", "Impact"]
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the policy"}}
 MODULE = Module(MODULE_OPTIONS)
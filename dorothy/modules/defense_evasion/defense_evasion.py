@@ -22,6 +22,7 @@
 import click
 
 from dorothy.main import dorothy_shell
+from dorothy.registry import tactic_commands
 
 
 @dorothy_shell.subshell(name="defense-evasion")
@@ -29,3 +30,7 @@ from dorothy.main import dorothy_shell
 def defense_evasion(ctx):
     """Modules to try and evade detection in the Okta environment"""
     pass
+
+
+# Modules are imported when a user enters them
+defense_evasion.add_lazy_commands(tactic_commands("Defense Evasion"))
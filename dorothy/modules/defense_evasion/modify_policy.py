@@ -26,14 +26,13 @@ import click
 
 from dorothy.core import (
     Module,
+    api_request,
     index_event,
+    report_error,
 )
 from dorothy.modules.defense_evasion.defense_evasion import defense_evasion
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Make a temporary change to an Okta policy"
-TACTICS = ["Defense Evasion", "Impact"]
-URL_OR_API_TOKEN_ERROR = "ERROR. Verify that the Okta URL and API token in your configuration profile are correct"
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the policy"}}
 MODULE = Module(MODULE_OPTIONS)
@@ -107,29 +106,15 @@ def execute(ctx):
 def rename_policy(ctx, policy_id, policy_type, original_name, new_name):
     """Update an existing policy with a new name"""
 
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"SSWS {ctx.obj.api_token}",
-    }
-
-    params = {}
     # Values for "type" and "name" are required when updating a policy object
     payload = {"type": policy_type, "name": new_name}
 
-    url = f"{ctx.obj.base_url}/policies/{policy_id}"
+    msg = f'Attempting to rename policy "{original_name}" ({policy_id}) to "{new_name}"'
+    LOGGER.info(msg)
+    index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+    click.echo(f"[*] {msg}")
 
-    try:
-        msg = f'Attempting to rename policy "{original_name}" ({policy_id}) to "{new_name}"'
-        LOGGER.info(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-        click.echo(f"[*] {msg}")
-        response = ctx.obj.session.put(url, headers=headers, params=params, json=payload, timeout=7)
-    except Exception as e:
-        LOGGER.error(e, exc_info=True)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-        click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-        response = None
+    response = api_request(ctx, "PUT", f"/policies/{policy_id}", payload=payload)
 
     if response.ok:
         msg = f'Policy "{original_name}" ({policy_id}) changed to "{new_name}"'
@@ -139,11 +124,4 @@ def rename_policy(ctx, policy_id, policy_type, original_name, new_name):
         time.sleep(1)
 
     else:
-        msg = (
-            f"Error modifying policy {policy_id}\n"
-            f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-            f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-        )
-        LOGGER.error(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-        click.secho(f"[!] {msg}", fg="red")
+        report_error(ctx, f"Error modifying policy {policy_id}", response, module=__name__)
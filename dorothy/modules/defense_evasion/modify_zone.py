@@ -26,14 +26,13 @@ import click
 
 from dorothy.core import (
     Module,
+    api_request,
     index_event,
+    report_error,
 )
 from dorothy.modules.defense_evasion.defense_evasion import defense_evasion
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Make a temporary change to an Okta network zone"
-TACTICS = ["Defense Evasion", "Impact"]
-URL_OR_API_TOKEN_ERROR = "ERROR. Verify that the Okta URL and API token in your configuration profile are correct"
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the network zone"}}
 MODULE = Module(MODULE_OPTIONS)
@@ -106,13 +105,6 @@ def execute(ctx):
 def rename_zone(ctx, zone, original_name, new_name):
     """Update an existing network zone with a new name"""
 
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"SSWS {ctx.obj.api_token}",
-    }
-
-    params = {}
     # Values for "type" and "name" and "gateways" OR "proxies are required when updating a network zone object
     payload = {
         "type": zone.obj["type"],
@@ -121,19 +113,12 @@ def rename_zone(ctx, zone, original_name, new_name):
         "proxies": zone.obj.get("proxies"),
     }
 
-    url = f'{ctx.obj.base_url}/zones/{zone.obj["id"]}'
+    msg = f'Attempting to rename network zone "{original_name}" ({zone.obj["id"]}) to "{new_name}"'
+    LOGGER.info(msg)
+    index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+    click.echo(f"[*] {msg}")
 
-    try:
-        msg = f'Attempting to rename network zone "{original_name}" ({zone.obj["id"]}) to "{new_name}"'
-        LOGGER.info(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
-        click.echo(f"[*] {msg}")
-        response = ctx.obj.session.put(url, headers=headers, params=params, json=payload, timeout=7)
-    except Exception as e:
-        LOGGER.error(e, exc_info=True)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-        click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-        response = None
+    response = api_request(ctx, "PUT", f'/zones/{zone.obj["id"]}', payload=payload)
 
     if response.ok:
         msg = f'Network zone "{original_name}" ({zone.obj["id"]}) changed to "{new_name}"'
@@ -144,11 +129,4 @@ def rename_zone(ctx, zone, original_name, new_name):
         time.sleep(1)
 
     else:
-        msg = (
-            f'Error modifying network zone {zone.obj["id"]}\n'
-            f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-            f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-        )
-        LOGGER.error(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-        click.secho(f"[!] {msg}", fg="red")
+        report_error(ctx, f'Error modifying network zone {zone.obj["id"]}', response, module=__name__)
@@ -17,16 +17,4 @@
 # under the License.
 #
 
-from dorothy.modules.discovery import (
-    discovery,
-    get_users,
-    get_groups,
-    find_admins,
-    get_user,
-    get_policies,
-    get_policy,
-    get_zones,
-    find_admin_groups,
-    get_apps,
-    find_users_without_mfa,
-)
+from dorothy.modules.discovery import discovery
@@ -22,9 +22,14 @@
 import click
 
 from dorothy.main import dorothy_shell
+from dorothy.registry import tactic_commands
 
 
 @dorothy_shell.subshell(name="discovery")
 @click.pass_context
 def discovery(ctx):
     """Modules to gain knowledge about the Okta environment"""
+
+
+# Modules are imported when a user enters them
+discovery.add_lazy_commands(tactic_commands("Discovery"))
@@ -20,17 +20,17 @@
 # Identify Okta groups with admin roles assigned
 
 import logging.config
-import time
 from pathlib import Path
 
 import click
 
+from dorothy.checkpoint import Checkpoint, resume_checkpoint
 from dorothy.core import OktaGroup, write_json_file, load_json_file, print_role_info, index_event
 from dorothy.modules.discovery.discovery import discovery
+from dorothy.workers import fan_out
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Identify Okta groups with admin roles assigned"
-TACTICS = ["Discovery"]
+CHECKPOINT_NAME = "find_admin_groups"
 
 
 @discovery.subshell(name="find-admin-groups")
@@ -52,10 +52,17 @@ def execute(ctx):
         "[1] Load harvested groups from json file and check their assigned roles for administrator "
         "permissions\n"
         "[2] Harvest all groups and check their assigned roles for administrator permissions\n"
+        "[3] Load harvested groups from the data store and check their assigned roles for administrator permissions\n"
         "[0] Exit this menu\n"
         "[*] Choose from the above options"
     )
 
+    checkpoint = resume_checkpoint(ctx, CHECKPOINT_NAME, __name__)
+
+    if checkpoint:
+        check_assigned_roles(ctx, checkpoint)
+        return
+
     while True:
         value = click.prompt(options, type=int)
 
@@ -72,7 +79,8 @@ def execute(ctx):
                 index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
                 click.echo(f"[*] {msg}")
                 groups = load_json_file(file_path)
-                check_assigned_roles(ctx, groups)
+                source = {"type": "file", "file_path": str(file_path)}
+                check_assigned_roles(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, source, groups))
                 return
 
             else:
@@ -87,10 +95,29 @@ def execute(ctx):
                 LOGGER.info(msg)
                 index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
                 click.echo(f"[*] {msg}")
-                groups = ctx.obj.okta.get_groups(ctx)
-                check_assigned_roles(ctx, groups)
+                # Start checking groups from the first page while the next pages are retrieved
+                groups = ctx.obj.okta.iter_groups(ctx)
+                check_assigned_roles(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, {"type": "harvest"}, groups))
+                return
+
+        elif value == 3:
+            groups = ctx.obj.store.objects("groups")
+
+            if len(groups):
+                msg = f"Attempting to check roles for {len(groups)} groups in the data store"
+                LOGGER.info(msg)
+                index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+                click.echo(f"[*] {msg}")
+                source = {"type": "store", "table": "groups"}
+                check_assigned_roles(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, source, groups))
                 return
 
+            else:
+                msg = "No groups found in the data store. Harvest groups first"
+                LOGGER.error(msg)
+                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
+                click.secho(f"[!] {msg}", fg="red")
+
         elif value == 0:
             return
 
@@ -98,41 +125,65 @@ def execute(ctx):
             click.secho("[!] Invalid option selected", fg="red")
 
 
-def check_assigned_roles(ctx, groups):
-    """Check if any groups have admin roles assigned"""
+def check_assigned_roles(ctx, checkpoint):
+    """Check if any groups have admin roles assigned
 
-    admin_groups = []
+    Progress and the admin groups found so far are saved in the checkpoint, so that the check can be resumed if it is
+    stopped by an error or interrupted
+    """
 
-    msg = (
-        f"Checking assigned roles for {len(groups)} groups. This may take a while to avoid exceeding API "
-        f"rate limits"
-    )
+    groups = checkpoint.objects
+    admin_groups = checkpoint.results
+
+    # Harvested groups are streamed page by page, so their number is only known if they were loaded from a file or the
+    # data store
+    length = len(groups) if hasattr(groups, "__len__") else None
+
+    if length is None:
+        msg = "Checking assigned roles for groups as they are harvested. This may take a while"
+    else:
+        msg = f"Checking assigned roles for {length} groups. This may take a while"
     LOGGER.info(msg)
     index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
     click.echo(f"[*] {msg}")
 
     # Don't put print statements under click.progressbar otherwise the progress bar will be interrupted
-    with click.progressbar(groups, label="[*] Checking groups for admin roles") as groups:
-        for okta_group in groups:
-            group = OktaGroup(okta_group)
-            assigned_roles, error = group.list_roles(ctx, mute=True)
+    completed = False
 
-            # Stop trying to check roles if the current API token doesn't have that permission
-            if error:
-                return
+    try:
+        with click.progressbar(
+            fan_out(ctx, list_group_roles, groups), length=length, label="[*] Checking groups for admin roles"
+        ) as results:
+            for okta_group, assigned_roles, error in results:
+                group = OktaGroup(okta_group)
+
+                # Stop trying to check roles if the current API token doesn't have that permission
+                if error:
+                    return
+
+                admin_group = None
 
-            if assigned_roles:
-                admin_group = {"group": group.obj, "roles": assigned_roles}
-                admin_groups.append(admin_group)
+                if assigned_roles:
+                    admin_group = {"group": group.obj, "roles": assigned_roles}
 
-                for role in assigned_roles:
-                    if role["type"] in ctx.obj.admin_roles:
-                        msg = f'Group ID {group.obj["id"]} has admin role {role["type"]} assigned'
-                        LOGGER.info(msg)
-                        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+                    for role in assigned_roles:
+                        if role["type"] in ctx.obj.admin_roles:
+                            msg = f'Group ID {group.obj["id"]} has admin role {role["type"]} assigned'
+                            LOGGER.info(msg)
+                            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
 
-            # Sleep for 1s to avoid exceeding API rate limits
-            time.sleep(1)
+                checkpoint.advance(admin_group)
+
+        # A harvest stops early if a page of groups couldn't be retrieved
+        completed = not getattr(groups, "error", False)
+
+    except KeyboardInterrupt:
+        return
+
+    finally:
+        # Save the roles and factors retrieved so far, even if the check was stopped by an error
+        ctx.obj.cache.save()
+        checkpoint.close(ctx, completed, __name__)
 
     if admin_groups:
         for group in admin_groups:
@@ -155,3 +206,9 @@ def check_assigned_roles(ctx, groups):
         click.echo(f"[*] {msg}")
 
     return admin_groups
+
+
+def list_group_roles(ctx, okta_group):
+    """List the roles assigned to a group without printing them"""
+
+    return OktaGroup(okta_group).list_roles(ctx, mute=True, cached=True)
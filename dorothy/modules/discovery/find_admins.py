@@ -20,23 +20,33 @@
 # Identify Okta users with admin roles assigned
 
 import logging.config
-import time
 from pathlib import Path
 
 import click
 
+from dorothy.checkpoint import Checkpoint, resume_checkpoint
 from dorothy.core import (
+    MAX_USERS_LIMIT,
+    Module,
     OktaUser,
+    api_request,
+    report_error,
     write_json_file,
     load_json_file,
     print_role_info,
     index_event,
+    describe_user_harvest,
+    user_harvest_options,
+    user_harvest_params,
 )
 from dorothy.modules.discovery.discovery import discovery
+from dorothy.workers import fan_out
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Identify Okta users with admin roles assigned"
-TACTICS = ["Discovery"]
+
+MODULE_OPTIONS = user_harvest_options()
+MODULE = Module(MODULE_OPTIONS)
+CHECKPOINT_NAME = "find_admins"
 
 
 @discovery.subshell(name="find-admins")
@@ -48,25 +58,59 @@ def find_admins(ctx):
     """
 
 
+@find_admins.command()
+def info():
+    """Show available options and their current values for this module"""
+
+    MODULE.print_info()
+
+
+@find_admins.command()
+@click.pass_context
+@click.option("--search", help=MODULE_OPTIONS["search"]["help"])
+@click.option("--filter", help=MODULE_OPTIONS["filter"]["help"])
+@click.option("--query", help=MODULE_OPTIONS["query"]["help"])
+@click.option("--limit", type=click.IntRange(1, MAX_USERS_LIMIT), help=MODULE_OPTIONS["limit"]["help"])
+def set(ctx, **kwargs):
+    """Set one or more options for this module"""
+
+    MODULE.set_options(ctx, kwargs)
+
+
+@find_admins.command()
+def reset():
+    """Reset the options for this module"""
+
+    MODULE.reset_options()
+
+
 @find_admins.command()
 @click.pass_context
 def execute(ctx):
     """Execute this module with the configured options"""
 
     """
-    Can't I just make an API call to get all users that have a specific role assigned? Good question. There is no
-    Okta API yet to get all users that have a specific role assigned to them. It is necessary to enumerate through
-    all Okta users and then get the roles assigned to each user
+    Can't I just make an API call to get all users that have a specific role assigned? Good question. The IAM role
+    assignees API lists the users that have admin roles assigned, so only their roles need to be checked. If the API
+    isn't available, it is necessary to enumerate through all Okta users and then get the roles assigned to each user
     """
 
     options = (
         "[*] Available options\n"
         "[1] Load harvested users from json file and check their assigned roles for administrator permissions\n"
-        "[2] Harvest all users and check their assigned roles for administrator permissions\n"
+        "[2] Harvest users matching the module options (all users by default) and check their assigned roles for "
+        "administrator permissions\n"
+        "[3] Load harvested users from the data store and check their assigned roles for administrator permissions\n"
         "[0] Exit this menu\n"
         "[*] Choose from the above options"
     )
 
+    checkpoint = resume_checkpoint(ctx, CHECKPOINT_NAME, __name__)
+
+    if checkpoint:
+        check_assigned_roles(ctx, checkpoint)
+        return
+
     while True:
         value = click.prompt(options, type=int)
 
@@ -83,7 +127,8 @@ def execute(ctx):
                 index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
                 click.echo(f"[*] {msg}")
                 users = load_json_file(file_path)
-                check_assigned_roles(ctx, users)
+                source = {"type": "file", "file_path": str(file_path)}
+                check_assigned_roles(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, source, users))
                 return
 
             else:
@@ -94,18 +139,48 @@ def execute(ctx):
 
         elif value == 2:
             if click.confirm(
-                "[*] Do you want to attempt to harvest information for all users? This may take a while "
-                "to avoid exceeding API rate limits",
+                f"[*] Do you want to attempt to harvest information for {describe_user_harvest(MODULE_OPTIONS)}? "
+                f"This may take a while to avoid exceeding API rate limits",
                 default=True,
             ):
-                msg = "Attempting to harvest all Okta users"
+                msg = f"Attempting to harvest {describe_user_harvest(MODULE_OPTIONS)}"
                 LOGGER.info(msg)
                 index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
                 click.echo(f"[*] {msg}")
-                users = ctx.obj.okta.get_users(ctx)
-                check_assigned_roles(ctx, users)
+                users = None
+
+                # The role assignees API can't be scoped with the search, filter or query options
+                if not any(MODULE_OPTIONS[name]["value"] for name in ("search", "filter", "query")):
+                    users = get_role_assignees(ctx)
+
+                if users is None:
+                    # Start checking users from the first page while the next pages are retrieved
+                    users = ctx.obj.okta.iter_users(ctx, **user_harvest_params(MODULE_OPTIONS))
+                    source = {"type": "harvest"}
+                else:
+                    source = {"type": "objects", "objects": users}
+
+                check_assigned_roles(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, source, users))
+                return
+
+        elif value == 3:
+            users = ctx.obj.store.objects("users")
+
+            if len(users):
+                msg = f"Attempting to check roles for {len(users)} users in the data store"
+                LOGGER.info(msg)
+                index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+                click.echo(f"[*] {msg}")
+                source = {"type": "store", "table": "users"}
+                check_assigned_roles(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, source, users))
                 return
 
+            else:
+                msg = "No users found in the data store. Harvest users first"
+                LOGGER.error(msg)
+                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
+                click.secho(f"[!] {msg}", fg="red")
+
         elif value == 0:
             return
 
@@ -113,39 +188,64 @@ def execute(ctx):
             click.secho("[!] Invalid option selected", fg="red")
 
 
-def check_assigned_roles(ctx, users):
-    """Check if any users have admin roles assigned"""
+def check_assigned_roles(ctx, checkpoint):
+    """Check if any users have admin roles assigned
+
+    Progress and the admin users found so far are saved in the checkpoint, so that the check can be resumed if it is
+    stopped by an error or interrupted
+    """
 
-    admin_users = []
+    users = checkpoint.objects
+    admin_users = checkpoint.results
 
-    msg = (
-        f"Checking assigned roles for {len(users)} users. This may take a while to avoid exceeding API " f"rate limits"
-    )
+    # Harvested users are streamed page by page, so their number is only known if they were loaded from a file or the
+    # data store
+    length = len(users) if hasattr(users, "__len__") else None
+
+    if length is None:
+        msg = "Checking assigned roles for users as they are harvested. This may take a while"
+    else:
+        msg = f"Checking assigned roles for {length} users. This may take a while"
     LOGGER.info(msg)
     index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
     click.echo(f"[*] {msg}")
 
     # Don't put print statements under click.progressbar otherwise the progress bar will be interrupted
-    with click.progressbar(users, label="[*] Checking users for admin roles") as users:
-        for okta_user in users:
-            user = OktaUser(okta_user)
-            assigned_roles, error = user.list_roles(ctx, mute=True)
-            # Stop trying to check roles if the current API token doesn't have that permission
-            if error:
-                return
+    completed = False
+
+    try:
+        with click.progressbar(
+            fan_out(ctx, list_user_roles, users), length=length, label="[*] Checking users for admin roles"
+        ) as results:
+            for okta_user, assigned_roles, error in results:
+                user = OktaUser(okta_user)
+                # Stop trying to check roles if the current API token doesn't have that permission
+                if error:
+                    return
+
+                admin_user = None
 
-            if assigned_roles:
-                admin_user = {"user": user.obj, "roles": assigned_roles}
-                admin_users.append(admin_user)
+                if assigned_roles:
+                    admin_user = {"user": user.obj, "roles": assigned_roles}
 
-                for role in assigned_roles:
-                    if role["type"] in ctx.obj.admin_roles:
-                        msg = f'User ID {user.obj["id"]} has admin role {role["type"]} assigned'
-                        LOGGER.info(msg)
-                        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+                    for role in assigned_roles:
+                        if role["type"] in ctx.obj.admin_roles:
+                            msg = f'User ID {user.obj["id"]} has admin role {role["type"]} assigned'
+                            LOGGER.info(msg)
+                            index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
 
-            # Sleep for 1s to avoid exceeding API rate limits
-            time.sleep(1)
+                checkpoint.advance(admin_user)
+
+        # A harvest stops early if a page of users couldn't be retrieved
+        completed = not getattr(users, "error", False)
+
+    except KeyboardInterrupt:
+        return
+
+    finally:
+        # Save the roles and factors retrieved so far, even if the check was stopped by an error
+        ctx.obj.cache.save()
+        checkpoint.close(ctx, completed, __name__)
 
     if admin_users:
         for user in admin_users:
@@ -168,3 +268,56 @@ def check_assigned_roles(ctx, users):
         click.echo(f"[*] {msg}")
 
     return admin_users
+
+
+def get_role_assignees(ctx):
+    """Get the users that have admin roles assigned using the role assignees API
+
+    Returns None if the API isn't available, in which case the roles of all users have to be checked
+    """
+
+    user_ids = ctx.obj.okta.list_role_assignees(ctx)
+
+    if user_ids is None:
+        msg = "Role assignees API not available. Checking the assigned roles of every user instead"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.echo(f"[*] {msg}")
+        return None
+
+    msg = f"Role assignees API returned {len(user_ids)} users with admin roles assigned. Retrieving the users"
+    LOGGER.info(msg)
+    index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+    click.echo(f"[*] {msg}")
+
+    users = []
+
+    for user_id, okta_user, error in fan_out(ctx, get_user_object, user_ids):
+        if error:
+            return None
+        if okta_user:
+            users.append(okta_user)
+
+    return users
+
+
+def get_user_object(ctx, user_id):
+    """Get a user object without printing it"""
+
+    response = api_request(ctx, "GET", f"/users/{user_id}")
+
+    # The user was deleted after the role assignees were listed
+    if response.status_code == 404:
+        return None, False
+
+    if not response.ok:
+        report_error(ctx, "Error retrieving user information", response, module=__name__)
+        return None, True
+
+    return response.data, False
+
+
+def list_user_roles(ctx, okta_user):
+    """List the roles assigned to a user without printing them"""
+
+    return OktaUser(okta_user).list_roles(ctx, mute=True, cached=True)
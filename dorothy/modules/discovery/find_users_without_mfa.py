@@ -19,18 +19,32 @@
 
 # Identify Okta users with no MFA factors enrolled
 
+import asyncio
 import logging.config
-import time
 from pathlib import Path
 
 import click
 
-from dorothy.core import OktaUser, write_json_file, load_json_file, index_event
+from dorothy.checkpoint import Checkpoint, resume_checkpoint
+from dorothy.core import (
+    MAX_USERS_LIMIT,
+    Module,
+    OktaUser,
+    write_json_file,
+    load_json_file,
+    index_event,
+    describe_user_harvest,
+    user_harvest_options,
+    user_harvest_params,
+)
 from dorothy.modules.discovery.discovery import discovery
+from dorothy.workers import async_available, fan_out, fan_out_async
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Identify Okta users with no MFA factors enrolled"
-TACTICS = ["Discovery"]
+
+MODULE_OPTIONS = user_harvest_options()
+MODULE = Module(MODULE_OPTIONS)
+CHECKPOINT_NAME = "find_users_without_mfa"
 
 
 @discovery.subshell(name="find-users-without-mfa")
@@ -43,6 +57,32 @@ def find_users_without_mfa(ctx):
     """
 
 
+@find_users_without_mfa.command()
+def info():
+    """Show available options and their current values for this module"""
+
+    MODULE.print_info()
+
+
+@find_users_without_mfa.command()
+@click.pass_context
+@click.option("--search", help=MODULE_OPTIONS["search"]["help"])
+@click.option("--filter", help=MODULE_OPTIONS["filter"]["help"])
+@click.option("--query", help=MODULE_OPTIONS["query"]["help"])
+@click.option("--limit", type=click.IntRange(1, MAX_USERS_LIMIT), help=MODULE_OPTIONS["limit"]["help"])
+def set(ctx, **kwargs):
+    """Set one or more options for this module"""
+
+    MODULE.set_options(ctx, kwargs)
+
+
+@find_users_without_mfa.command()
+def reset():
+    """Reset the options for this module"""
+
+    MODULE.reset_options()
+
+
 @find_users_without_mfa.command()
 @click.pass_context
 def execute(ctx):
@@ -51,11 +91,18 @@ def execute(ctx):
     options = (
         "[*] Available options\n"
         "[1] Load harvested users from a json file and check their enrolled MFA factors\n"
-        "[2] Harvest all users and check their enrolled MFA factors\n"
+        "[2] Harvest users matching the module options (all users by default) and check their enrolled MFA factors\n"
+        "[3] Load harvested users from the data store and check their enrolled MFA factors\n"
         "[0] Exit this menu\n"
         "[*] Choose from the above options"
     )
 
+    checkpoint = resume_checkpoint(ctx, CHECKPOINT_NAME, __name__)
+
+    if checkpoint:
+        check_enrolled_factors(ctx, checkpoint)
+        return
+
     while True:
         value = click.prompt(options, type=int)
 
@@ -72,7 +119,8 @@ def execute(ctx):
                 index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
                 click.echo(f"[*] {msg}")
                 users = load_json_file(file_path)
-                check_enrolled_factors(ctx, users)
+                source = {"type": "file", "file_path": str(file_path)}
+                check_enrolled_factors(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, source, users))
                 return
 
             else:
@@ -83,18 +131,37 @@ def execute(ctx):
 
         elif value == 2:
             if click.confirm(
-                "[*] Do you want to attempt to harvest information for all users? This may take a while "
-                "to avoid exceeding API rate limits",
+                f"[*] Do you want to attempt to harvest information for {describe_user_harvest(MODULE_OPTIONS)}? "
+                f"This may take a while to avoid exceeding API rate limits",
                 default=True,
             ):
-                msg = "Attempting to harvest all Okta users"
+                msg = f"Attempting to harvest {describe_user_harvest(MODULE_OPTIONS)}"
                 LOGGER.info(msg)
                 index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
                 click.echo(f"[*] {msg}")
-                users = ctx.obj.okta.get_users(ctx)
-                check_enrolled_factors(ctx, users)
+                # Start checking users from the first page while the next pages are retrieved
+                users = ctx.obj.okta.iter_users(ctx, **user_harvest_params(MODULE_OPTIONS))
+                check_enrolled_factors(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, {"type": "harvest"}, users))
                 return
 
+        elif value == 3:
+            users = ctx.obj.store.objects("users")
+
+            if len(users):
+                msg = f"Attempting to check enrolled MFA factors for {len(users)} users in the data store"
+                LOGGER.info(msg)
+                index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+                click.echo(f"[*] {msg}")
+                source = {"type": "store", "table": "users"}
+                check_enrolled_factors(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, source, users))
+                return
+
+            else:
+                msg = "No users found in the data store. Harvest users first"
+                LOGGER.error(msg)
+                index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
+                click.secho(f"[!] {msg}", fg="red")
+
         elif value == 0:
             return
 
@@ -102,38 +169,63 @@ def execute(ctx):
             click.secho("[!] Invalid option selected", fg="red")
 
 
-def check_enrolled_factors(ctx, users):
-    """Check for users that have no MFA factors enrolled"""
+def check_enrolled_factors(ctx, checkpoint):
+    """Check for users that have no MFA factors enrolled
+
+    Progress and the users without MFA found so far are saved in the checkpoint, so that the check can be resumed if
+    it is stopped by an error or interrupted
+    """
 
-    users_without_mfa = []
+    users = checkpoint.objects
+    users_without_mfa = checkpoint.results
 
-    msg = (
-        f"Checking enrolled MFA factors for {len(users)} users. This may take a while to avoid exceeding API "
-        f"rate limits"
-    )
+    # Harvested users are streamed page by page, so their number is only known if they were loaded from a file or the
+    # data store
+    length = len(users) if hasattr(users, "__len__") else None
+
+    if length is None:
+        msg = "Checking enrolled MFA factors for users as they are harvested. This may take a while"
+    else:
+        msg = f"Checking enrolled MFA factors for {length} users. This may take a while"
     LOGGER.info(msg)
     index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
     click.echo(f"[*] {msg}")
 
+    # Send the lookups from a single thread with the asyncio client if it's available, otherwise from worker threads
+    if async_available(ctx):
+        lookups = fan_out_async(ctx, list_user_factors_async, users)
+    else:
+        lookups = fan_out(ctx, list_user_factors, users)
+
     # Don't put print statements under click.progressbar otherwise the progress bar will be interrupted
-    with click.progressbar(users, label="[*] Checking for users without MFA enrolled") as users:
-        for okta_user in users:
-            user = OktaUser(okta_user)
-            factors, error = user.list_enrolled_factors(ctx, mute=True)
+    completed = False
 
-            # Stop trying to check enrolled MFA factors if the current API token doesn't have that permission
-            if error:
-                return
+    try:
+        with click.progressbar(lookups, length=length, label="[*] Checking for users without MFA enrolled") as results:
+            for okta_user, factors, error in results:
+                user = OktaUser(okta_user)
 
-            if not factors:
-                users_without_mfa.append(user.obj)
+                # Stop trying to check enrolled MFA factors if the current API token doesn't have that permission
+                if error:
+                    return
 
-                msg = f'User {user.obj["id"]} does not have any MFA factors enrolled'
-                LOGGER.info(msg)
-                index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+                if not factors:
+                    msg = f'User {user.obj["id"]} does not have any MFA factors enrolled'
+                    LOGGER.info(msg)
+                    index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+
+                checkpoint.advance(None if factors else user.obj)
+
+        # A harvest stops early if a page of users couldn't be retrieved
+        completed = not getattr(users, "error", False)
 
-            # Sleep for 1s to avoid exceeding API rate limits
-            time.sleep(1)
+    except KeyboardInterrupt:
+        return
+
+    finally:
+        # Save the roles and factors retrieved so far, even if the check was stopped by an error
+        ctx.obj.cache.save()
+        checkpoint.close(ctx, completed, __name__)
 
     if users_without_mfa:
         msg = f"Found {len(users_without_mfa)} users without any MFA factors enrolled"
@@ -157,3 +249,39 @@ def check_enrolled_factors(ctx, users):
         click.echo(f"[*] {msg}")
 
     return users_without_mfa
+
+
+def list_user_factors(ctx, okta_user):
+    """List the MFA factors enrolled for a user without printing them"""
+
+    return OktaUser(okta_user).list_enrolled_factors(ctx, mute=True, cached=True)
+
+
+async def list_user_factors_async(ctx, client, okta_user):
+    """List the MFA factors enrolled for a user with the asyncio Okta client. Uses the result cache like
+    list_user_factors()"""
+
+    factors = ctx.obj.cache.get("factors", okta_user)
+
+    if factors is not None:
+        return factors, False
+
+    msg = f'Attempting to get enrolled MFA factors for user {okta_user["id"]}'
+    LOGGER.info(msg)
+    index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+
+    try:
+        factors = await client.list_factors(okta_user["id"])
+    except asyncio.CancelledError:
+        # CancelledError is a subclass of Exception before Python 3.8. Let the task be cancelled
+        raise
+    except Exception as e:
+        msg = f'Error retrieving enrolled MFA factors for user {okta_user["id"]}\n    Error: {e}'
+        LOGGER.error(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
+        click.secho(f"[!] {msg}", fg="red")
+        return [], True
+
+    ctx.obj.cache.put("factors", okta_user, factors)
+
+    return factors, False
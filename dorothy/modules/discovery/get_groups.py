@@ -23,12 +23,14 @@ import logging.config
 
 import click
 
-from dorothy.core import index_event
+from dorothy.checkpoint import Checkpoint, resume_checkpoint
+from dorothy.core import OktaGroup, index_event, write_json_file
 from dorothy.modules.discovery.discovery import discovery
+from dorothy.snapshots import harvest_changes
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Harvest information on all Okta groups"
-TACTICS = ["Discovery"]
+
+CHECKPOINT_NAME = "get_groups"
 
 
 @discovery.subshell(name="get-groups")
@@ -42,6 +44,38 @@ def get_groups(ctx):
 def execute(ctx):
     """Execute this module with the configured options"""
 
+    checkpoint = resume_checkpoint(ctx, CHECKPOINT_NAME, __name__)
+
+    if checkpoint:
+        checkpoint.objects.mute = False
+        ctx.obj.okta.get_groups(ctx, checkpoint)
+        return
+
+    harvest_info = ctx.obj.store.harvest_info("groups")
+
+    if harvest_info and harvest_info["watermark"]:
+        if click.confirm(
+            f'[*] Found {harvest_info["count"]} groups in the data store harvested at {harvest_info["harvested"]}. '
+            f"Do you want to only harvest the groups changed since then?",
+            default=True,
+        ):
+            result = harvest_changes(ctx, "groups", harvest_info)
+
+            if result:
+                harvested_groups, changed_groups = result
+
+                if changed_groups and click.confirm(
+                    "[*] Do you want to print changed group information?", default=True
+                ):
+                    for okta_group in changed_groups:
+                        OktaGroup(okta_group).print_info()
+
+                if click.confirm("[*] Do you want to save harvested group information to a file?", default=True):
+                    file_path = f"{ctx.obj.data_dir}/{ctx.obj.profile_id}_harvested_groups"
+                    write_json_file(file_path, harvested_groups)
+
+            return
+
     if click.confirm(
         "[*] Do you want to attempt to harvest information on all groups? This may take a while to avoid "
         "exceeding API rate limits",
@@ -52,4 +86,5 @@ def execute(ctx):
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.echo(f"[*] {msg}")
 
-        ctx.obj.okta.get_groups(ctx)
+        harvest = ctx.obj.okta.iter_groups(ctx, mute=False)
+        ctx.obj.okta.get_groups(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, {"type": "harvest"}, harvest))
@@ -27,8 +27,6 @@ from dorothy.core import OktaPolicy, write_json_file, index_event
 from dorothy.modules.discovery.discovery import discovery
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Harvest information on all Okta policies and policy rules"
-TACTICS = ["Discovery"]
 
 
 @discovery.subshell(name="get-policies")
@@ -47,12 +45,16 @@ def execute(ctx):
     ):
 
         harvested_policies = []
+        # Only replace the policies in the data store if no errors occurred
+        complete = True
 
         policy_types = ctx.obj.policy_types
 
         # Get a list of all policies by policy type
         for policy_type in policy_types:
             policies = ctx.obj.okta.get_policies_by_type(ctx, policy_type)
+            if policies is None:
+                complete = False
             if policies:
                 harvested_policies.extend(policies)
 
@@ -67,9 +69,19 @@ def execute(ctx):
                     LOGGER.error(msg)
                     index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
                     click.secho(f"[!] {msg}", fg="red")
+                    complete = False
                 else:
                     policies_and_rules.append(policy_and_rules)
 
+        policy_rules = [rule for policy in policies_and_rules for rule in policy.get("_embedded", {}).get("rules", [])]
+
+        if complete:
+            ctx.obj.store.replace_objects("policies", policies_and_rules)
+            ctx.obj.store.replace_objects("rules", policy_rules)
+        else:
+            ctx.obj.store.save_objects("policies", policies_and_rules)
+            ctx.obj.store.save_objects("rules", policy_rules)
+
         if policies_and_rules:
             if click.confirm("[*] Do you want to print harvested policy information?", default=True):
                 for okta_policy in policies_and_rules:
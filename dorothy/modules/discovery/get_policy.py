@@ -32,8 +32,6 @@ from dorothy.core import (
 from dorothy.modules.discovery.discovery import discovery
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Get an Okta policy and its rules"
-TACTICS = ["Discovery"]
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for policy"}}
 MODULE = Module(MODULE_OPTIONS)
@@ -30,8 +30,6 @@ from dorothy.core import (
 from dorothy.modules.discovery.discovery import discovery
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Get an Okta user's profile info and group memberships"
-TACTICS = ["Discovery"]
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the user"}}
 MODULE = Module(MODULE_OPTIONS)
@@ -23,18 +23,61 @@ import logging.config
 
 import click
 
-from dorothy.core import index_event
+from dorothy.checkpoint import Checkpoint, resume_checkpoint
+from dorothy.core import (
+    MAX_USERS_LIMIT,
+    Module,
+    OktaUser,
+    describe_user_harvest,
+    index_event,
+    user_harvest_options,
+    user_harvest_params,
+    write_json_file,
+)
 from dorothy.modules.discovery.discovery import discovery
+from dorothy.snapshots import harvest_changes
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Harvest information on all Okta users"
-TACTICS = ["Discovery"]
+
+CHECKPOINT_NAME = "get_users"
+
+MODULE_OPTIONS = user_harvest_options()
+MODULE = Module(MODULE_OPTIONS)
 
 
 @discovery.subshell(name="get-users")
 @click.pass_context
 def get_users(ctx):
-    """Harvest information on all Okta users"""
+    """Harvest information on all Okta users.
+
+    Set a search, filter or query expression to only harvest the matching users. E.g. status eq "ACTIVE"
+    """
+
+
+@get_users.command()
+def info():
+    """Show available options and their current values for this module"""
+
+    MODULE.print_info()
+
+
+@get_users.command()
+@click.pass_context
+@click.option("--search", help=MODULE_OPTIONS["search"]["help"])
+@click.option("--filter", help=MODULE_OPTIONS["filter"]["help"])
+@click.option("--query", help=MODULE_OPTIONS["query"]["help"])
+@click.option("--limit", type=click.IntRange(1, MAX_USERS_LIMIT), help=MODULE_OPTIONS["limit"]["help"])
+def set(ctx, **kwargs):
+    """Set one or more options for this module"""
+
+    MODULE.set_options(ctx, kwargs)
+
+
+@get_users.command()
+def reset():
+    """Reset the options for this module"""
+
+    MODULE.reset_options()
 
 
 @get_users.command()
@@ -42,14 +85,47 @@ def get_users(ctx):
 def execute(ctx):
     """Execute this module with the configured options"""
 
+    checkpoint = resume_checkpoint(ctx, CHECKPOINT_NAME, __name__)
+
+    if checkpoint:
+        checkpoint.objects.mute = False
+        ctx.obj.okta.get_users(ctx, checkpoint)
+        return
+
+    # Only full harvests can be updated incrementally, so the harvest can't be scoped with the options
+    scoped = any(MODULE_OPTIONS[name]["value"] for name in ("search", "filter", "query"))
+    harvest_info = None if scoped else ctx.obj.store.harvest_info("users")
+
+    if harvest_info and harvest_info["watermark"]:
+        if click.confirm(
+            f'[*] Found {harvest_info["count"]} users in the data store harvested at {harvest_info["harvested"]}. Do '
+            f"you want to only harvest the users changed since then?",
+            default=True,
+        ):
+            result = harvest_changes(ctx, "users", harvest_info)
+
+            if result:
+                harvested_users, changed_users = result
+
+                if changed_users and click.confirm("[*] Do you want to print changed user information?", default=True):
+                    for okta_user in changed_users:
+                        OktaUser(okta_user).print_info()
+
+                if click.confirm("[*] Do you want to save harvested user information to a file?", default=True):
+                    file_path = f"{ctx.obj.data_dir}/{ctx.obj.profile_id}_harvested_users"
+                    write_json_file(file_path, harvested_users)
+
+            return
+
     if click.confirm(
-        "[*] Do you want to attempt to harvest information for all users? This may take a while to avoid "
-        "exceeding API rate limits",
+        f"[*] Do you want to attempt to harvest information for {describe_user_harvest(MODULE_OPTIONS)}? This may "
+        f"take a while to avoid exceeding API rate limits",
         default=True,
     ):
-        msg = "Attempting to harvest all Okta users"
+        msg = f"Attempting to harvest {describe_user_harvest(MODULE_OPTIONS)}"
         LOGGER.info(msg)
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.echo(f"[*] {msg}")
 
-        ctx.obj.okta.get_users(ctx)
+        harvest = ctx.obj.okta.iter_users(ctx, **user_harvest_params(MODULE_OPTIONS), mute=False)
+        ctx.obj.okta.get_users(ctx, Checkpoint.start(ctx, CHECKPOINT_NAME, {"type": "harvest"}, harvest))
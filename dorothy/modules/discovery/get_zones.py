@@ -27,8 +27,6 @@ from dorothy.core import index_event
 from dorothy.modules.discovery.discovery import discovery
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Harvest information on all Okta network zones"
-TACTICS = ["Discovery"]
 
 
 @discovery.subshell(name="get-zones")
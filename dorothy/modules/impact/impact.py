@@ -22,16 +22,7 @@
 import click
 
 from dorothy.main import dorothy_shell
-from dorothy.modules.defense_evasion import (
-    change_app_state,
-    change_rule_state,
-    change_zone_state,
-    change_policy_state,
-    modify_policy,
-    modify_policy_rule,
-    modify_zone,
-)
-from dorothy.modules.persistence import change_user_state
+from dorothy.registry import tactic_commands
 
 
 @dorothy_shell.subshell(name="impact")
@@ -40,12 +31,5 @@ def impact(ctx):
     """Modules to interrupt components of the Okta environment"""
 
 
-# Reuse a few commands from defense_evasion
-impact.add_command(change_user_state.change_user_state)
-impact.add_command(change_app_state.change_app_state)
-impact.add_command(change_rule_state.change_rule_state)
-impact.add_command(change_zone_state.change_zone_state)
-impact.add_command(change_policy_state.change_policy_state)
-impact.add_command(modify_policy.modify_policy)
-impact.add_command(modify_policy_rule.modify_policy_rule)
-impact.add_command(modify_zone.modify_zone)
+# Reuse a few commands from defense_evasion and persistence. Modules are imported when a user enters them
+impact.add_lazy_commands(tactic_commands("Impact"))
@@ -23,15 +23,24 @@ import logging.config
 from pathlib import Path
 
 import click
-from tabulate import tabulate
 
-from dorothy.config import load_config_profiles, choose_profile, create_profile
-from dorothy.core import index_event, setup_elasticsearch_client
-from dorothy.main import dorothy_shell
+from dorothy.cache import ResultCache
+from dorothy.config import (
+    DEFAULT_SETTINGS,
+    apply_retention_policy,
+    remove_saved_files,
+    load_config_profiles,
+    choose_profile,
+    create_profile,
+    load_settings,
+    parse_setting,
+    save_settings,
+)
+from dorothy.core import OktaOrg, index_event, setup_elasticsearch_client
+from dorothy.main import dorothy_shell, setup_session
+from dorothy.store import DataStore
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Manage Dorothy's configuration profiles"
-TACTICS = ["-"]
 
 
 @dorothy_shell.subshell(name="manage-config")
@@ -46,17 +55,15 @@ def manage_config(ctx):
 def create_new_profile(ctx):
     """Create a configuration profile"""
 
+    if switching_refused(ctx):
+        return
+
     create_profile(ctx.obj.config_dir)
     config_files = load_config_profiles(ctx.obj.config_dir)
     config = choose_profile(config_files)
-    es_client = setup_elasticsearch_client(config["okta_url"])
+    es_client = setup_elasticsearch_client(config["okta_url"], ctx.obj.data_dir)
 
-    # Update the Dorothy class object with the values from the chosen configuration profile
-    ctx.obj.base_url = config["okta_url"]
-    ctx.obj.api_token = config["api_token"]
-    ctx.obj.profile_id = config["id"]
-    ctx.obj.es_client = es_client
-    pass
+    switch_profile(ctx, config, es_client)
 
 
 @manage_config.command()
@@ -64,15 +71,14 @@ def create_new_profile(ctx):
 def load_profile(ctx):
     """Load a configuration profile"""
 
+    if switching_refused(ctx):
+        return
+
     config_files = load_config_profiles(ctx.obj.config_dir)
     config = choose_profile(config_files)
-    es_client = setup_elasticsearch_client(config["okta_url"])
+    es_client = setup_elasticsearch_client(config["okta_url"], ctx.obj.data_dir)
 
-    # Update the Dorothy class object with the values from the chosen configuration profile
-    ctx.obj.base_url = config["okta_url"]
-    ctx.obj.api_token = config["api_token"]
-    ctx.obj.profile_id = config["id"]
-    ctx.obj.es_client = es_client
+    switch_profile(ctx, config, es_client)
 
 
 @manage_config.command()
@@ -80,16 +86,85 @@ def load_profile(ctx):
 def show_current(ctx):
     """Show info on the loaded configuration profiles"""
 
+    from tabulate import tabulate
+
     headers = ["URL", "Profile ID"]
     profile_info = [(ctx.obj.base_url, ctx.obj.profile_id)]
     click.echo(tabulate(profile_info, headers=headers, tablefmt="pretty"))
 
 
+@manage_config.command()
+@click.pass_context
+def show_settings(ctx):
+    """Show the settings for the loaded configuration profile"""
+
+    from tabulate import tabulate
+
+    headers = ["Setting", "Value", "Default"]
+    settings = [(k.replace("_", "-"), v, DEFAULT_SETTINGS.get(k)) for k, v in ctx.obj.settings.items()]
+    click.echo(tabulate(settings, headers=headers, tablefmt="pretty"))
+
+
+@manage_config.command()
+@click.pass_context
+@click.option("--name", required=True, help="Name of the setting to change. E.g. rate-limit-headroom")
+@click.option("--value", required=True, help="New value for the setting")
+def change_setting(ctx, name, value):
+    """Change a setting for the loaded configuration profile"""
+
+    name = name.replace("-", "_")
+
+    if name not in DEFAULT_SETTINGS:
+        click.secho(
+            f'[!] Unknown setting: {name.replace("_", "-")}. Execute "show-settings" to list settings', fg="red"
+        )
+        return
+
+    try:
+        ctx.obj.settings[name] = parse_setting(name, value)
+    except ValueError:
+        click.secho(f'[!] Invalid value for {name.replace("_", "-")}: {value}', fg="red")
+        return
+
+    ctx.obj.session.rate_limiter.headroom = ctx.obj.settings["rate_limit_headroom"]
+    ctx.obj.cache.max_age = ctx.obj.settings["cache_max_age"]
+    ctx.obj.session.resize_pools(ctx.obj.settings["max_workers"])
+    save_settings(ctx.obj.config_dir, ctx.obj.profile_id, ctx.obj.settings)
+
+    if name.startswith("retention_"):
+        apply_retention_policy(ctx.obj.data_dir, ctx.obj.profile_id, ctx.obj.settings)
+
+    msg = f'Setting {name.replace("_", "-")} changed to {ctx.obj.settings[name]}'
+    LOGGER.info(msg)
+    index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+    click.secho(f"[*] {msg}", fg="green")
+
+
+@manage_config.command()
+@click.pass_context
+def clear_cache(ctx):
+    """Clear the cached roles and MFA factors for the loaded configuration profile"""
+
+    if click.confirm(
+        "[*] Do you want to clear the cached roles and MFA factors? The next checks will retrieve them from Okta again",
+        default=True,
+    ):
+        ctx.obj.cache.clear()
+
+        msg = f"Result cache cleared for configuration profile {ctx.obj.profile_id}"
+        LOGGER.info(msg)
+        index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+        click.secho(f"[*] {msg}", fg="green")
+
+
 @manage_config.command()
 @click.pass_context
 def delete_profile(ctx):
     """Delete a configuration profile and (optionally) its associated saved data"""
 
+    if switching_refused(ctx):
+        return
+
     config_files = load_config_profiles(ctx.obj.config_dir)
 
     while True:
@@ -109,19 +184,15 @@ def delete_profile(ctx):
                     default=True,
                 ):
                     config = choose_profile(config_files)
-                    es_client = setup_elasticsearch_client(config["okta_url"])
+                    es_client = setup_elasticsearch_client(config["okta_url"], ctx.obj.data_dir)
                 else:
                     config = create_profile(ctx.obj.config_dir)
-                    es_client = setup_elasticsearch_client(config["okta_url"])
+                    es_client = setup_elasticsearch_client(config["okta_url"], ctx.obj.data_dir)
             else:
                 config = create_profile(ctx.obj.config_dir)
-                es_client = setup_elasticsearch_client(config["okta_url"])
+                es_client = setup_elasticsearch_client(config["okta_url"], ctx.obj.data_dir)
 
-            # Update the Dorothy class object with the values from the chosen configuration profile
-            ctx.obj.base_url = config["okta_url"]
-            ctx.obj.api_token = config["api_token"]
-            ctx.obj.profile_id = config["id"]
-            ctx.obj.es_client = es_client
+            switch_profile(ctx, config, es_client)
 
             return
 
@@ -129,6 +200,46 @@ def delete_profile(ctx):
             click.secho("[!] Invalid choice. Try again", fg="red")
 
 
+def switching_refused(ctx):
+    """Return True if the configuration profile can't be switched because the command is run in the Dorothy daemon
+
+    The daemon keeps one object for each configuration profile and passes it to every command run for that profile.
+    Switching the profile of the object would run later commands for the original profile against another Okta org
+    """
+
+    if not ctx.obj.daemon:
+        return False
+
+    msg = "Configuration profiles can't be created, loaded or deleted by commands run in the Dorothy daemon"
+    LOGGER.error(msg)
+    click.secho(f"[!] {msg}", fg="red")
+    click.echo('[*] Run commands for another configuration profile with "dorothy-daemon run --profile NAME ..."')
+    return True
+
+
+def switch_profile(ctx, config, es_client):
+    """Update the Dorothy class object with the values from the chosen configuration profile"""
+
+    # Flush the log events queued for the previous profile before indexing events for the new one
+    if ctx.obj.es:
+        ctx.obj.es.close()
+    ctx.obj.es = es_client
+
+    ctx.obj.okta = OktaOrg(config["api_token"], config["okta_url"])
+    ctx.obj.base_url = config["okta_url"]
+    ctx.obj.api_token = config["api_token"]
+    ctx.obj.profile_id = config["id"]
+    ctx.obj.settings = load_settings(config)
+
+    # Start a new session instance so that the new tenant gets its own transport adapters, rate limits and metrics
+    ctx.obj.session.close()
+    ctx.obj.session = setup_session(config, ctx.obj.settings)
+
+    ctx.obj.store.close()
+    ctx.obj.store = DataStore.for_profile(ctx.obj.data_dir, config["id"])
+    ctx.obj.cache = ResultCache(ctx.obj.store, ctx.obj.settings["cache_max_age"])
+
+
 def delete_configuration_profile(ctx, config):
     msg = f'[*] Do you want to delete the configuration profile for {config["description"]} ({config["okta_url"]})?'
 
@@ -154,7 +265,7 @@ def delete_saved_data(ctx, profile_id):
             default=True,
         ):
             for file in files:
-                file.unlink()
+                remove_saved_files(file.parent, [file.name])
 
                 msg = f"File deleted ({file})"
                 LOGGER.info(msg)
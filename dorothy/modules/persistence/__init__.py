@@ -17,14 +17,4 @@
 # under the License.
 #
 
-from dorothy.modules.persistence import (
-    persistence,
-    create_user,
-    create_admin_user,
-    create_admin_group,
-    reset_factors,
-    reset_password,
-    change_user_state,
-    set_recovery_question,
-    delete_factor,
-)
+from dorothy.modules.persistence import persistence
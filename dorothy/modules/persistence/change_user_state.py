@@ -31,8 +31,6 @@ from dorothy.core import (
 from dorothy.modules.persistence.persistence import persistence
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Change an Okta user's state by executing lifecycle operations"
-TACTICS = ["Persistence", "Impact"]
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the user"}}
 MODULE = Module(MODULE_OPTIONS)
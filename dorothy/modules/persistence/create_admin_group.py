@@ -31,8 +31,6 @@ from dorothy.core import (
 from dorothy.modules.persistence.persistence import persistence
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Assign an admin role to an Okta group"
-TACTICS = ["Persistence"]
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the Okta group"}}
 MODULE = Module(MODULE_OPTIONS)
@@ -23,13 +23,10 @@ import logging.config
 
 import click
 
-from dorothy.core import Module, index_event
+from dorothy.core import Module, api_request, index_event, report_error
 from dorothy.modules.persistence.persistence import persistence
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Create and activate an Okta user with an assigned password"
-TACTICS = ["Persistence"]
-URL_OR_API_TOKEN_ERROR = "ERROR. Verify that the Okta URL and API token in your configuration profile are correct"
 
 MODULE_OPTIONS = {
     "first_name": {"value": None, "required": True, "help": "Given name of the user"},
@@ -100,13 +97,6 @@ def execute(ctx):
     index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
     click.echo(f"[*] {msg}")
 
-    url = f"{ctx.obj.base_url}/users"
-
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"SSWS {ctx.obj.api_token}",
-    }
     # Activate the new user when it's created
     params = {"activate": "true"}
     payload = {
@@ -120,13 +110,7 @@ def execute(ctx):
         "credentials": {"password": {"value": password}},
     }
 
-    try:
-        response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-    except Exception as e:
-        LOGGER.error(e, exc_info=True)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-        click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-        response = None
+    response = api_request(ctx, "POST", "/users", params=params, payload=payload)
 
     if response.ok:
         msg = f'Created new Okta user {MODULE_OPTIONS["login"]["value"]}'
@@ -134,14 +118,7 @@ def execute(ctx):
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
         click.secho(f"[*] {msg}", fg="green")
     else:
-        msg = (
-            f"Error creating new Okta user\n"
-            f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-            f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-        )
-        LOGGER.error(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-        click.secho(f"[!] {msg}", fg="red")
+        report_error(ctx, "Error creating new Okta user", response, module=__name__)
         click.echo('Did you try and add the new user to a built-in group? E.g. "Everyone"')
 
         return
@@ -32,8 +32,6 @@ from dorothy.core import (
 from dorothy.modules.persistence.persistence import persistence
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Remove a MFA factor for a specified Okta user"
-TACTICS = ["Persistence"]
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the user"}}
 MODULE = Module(MODULE_OPTIONS)
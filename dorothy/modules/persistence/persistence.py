@@ -22,6 +22,7 @@
 import click
 
 from dorothy.main import dorothy_shell
+from dorothy.registry import tactic_commands
 
 
 @dorothy_shell.subshell(name="persistence")
@@ -29,3 +30,7 @@ from dorothy.main import dorothy_shell
 def persistence(ctx):
     """Modules to maintain persistence in the Okta environment"""
     pass
+
+
+# Modules are imported when a user enters them
+persistence.add_lazy_commands(tactic_commands("Persistence"))
@@ -25,14 +25,13 @@ import click
 
 from dorothy.core import (
     Module,
+    api_request,
     index_event,
+    report_error,
 )
 from dorothy.modules.persistence.persistence import persistence
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Reset all MFA factors for an Okta user"
-TACTICS = ["Persistence"]
-URL_OR_API_TOKEN_ERROR = "ERROR. Verify that the Okta URL and API token in your configuration profile are correct"
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the user"}}
 MODULE = Module(MODULE_OPTIONS)
@@ -85,26 +84,13 @@ def execute(ctx):
     index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
     click.echo(f"[*] {msg}")
 
-    url = f'{ctx.obj.base_url}/users/{MODULE_OPTIONS["id"]["value"]}/lifecycle/reset_factors'
+    url = f'/users/{MODULE_OPTIONS["id"]["value"]}/lifecycle/reset_factors'
 
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"SSWS {ctx.obj.api_token}",
-    }
-
-    params = {}
-    payload = {}
-
-    try:
-        response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-    except Exception as e:
-        LOGGER.error(e, exc_info=True)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-        click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-        response = None
+    response = api_request(ctx, "POST", url, payload={})
 
     if response.ok:
+        ctx.obj.cache.invalidate("factors", MODULE_OPTIONS["id"]["value"])
+
         msg = f'MFA factors reset for user {MODULE_OPTIONS["id"]["value"]}'
         LOGGER.info(msg)
         index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
@@ -113,14 +99,7 @@ def execute(ctx):
         ctx.obj.okta.get_user(ctx, MODULE_OPTIONS["id"]["value"])
 
     else:
-        msg = (
-            f"Error resetting MFA factors for Okta user\n"
-            f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-            f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-        )
-        LOGGER.error(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-        click.secho(f"[!] {msg}", fg="red")
+        report_error(ctx, "Error resetting MFA factors for Okta user", response, module=__name__)
         click.echo("Check that the user's status is ACTIVE and that they have at least one factor enrolled")
 
         return
@@ -23,13 +23,10 @@ import logging.config
 
 import click
 
-from dorothy.core import Module, index_event
+from dorothy.core import Module, api_request, index_event, report_error
 from dorothy.modules.persistence.persistence import persistence
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Generate a one-time token to reset a user's password"
-TACTICS = ["Persistence"]
-URL_OR_API_TOKEN_ERROR = "ERROR. Verify that the Okta URL and API token in your configuration profile are correct"
 
 MODULE_OPTIONS = {"id": {"value": None, "required": True, "help": "The unique ID for the user"}}
 MODULE = Module(MODULE_OPTIONS)
@@ -91,26 +88,13 @@ def execute(ctx):
     index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
     click.echo(f"[*] {msg}")
 
-    url = f'{ctx.obj.base_url}/users/{MODULE_OPTIONS["id"]["value"]}/lifecycle/reset_password'
-
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"SSWS {ctx.obj.api_token}",
-    }
+    url = f'/users/{MODULE_OPTIONS["id"]["value"]}/lifecycle/reset_password'
 
     # Set sendEmail to False. The default value for sendEmail is True, which will send the one-time token to the
     # target user
     params = {"sendEmail": "False"}
-    payload = {}
 
-    try:
-        response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-    except Exception as e:
-        LOGGER.error(e, exc_info=True)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-        click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-        response = None
+    response = api_request(ctx, "POST", url, params=params, payload={})
 
     if response.ok:
         msg = f'One-time password reset token generated for user {MODULE_OPTIONS["id"]["value"]}'
@@ -122,18 +106,10 @@ def execute(ctx):
             "forgot password flow until the password is reset"
         )
 
-        response = response.json()
-        click.echo(f'Reset password URL: {response["resetPasswordUrl"]}')
+        click.echo(f'Reset password URL: {response.data["resetPasswordUrl"]}')
 
     else:
-        msg = (
-            f"Error resetting password for user\n"
-            f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-            f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-        )
-        LOGGER.error(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-        click.secho(f"[!] {msg}", fg="red")
+        report_error(ctx, "Error resetting password for user", response, module=__name__)
         click.echo("Check the status of the user. The user's status must be ACTIVE")
 
         return
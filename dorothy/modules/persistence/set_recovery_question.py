@@ -25,14 +25,13 @@ import click
 
 from dorothy.core import (
     Module,
+    api_request,
     index_event,
+    report_error,
 )
 from dorothy.modules.persistence.persistence import persistence
 
 LOGGER = logging.getLogger(__name__)
-MODULE_DESCRIPTION = "Set the recovery question and answer for an Okta user"
-TACTICS = ["Persistence"]
-URL_OR_API_TOKEN_ERROR = "ERROR. Verify that the Okta URL and API token in your configuration profile are correct"
 
 MODULE_OPTIONS = {
     "id": {"value": None, "required": True, "help": "The unique ID for the user"},
@@ -91,15 +90,6 @@ def execute(ctx):
     index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
     click.echo(f"[*] {msg}")
 
-    url = f'{ctx.obj.base_url}/users/{MODULE_OPTIONS["id"]["value"]}'
-
-    headers = {
-        "Accept": "application/json",
-        "Content-Type": "application/json",
-        "Authorization": f"SSWS {ctx.obj.api_token}",
-    }
-
-    params = {}
     payload = {
         "credentials": {
             "recovery_question": {
@@ -109,13 +99,7 @@ def execute(ctx):
         }
     }
 
-    try:
-        response = ctx.obj.session.post(url, headers=headers, params=params, json=payload, timeout=7)
-    except Exception as e:
-        LOGGER.error(e, exc_info=True)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=e)
-        click.secho(f"[!] {URL_OR_API_TOKEN_ERROR}", fg="red")
-        response = None
+    response = api_request(ctx, "POST", f'/users/{MODULE_OPTIONS["id"]["value"]}', payload=payload)
 
     if response.ok:
         msg = f'Recovery question and answer set for user {MODULE_OPTIONS["id"]["value"]}'
@@ -126,13 +110,6 @@ def execute(ctx):
         ctx.obj.okta.get_user(ctx, MODULE_OPTIONS["id"]["value"])
 
     else:
-        msg = (
-            f"Error setting recovery question and answer for Okta user\n"
-            f"    Response Code: {response.status_code} | Response Reason: {response.reason}\n"
-            f'    Error Code: {response.json().get("errorCode")} | Error Summary: {response.json().get("errorSummary")}'
-        )
-        LOGGER.error(msg)
-        index_event(ctx.obj.es, module=__name__, event_type="ERROR", event=msg)
-        click.secho(f"[!] {msg}", fg="red")
+        report_error(ctx, "Error setting recovery question and answer for Okta user", response, module=__name__)
 
         return
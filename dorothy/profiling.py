@@ -0,0 +1,208 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Profile module executions to find out where the time goes, e.g. HTTP requests, JSON decoding or console output
+
+import cProfile
+import io
+import logging.config
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+LOGGER = logging.getLogger(__name__)
+
+PROFILES_DIR = Path.home() / "dorothy" / "logs" / "profiles"
+# Set to "cprofile" or "sample" to profile module executions from the start of the session
+PROFILE_ENV_VAR = "DOROTHY_PROFILE"
+PROFILE_MODES = ("off", "cprofile", "sample")
+# Seconds between stack samples in sample mode
+SAMPLE_INTERVAL = 0.01
+# Number of functions printed in the summary after each module execution
+DEFAULT_TOP = 20
+
+
+class Profiler:
+    """Profile each module execution with cProfile or by sampling the stacks of all threads
+
+    cProfile measures every function call in the thread running the module, which adds overhead but gives exact call
+    counts. Worker threads (max_workers > 1) aren't included. Sample mode records the wall-clock stacks of all
+    threads every SAMPLE_INTERVAL seconds, which has little overhead and is better suited to long sweeps
+    """
+
+    def __init__(self, mode="off", top=DEFAULT_TOP):
+        self.mode = mode
+        self.top = top
+        self.name = None
+        self.started = None
+        self._profile = None
+        self._sampler = None
+        self._samples = Counter()
+        self._stop = threading.Event()
+
+    def start(self, name):
+        """Start profiling a module execution"""
+
+        if self.mode == "off":
+            return
+
+        self.name = name
+        self.started = datetime.now()
+
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._samples = Counter()
+            self._stop.clear()
+            self._sampler = threading.Thread(target=self._sample, name="dorothy-profiler", daemon=True)
+            self._sampler.start()
+
+    def finish(self):
+        """Stop profiling, save the profile and print the functions that took the most time"""
+
+        if self._profile:
+            self._profile.disable()
+            profile, self._profile = self._profile, None
+            self._save_profile(profile)
+        elif self._sampler:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+            self._save_samples()
+
+    def file_path(self, suffix):
+        PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+        return PROFILES_DIR / f'{self.name}_{self.started.strftime("%Y-%m-%d_%H-%M-%S")}.{suffix}'
+
+    def _save_profile(self, profile):
+        file_path = self.file_path("pstats")
+        profile.dump_stats(file_path)
+
+        output = io.StringIO()
+        stats = pstats.Stats(profile, stream=output)
+        stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+
+        click.echo(output.getvalue())
+        self._report(file_path, 'Open it with: python -m pstats "{}"')
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {}
+
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+
+                stack = []
+                while frame:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+
+                stack.append(names.get(thread_id, str(thread_id)))
+                self._samples[";".join(reversed(stack))] += 1
+
+    def _save_samples(self):
+        # Folded stacks, one per line with the number of samples. The format used by flame graph tools
+        file_path = self.file_path("folded")
+        with open(file_path, "w") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in self._samples.most_common())
+
+        total = sum(self._samples.values())
+        own = Counter()
+        inclusive = Counter()
+
+        for stack, count in self._samples.items():
+            # Strip line numbers so that samples are counted per function
+            functions = [frame.rpartition(":")[0] or frame for frame in stack.split(";")[1:]]
+            if functions:
+                own[functions[-1]] += count
+            for function in set(functions):
+                inclusive[function] += count
+
+        rows = [
+            f"{count:>8} {100 * count / total:5.1f}% {100 * inclusive[function] / total:5.1f}%  {function}"
+            for function, count in own.most_common(self.top)
+        ]
+        click.echo(f"{total} samples of all threads every {SAMPLE_INTERVAL * 1000:.0f}ms")
+        click.echo("   Samples  Self   Total  Function")
+        click.echo("\n".join(rows))
+        self._report(file_path, "Render it with a flame graph tool, e.g. flamegraph.pl or speedscope")
+
+    def _report(self, file_path, hint):
+        msg = f"Saved profile of {self.name} to {file_path}"
+        LOGGER.info(msg)
+        click.echo(f"[*] {msg}. {hint.format(file_path)}")
+
+
+def mode_from_env():
+    """Return the profiling mode set with the DOROTHY_PROFILE environment variable"""
+
+    mode = os.environ.get(PROFILE_ENV_VAR, "off").lower()
+
+    if mode in ("1", "true", "on"):
+        return "cprofile"
+    if mode not in PROFILE_MODES:
+        LOGGER.error(f"Invalid value for {PROFILE_ENV_VAR}: {mode}. Valid values are {', '.join(PROFILE_MODES)}")
+        return "off"
+
+    return mode
+
+
+PROFILER = Profiler(mode_from_env())
+
+
+def configure(mode=None, top=None):
+    """Change the profiling mode and the number of functions printed after each module execution"""
+
+    if mode:
+        PROFILER.mode = mode
+    if top:
+        PROFILER.top = top
+
+    if PROFILER.mode == "off":
+        click.echo(f'[*] Profiling is off. Set {PROFILE_ENV_VAR} or execute "profile cprofile" to turn it on')
+    else:
+        click.echo(
+            f"[*] Profiling module executions in {PROFILER.mode} mode. Profiles are saved to {PROFILES_DIR} and the "
+            f"top {PROFILER.top} functions are printed after each execution"
+        )
+
+
+def start_execution(name):
+    """Start profiling a module execution if profiling is enabled"""
+
+    PROFILER.start(name)
+
+
+def finish_execution():
+    """Stop profiling a module execution"""
+
+    PROFILER.finish()
@@ -0,0 +1,228 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Throttle requests to the Okta API using the rate limit headers returned by Okta
+
+import logging.config
+import math
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+from urllib3.util.retry import Retry
+
+LOGGER = logging.getLogger(__name__)
+
+# Okta object IDs are 20 alphanumeric characters. E.g. 00u1ab2cd3EF4gh5I6j7
+OKTA_ID_PATTERN = re.compile(r"^[0-9A-Za-z]{20}$")
+# Seconds to wait beyond the reset time returned by Okta to allow for clock skew
+RESET_MARGIN = 1
+# Responses that are retried for idempotent requests. 429 is returned when a rate limit is exceeded and 502, 503 and
+# 504 are usually transient errors of Okta's load balancers
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+# Retries of a request after a connection error or one of the responses above
+MAX_RETRIES = 3
+# Base of the exponential backoff between retries in seconds (0.5s, 1s, 2s before jitter)
+RETRY_BACKOFF = 0.5
+# Maximum random delay in seconds added to the rate limit reset time so that waiting threads don't retry at once
+RETRY_JITTER = 1
+# Maximum number of seconds to wait before a retry. Okta rate limits are reset every minute
+MAX_RETRY_WAIT = 60
+# Methods that can be sent again without changing the result (urllib3's default allowed methods)
+IDEMPOTENT_METHODS = frozenset(["DELETE", "GET", "HEAD", "OPTIONS", "PUT", "TRACE"])
+
+
+@dataclass
+class RateLimitBucket:
+    """Rate limit state for a single Okta API endpoint"""
+
+    limit: int
+    remaining: int
+    reset: float
+
+
+class RateLimiter:
+    """Shared throttle for all requests sent through a session instance
+
+    Okta returns X-Rate-Limit-Limit, X-Rate-Limit-Remaining and X-Rate-Limit-Reset headers for each API endpoint.
+    Requests are sent as fast as the remaining budget allows. Once the remaining budget drops to the configured
+    headroom (a percentage of the limit kept free for other API clients), requests to that endpoint wait until Okta
+    resets the rate limit.
+
+    Reference: https://developer.okta.com/docs/reference/rl-best-practices/
+    """
+
+    def __init__(self, headroom=10):
+        self.headroom = headroom
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def endpoint(url):
+        """Return the endpoint for a URL with any Okta object IDs replaced. E.g. /api/v1/users/{id}/roles"""
+
+        path = urlparse(url).path.rstrip("/")
+        segments = ["{id}" if OKTA_ID_PATTERN.match(segment) else segment for segment in path.split("/")]
+
+        return "/".join(segments)
+
+    def reserve(self, url):
+        """Reserve one request from the budget of an endpoint and return the number of seconds to wait before sending
+        it"""
+
+        endpoint = self.endpoint(url)
+
+        with self._lock:
+            bucket = self.buckets.get(endpoint)
+            now = time.time()
+
+            # Nothing is known about the endpoint yet or its rate limit window has been reset
+            if bucket is None or now >= bucket.reset + RESET_MARGIN:
+                self.buckets.pop(endpoint, None)
+                return 0
+
+            reserved = math.ceil(bucket.limit * self.headroom / 100)
+
+            if bucket.remaining > reserved:
+                # Decrement optimistically so that concurrent requests don't overspend the budget before Okta responds
+                bucket.remaining -= 1
+                return 0
+
+            return bucket.reset + RESET_MARGIN - now
+
+    def wait(self, url):
+        """Block until a request can be sent to the endpoint without exceeding its rate limit"""
+
+        delay = self.reserve(url)
+
+        if delay > 0:
+            LOGGER.info(
+                f"Rate limit budget for {self.endpoint(url)} is exhausted (headroom {self.headroom}%). "
+                f"Waiting {delay:.1f}s for the rate limit to reset"
+            )
+            time.sleep(delay)
+
+    def update(self, response):
+        """Update the rate limit state of an endpoint from the headers of an Okta API response"""
+
+        self.record(response.url, response.status_code, response.headers)
+
+    def record(self, url, status_code, headers):
+        """Update the rate limit state of an endpoint from the status code and headers of a response"""
+
+        try:
+            limit = int(headers["X-Rate-Limit-Limit"])
+            remaining = int(headers["X-Rate-Limit-Remaining"])
+            reset = float(headers["X-Rate-Limit-Reset"])
+        except (KeyError, ValueError):
+            return
+
+        # Treat the budget as spent if the rate limit was exceeded, regardless of the value in the headers
+        if status_code == 429:
+            remaining = 0
+            LOGGER.warning(f"Rate limit exceeded for {self.endpoint(url)}")
+
+        with self._lock:
+            self.buckets[self.endpoint(url)] = RateLimitBucket(limit=limit, remaining=remaining, reset=reset)
+
+
+def backoff_wait(retries, backoff_factor=RETRY_BACKOFF):
+    """Return the exponential backoff in seconds before a retry with equal jitter"""
+
+    if not retries:
+        return 0
+
+    backoff = min(backoff_factor * 2 ** (retries - 1), MAX_RETRY_WAIT)
+
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+def reset_wait(headers):
+    """Return the seconds until the X-Rate-Limit-Reset time of a 429 response plus some jitter, or None"""
+
+    try:
+        reset = float(headers["X-Rate-Limit-Reset"])
+    except (KeyError, ValueError):
+        return None
+
+    return min(max(reset + RESET_MARGIN - time.time(), 0) + random.uniform(0, RETRY_JITTER), MAX_RETRY_WAIT)
+
+
+class OktaRetry(Retry):
+    """Retry policy for the transport adapters of a session instance
+
+    Connection errors are retried for all requests, but responses with a status in RETRY_STATUS_CODES and read errors
+    are only retried for idempotent methods (urllib3's default allowed methods), so that POST requests such as
+    lifecycle operations are never sent twice. Before a retry, the policy waits for the time in the Retry-After header
+    or, for a 429 response, until the X-Rate-Limit-Reset time plus some jitter. Otherwise it backs off exponentially
+    with jitter. The response of the last attempt is returned once the retries are exhausted.
+
+    Retried responses update the rate limiter, so that other threads wait for the reset instead of also exceeding the
+    rate limit, and are counted in the request metrics. The session instance only sees the response of the last attempt.
+    """
+
+    def __init__(self, total=MAX_RETRIES, *args, rate_limiter=None, metrics=None, **kwargs):
+        kwargs.setdefault("backoff_factor", RETRY_BACKOFF)
+        kwargs.setdefault("status_forcelist", RETRY_STATUS_CODES)
+        kwargs.setdefault("raise_on_status", False)
+        super().__init__(total, *args, **kwargs)
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.rate_limiter = self.rate_limiter
+        retry.metrics = self.metrics
+
+        return retry
+
+    def get_backoff_time(self):
+        """Return the exponential backoff for the number of attempts so far with equal jitter"""
+
+        return backoff_wait(len(self.history), self.backoff_factor)
+
+    def get_retry_after(self, response):
+        """Return the seconds to wait from the Retry-After header or the rate limit reset time of a 429 response"""
+
+        retry_after = super().get_retry_after(response)
+
+        if retry_after is None:
+            return reset_wait(response.headers) if response.status == 429 else None
+
+        return min(retry_after, MAX_RETRY_WAIT)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if response is not None and self.rate_limiter:
+            self.rate_limiter.record(url, response.status, response.headers)
+
+        # Raises MaxRetryError once the retries are exhausted, and the session instance records the last response
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+
+        # The latency of a retried attempt isn't known here, so it's only counted
+        if self.metrics:
+            status_code, headers = (response.status, response.headers) if response is not None else (None, {})
+            self.metrics.record(method, url, status_code, headers, None)
+
+        cause = f"status {response.status}" if response is not None else error
+        LOGGER.info(f"Retrying {method} {url} after {cause} (retry {len(retry.history)})")
+
+        return retry
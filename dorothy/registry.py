@@ -0,0 +1,204 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Names, tactics and descriptions of Dorothy's modules, which are listed without importing the modules
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ModuleInfo:
+    """A module, the tactics it's mapped to and its description
+
+    The module is imported the first time a user enters it. Its command is the function with the same name as the
+    module file, e.g. find_admins in dorothy.modules.discovery.find_admins
+    """
+
+    name: str
+    import_path: str
+    tactics: tuple
+    description: str
+
+    @property
+    def command_path(self):
+        """Return the import path of the module's command in module:function format"""
+
+        return f"{self.import_path}:{self.import_path.rpartition('.')[2]}"
+
+
+# New modules must be added here to be listed by list-modules and shown in the menus of their tactics
+MODULES = (
+    ModuleInfo(
+        "find-admin-groups",
+        "dorothy.modules.discovery.find_admin_groups",
+        ("Discovery",),
+        "Identify Okta groups with admin roles assigned",
+    ),
+    ModuleInfo(
+        "find-admins",
+        "dorothy.modules.discovery.find_admins",
+        ("Discovery",),
+        "Identify Okta users with admin roles assigned",
+    ),
+    ModuleInfo(
+        "find-users-without-mfa",
+        "dorothy.modules.discovery.find_users_without_mfa",
+        ("Discovery",),
+        "Identify Okta users with no MFA factors enrolled",
+    ),
+    ModuleInfo(
+        "get-apps",
+        "dorothy.modules.discovery.get_apps",
+        ("Discovery",),
+        "Harvest information on all Okta applications",
+    ),
+    ModuleInfo(
+        "get-groups",
+        "dorothy.modules.discovery.get_groups",
+        ("Discovery",),
+        "Harvest information on all Okta groups",
+    ),
+    ModuleInfo(
+        "get-policies",
+        "dorothy.modules.discovery.get_policies",
+        ("Discovery",),
+        "Harvest information on all Okta policies and policy rules",
+    ),
+    ModuleInfo(
+        "get-policy",
+        "dorothy.modules.discovery.get_policy",
+        ("Discovery",),
+        "Get an Okta policy and its rules",
+    ),
+    ModuleInfo(
+        "get-user",
+        "dorothy.modules.discovery.get_user",
+        ("Discovery",),
+        "Get an Okta user's profile info and group memberships",
+    ),
+    ModuleInfo(
+        "get-users",
+        "dorothy.modules.discovery.get_users",
+        ("Discovery",),
+        "Harvest information on all Okta users",
+    ),
+    ModuleInfo(
+        "get-zones",
+        "dorothy.modules.discovery.get_zones",
+        ("Discovery",),
+        "Harvest information on all Okta network zones",
+    ),
+    ModuleInfo(
+        "change-app-state",
+        "dorothy.modules.defense_evasion.change_app_state",
+        ("Defense Evasion", "Impact"),
+        "Deactivate or activate an Okta application",
+    ),
+    ModuleInfo(
+        "change-policy-state",
+        "dorothy.modules.defense_evasion.change_policy_state",
+        ("Defense Evasion", "Impact"),
+        "Deactivate or activate an Okta policy",
+    ),
+    ModuleInfo(
+        "change-rule-state",
+        "dorothy.modules.defense_evasion.change_rule_state",
+        ("Defense Evasion", "Impact"),
+        "Deactivate or activate a rule in an Okta policy",
+    ),
+    ModuleInfo(
+        "change-zone-state",
+        "dorothy.modules.defense_evasion.change_zone_state",
+        ("Defense Evasion", "Impact"),
+        "Deactivate or activate an Okta network zone",
+    ),
+    ModuleInfo(
+        "modify-policy",
+        "dorothy.modules.defense_evasion.modify_policy",
+        ("Defense Evasion", "Impact"),
+        "Make a temporary change to an Okta policy",
+    ),
+    ModuleInfo(
+        "modify-policy-rule",
+        "dorothy.modules.defense_evasion.modify_policy_rule",
+        ("Defense Evasion", "Impact"),
+        "Make a temporary change to a rule in an Okta policy",
+    ),
+    ModuleInfo(
+        "modify-zone",
+        "dorothy.modules.defense_evasion.modify_zone",
+        ("Defense Evasion", "Impact"),
+        "Make a temporary change to an Okta network zone",
+    ),
+    ModuleInfo(
+        "change-user-state",
+        "dorothy.modules.persistence.change_user_state",
+        ("Persistence", "Impact"),
+        "Change an Okta user's state by executing lifecycle operations",
+    ),
+    ModuleInfo(
+        "create-admin-group",
+        "dorothy.modules.persistence.create_admin_group",
+        ("Persistence",),
+        "Assign an admin role to an Okta group",
+    ),
+    ModuleInfo(
+        "create-admin-user",
+        "dorothy.modules.persistence.create_admin_user",
+        ("Persistence",),
+        "Assign an admin role to an Okta user",
+    ),
+    ModuleInfo(
+        "create-user",
+        "dorothy.modules.persistence.create_user",
+        ("Persistence",),
+        "Create and activate an Okta user with an assigned password",
+    ),
+    ModuleInfo(
+        "delete-factor",
+        "dorothy.modules.persistence.delete_factor",
+        ("Persistence",),
+        "Remove a MFA factor for a specified Okta user",
+    ),
+    ModuleInfo(
+        "reset-factors",
+        "dorothy.modules.persistence.reset_factors",
+        ("Persistence",),
+        "Reset all MFA factors for an Okta user",
+    ),
+    ModuleInfo(
+        "reset-password",
+        "dorothy.modules.persistence.reset_password",
+        ("Persistence",),
+        "Generate a one-time token to reset a user's password",
+    ),
+    ModuleInfo(
+        "set-recovery-question",
+        "dorothy.modules.persistence.set_recovery_question",
+        ("Persistence",),
+        "Set the recovery question and answer for an Okta user",
+    ),
+)
+
+
+def tactic_commands(tactic):
+    """Return the commands of the modules mapped to a tactic as a mapping of command names to import paths"""
+
+    return {module.name: module.command_path for module in MODULES if tactic in module.tactics}
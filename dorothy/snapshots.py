@@ -0,0 +1,86 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Update the users and groups in the data store with the objects changed since the last harvest
+
+import logging.config
+
+import click
+
+from dorothy.core import index_event
+from dorothy.store import WATERMARK_FIELDS
+
+LOGGER = logging.getLogger(__name__)
+
+
+def high_water_mark(object_type, objects, watermark=None):
+    """Return the latest timestamp of the objects or the previous watermark if it is later"""
+
+    timestamps = [obj[name] for obj in objects for name in WATERMARK_FIELDS[object_type] if obj.get(name)]
+
+    # Okta timestamps use the same ISO 8601 format and time zone, so they can be compared as strings
+    return max(timestamps + [watermark or ""]) or None
+
+
+def harvest_changes(ctx, object_type, harvest_info):
+    """Harvest the users or groups changed since the last harvest and update them in the data store
+
+    Returns the stored objects and the changed objects, or None if the changes couldn't be harvested. Deleted groups
+    aren't returned by Okta, so a full harvest is still needed from time to time to remove them
+    """
+
+    watermark = harvest_info["watermark"]
+
+    msg = f"Attempting to harvest Okta {object_type} changed since {watermark}"
+    LOGGER.info(msg)
+    index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+    click.echo(f"[*] {msg}")
+
+    # Changed objects are saved in the data store as they are harvested
+    if object_type == "users":
+        # Search results include DEPROVISIONED users, unlike a full harvest
+        harvest = ctx.obj.okta.iter_users(ctx, search=f'lastUpdated gt "{watermark}"', mute=False)
+    else:
+        harvest = ctx.obj.okta.iter_groups(
+            ctx, search_filter=f'lastUpdated gt "{watermark}" or lastMembershipUpdated gt "{watermark}"', mute=False
+        )
+
+    changes = list(harvest)
+
+    if harvest.error:
+        return None
+
+    # Remove DEPROVISIONED users, which matches a full harvest where they aren't listed by default
+    removed = [obj["id"] for obj in changes if object_type == "users" and obj.get("status") == "DEPROVISIONED"]
+    ctx.obj.store.delete_objects(object_type, removed)
+
+    # Include the removed objects in the watermark so that they aren't harvested again
+    ctx.obj.store.record_harvest(object_type, high_water_mark(object_type, changes, watermark))
+
+    objects = ctx.obj.store.objects(object_type)
+
+    msg = (
+        f"{len(changes)} {object_type} changed since {watermark} ({len(removed)} removed). "
+        f"Total {object_type} in data store: {len(objects)}"
+    )
+    LOGGER.info(msg)
+    index_event(ctx.obj.es, module=__name__, event_type="INFO", event=msg)
+    click.echo(f"[*] {msg}")
+
+    return objects, changes
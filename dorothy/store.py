@@ -0,0 +1,314 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Store harvested Okta objects and the roles and MFA factors retrieved for them in a local SQLite database
+
+import json
+import logging.config
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+LOGGER = logging.getLogger(__name__)
+
+# Tables for harvested objects and the name of the column used to look up objects by name. E.g. a user's login
+OBJECT_TABLES = {
+    "users": "login",
+    "groups": "name",
+    "apps": "name",
+    "zones": "name",
+    "policies": "name",
+    "rules": "name",
+}
+# Tables for the results retrieved for each user or group
+RESULT_TABLES = ("roles", "factors")
+# Timestamps of the objects that are used as the watermark for incremental harvests
+WATERMARK_FIELDS = {"users": ("lastUpdated",), "groups": ("lastUpdated", "lastMembershipUpdated")}
+# Number of rows read from the database at a time when iterating over objects
+BATCH_SIZE = 500
+# Upserts (INSERT ... ON CONFLICT DO UPDATE) were added in SQLite 3.24.0. Older versions update and insert separately
+UPSERT_SUPPORTED = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+
+def object_name(table, obj):
+    """Return the value of the name column for an Okta object"""
+
+    profile = obj.get("profile") or {}
+
+    if table == "users":
+        return profile.get("login")
+    if table == "groups":
+        return profile.get("name")
+    if table == "apps":
+        return obj.get("label")
+
+    return obj.get("name")
+
+
+class DataStore:
+    """SQLite database of the objects harvested for a configuration profile
+
+    Each object is stored as JSON with separate, indexed columns for its ID, name (the login for users), status and
+    lastUpdated timestamp. The database connection is shared by worker threads, so all access is serialized with a
+    lock
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(file_path), check_same_thread=False)
+        self._lock = threading.RLock()
+
+        self.create_tables()
+
+    @classmethod
+    def for_profile(cls, data_dir, profile_id):
+        """Return the data store of a configuration profile"""
+
+        return cls(data_dir / f"{profile_id}.db")
+
+    def create_tables(self):
+        """Create any missing tables and indexes"""
+
+        with self._lock, self.connection:
+            for table, name_column in OBJECT_TABLES.items():
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, {name_column} TEXT, status TEXT, "
+                    f"last_updated TEXT, watermark TEXT, harvested REAL, data TEXT)"
+                )
+                for column in (name_column, "status", "last_updated"):
+                    self.connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})")
+
+            for table in RESULT_TABLES:
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} (object_id TEXT PRIMARY KEY, last_updated TEXT, cached REAL, "
+                    f"data TEXT)"
+                )
+
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS harvests (object_type TEXT PRIMARY KEY, harvested TEXT, watermark TEXT)"
+            )
+
+    def close(self):
+        """Commit any pending changes and close the database connection"""
+
+        with self._lock:
+            self.connection.commit()
+            self.connection.close()
+
+    # Harvested objects
+
+    def save_objects(self, table, objects):
+        """Insert or update harvested objects"""
+
+        now = time.time()
+        fields = WATERMARK_FIELDS.get(table, ("lastUpdated",))
+        rows = [
+            (
+                obj["id"],
+                object_name(table, obj),
+                obj.get("status"),
+                obj.get("lastUpdated"),
+                max((obj[name] for name in fields if obj.get(name)), default=None),
+                now,
+                json.dumps(obj),
+            )
+            for obj in objects
+        ]
+
+        columns = (OBJECT_TABLES[table], "status", "last_updated", "watermark", "harvested", "data")
+
+        # Update existing rows in place instead of replacing them, which would change their rowid and the order that
+        # iter_objects() returns them in. Checkpoints resume iterations over the data store by position
+        with self._lock, self.connection:
+            if UPSERT_SUPPORTED:
+                updates = ", ".join(f"{column} = excluded.{column}" for column in columns)
+                self.connection.executemany(
+                    f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET {updates}", rows
+                )
+            else:
+                updates = ", ".join(f"{column} = ?" for column in columns)
+                self.connection.executemany(
+                    f"UPDATE {table} SET {updates} WHERE id = ?", [row[1:] + row[:1] for row in rows]
+                )
+                self.connection.executemany(f"INSERT OR IGNORE INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete_objects(self, table, object_ids):
+        """Delete objects. E.g. users that were deprovisioned since the last harvest"""
+
+        with self._lock, self.connection:
+            self.connection.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in object_ids])
+
+    def prune_objects(self, table, harvested_before):
+        """Delete the objects that weren't saved by a full harvest started at harvested_before"""
+
+        with self._lock, self.connection:
+            cursor = self.connection.execute(f"DELETE FROM {table} WHERE harvested < ?", (harvested_before,))
+
+        return cursor.rowcount
+
+    def replace_objects(self, table, objects):
+        """Replace all objects in a table. E.g. with the objects from a full harvest"""
+
+        start = time.time()
+        self.save_objects(table, objects)
+        self.prune_objects(table, start)
+
+    def get_object(self, table, object_id):
+        """Return a stored object or None if it isn't stored"""
+
+        with self._lock:
+            row = self.connection.execute(f"SELECT data FROM {table} WHERE id = ?", (object_id,)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def count_objects(self, table, status=None):
+        """Return the number of stored objects, optionally with a status"""
+
+        query, params = self._where(table, "SELECT COUNT(*) FROM", status)
+
+        with self._lock:
+            return self.connection.execute(query, params).fetchone()[0]
+
+    def iter_objects(self, table, status=None):
+        """Yield stored objects in batches so that large tables aren't read into memory at once"""
+
+        query, params = self._where(table, "SELECT rowid, data FROM", status)
+        last_rowid = 0
+
+        while True:
+            with self._lock:
+                rows = self.connection.execute(
+                    f"{query} {'AND' if status else 'WHERE'} rowid > ? ORDER BY rowid LIMIT ?",
+                    params + (last_rowid, BATCH_SIZE),
+                ).fetchall()
+
+            if not rows:
+                return
+
+            for rowid, data in rows:
+                yield json.loads(data)
+
+            last_rowid = rows[-1][0]
+
+    def objects(self, table, status=None):
+        """Return the stored objects as an iterable with a length, e.g. for a progress bar"""
+
+        return StoredObjects(self, table, status)
+
+    @staticmethod
+    def _where(table, select, status):
+        if status:
+            return f"{select} {table} WHERE status = ?", (status,)
+        return f"{select} {table}", ()
+
+    # Harvests
+
+    def record_harvest(self, table, watermark=None):
+        """Record the time of a full or incremental harvest and the watermark for the next incremental harvest
+
+        The watermark is the latest timestamp of the stored objects or the watermark passed in if it is later
+        """
+
+        with self._lock, self.connection:
+            stored = self.connection.execute(f"SELECT MAX(watermark) FROM {table}").fetchone()[0]
+            # Okta timestamps use the same ISO 8601 format and time zone, so they can be compared as strings
+            watermark = max(stored or "", watermark or "") or None
+            self.connection.execute(
+                "INSERT OR REPLACE INTO harvests VALUES (?, ?, ?)",
+                (table, datetime.now(timezone.utc).isoformat(), watermark),
+            )
+
+        return watermark
+
+    def harvest_info(self, table):
+        """Return the time and watermark of the last harvest of a table and the number of stored objects, or None if
+        it was never harvested"""
+
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT harvested, watermark FROM harvests WHERE object_type = ?", (table,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        return {"harvested": row[0], "watermark": row[1], "count": self.count_objects(table)}
+
+    # Roles and MFA factors
+
+    def get_result(self, table, object_id):
+        """Return the lastUpdated timestamp of the object, the time the result was cached and the result, or None"""
+
+        with self._lock:
+            row = self.connection.execute(
+                f"SELECT last_updated, cached, data FROM {table} WHERE object_id = ?", (object_id,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        return row[0], row[1], json.loads(row[2])
+
+    def put_result(self, table, object_id, last_updated, result):
+        """Store a result for an object. Changes are committed by commit() or the next write to the objects"""
+
+        with self._lock:
+            self.connection.execute(
+                f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?)",
+                (object_id, last_updated, time.time(), json.dumps(result)),
+            )
+
+    def delete_result(self, table, object_id):
+        """Delete the stored result for an object"""
+
+        with self._lock, self.connection:
+            self.connection.execute(f"DELETE FROM {table} WHERE object_id = ?", (object_id,))
+
+    def delete_results(self, table=None, cached_before=None):
+        """Delete all stored results or the results cached before a time"""
+
+        with self._lock, self.connection:
+            for name in (table,) if table else RESULT_TABLES:
+                if cached_before is None:
+                    self.connection.execute(f"DELETE FROM {name}")
+                else:
+                    self.connection.execute(f"DELETE FROM {name} WHERE cached < ?", (cached_before,))
+
+    def commit(self):
+        """Commit pending changes"""
+
+        with self._lock:
+            self.connection.commit()
+
+
+class StoredObjects:
+    """Iterable over the objects stored in a table"""
+
+    def __init__(self, store, table, status=None):
+        self.store = store
+        self.table = table
+        self.status = status
+
+    def __len__(self):
+        return self.store.count_objects(self.table, self.status)
+
+    def __iter__(self):
+        return self.store.iter_objects(self.table, self.status)
@@ -0,0 +1,145 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+# Run per-object checks (e.g. listing a user's roles) in a pool of worker threads
+
+import importlib.util
+import logging.config
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dorothy.core import worker_context
+
+LOGGER = logging.getLogger(__name__)
+
+
+def fan_out(ctx, func, items, max_workers=None):
+    """Call func(ctx, item) for each item and yield (item, result, error) tuples in the same order as the items
+
+    func must return a (result, error) tuple, which is the convention used by functions such as list_assigned_roles.
+    Up to max_workers items are processed concurrently, each worker thread using its own session instance that
+    shares the rate limiter and connection pools of the main session. The first error stops the fan-out and cancels any
+    pending work.
+    """
+
+    if max_workers is None:
+        max_workers = ctx.obj.settings["max_workers"]
+
+    # Process items in the main thread with the main session if parallel execution is disabled
+    if max_workers <= 1:
+        for item in items:
+            result, error = func(ctx, item)
+            yield item, result, error
+            if error:
+                return
+        return
+
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+    stop = threading.Event()
+
+    def thread_context():
+        # Create a session instance the first time each worker thread is used
+        if not hasattr(local, "ctx"):
+            local.ctx = worker_context(ctx)
+
+            with sessions_lock:
+                sessions.append(local.ctx.obj.session)
+
+        return local.ctx
+
+    def run(item):
+        if stop.is_set():
+            return None, True
+        return func(thread_context(), item)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dorothy-worker")
+    # Limit the number of queued items so that large or lazily loaded inputs aren't submitted all at once
+    pending = deque()
+
+    try:
+        for item in items:
+            pending.append((item, executor.submit(run, item)))
+
+            if len(pending) >= max_workers * 2:
+                done_item, future = pending.popleft()
+                result, error = future.result()
+                yield done_item, result, error
+                if error:
+                    return
+
+        while pending:
+            done_item, future = pending.popleft()
+            result, error = future.result()
+            yield done_item, result, error
+            if error:
+                return
+
+    finally:
+        # Cancel the remaining work if the fan-out was stopped early by an error or by the caller
+        stop.set()
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+        for session in sessions:
+            session.close()
+
+
+def async_available(ctx):
+    """Return True if requests can be sent with the asyncio Okta client
+
+    The client requires aiohttp, which is an optional dependency, and doesn't record to or replay from cassettes
+    """
+
+    return importlib.util.find_spec("aiohttp") is not None and ctx.obj.session.cassette is None
+
+
+def fan_out_async(ctx, func, items, max_in_flight=None):
+    """Await func(ctx, client, item) for each item and yield (item, result, error) tuples in the same order as the items
+
+    func is a coroutine function that sends its requests with the asyncio Okta client (see dorothy.async_client) and
+    returns a (result, error) tuple like the functions passed to fan_out(). Up to max_in_flight items are processed
+    concurrently on a single thread. The client shares the rate limiter and request metrics of the main session. The
+    first error stops the fan-out and cancels any pending work.
+    """
+
+    from dorothy.async_client import SyncOktaClient
+
+    if max_in_flight is None:
+        max_in_flight = ctx.obj.settings["max_workers"]
+
+    session = ctx.obj.session
+
+    with SyncOktaClient(
+        ctx.obj.base_url, ctx.obj.api_token, session.rate_limiter, max_in_flight=max_in_flight, metrics=session.metrics
+    ) as client:
+        results = client.imap(lambda item: func(ctx, client.client, item), items)
+
+        try:
+            for item, (result, error) in results:
+                yield item, result, error
+                if error:
+                    return
+
+        finally:
+            # Cancel the pending coroutines before the client's event loop is closed
+            results.close()
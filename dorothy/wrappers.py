@@ -17,10 +17,14 @@
 # under the License.
 #
 
+from importlib import import_module
+
 import click
 from click_shell import Shell
 from click_shell.core import ClickShell
 
+from dorothy import metrics, profiling
+
 
 PROMPT_STACK = []
 HELP_ARGS = {"cmdlen": 15, "maxcol": 80}
@@ -103,10 +107,19 @@ class ClickSubShell(ClickShell):
         ClickSubShell.pending_main = False
         ClickSubShell.pending_exit = False
 
+        # Collect request metrics for each module execution and profile it if profiling is enabled
+        if line.split()[:1] == ["execute"]:
+            metrics.start_execution(self.ctx, self.ctx.command.name)
+            profiling.start_execution(self.ctx.command.name)
+
         return ClickShell.precmd(self, line)
 
     def postcmd(self, stop: bool, line: str) -> bool:
         """Execute a single command and return whether the loop should exit."""
+        if line.split()[:1] == ["execute"]:
+            profiling.finish_execution()
+            metrics.finish_execution(self.ctx)
+
         return ClickShell.postcmd(self, stop, line) or ClickSubShell.pending_main or ClickSubShell.pending_exit
 
     def show_navigation_commands(self):
@@ -120,8 +133,24 @@ class ClickSubShell(ClickShell):
         commands = sorted(group.list_commands(self.ctx))
         self.print_topics(f"Module Commands", commands, **HELP_ARGS)
 
+    def default(self, line):
+        """Import a command that hasn't been used yet and run it, or report that the command wasn't found."""
+        name = self.parseline(line)[0]
+        if name and self.ctx.command.load_command(name):
+            return self.onecmd(line)
+
+        return ClickShell.default(self, line)
+
+    def get_names(self):
+        """Include the commands that haven't been imported yet so that they can be completed."""
+        names = ClickShell.get_names(self)
+        return names + [f"do_{name}" for name in self.ctx.command.lazy_commands if f"do_{name}" not in names]
+
     def do_help(self, arg):
         """Override the help method to be aware of global and local commands."""
+        if arg and arg.strip():
+            self.ctx.command.load_command(arg.strip())
+
         if not (arg and arg.strip()):
             click.echo()
             click.secho(self.ctx.command.name)
@@ -140,33 +169,95 @@ class ClickSubShell(ClickShell):
 
 
 class CustomShell(Shell):
-    def __init__(self, shell_cls, **kwargs):
+    def __init__(self, shell_cls, prompt=None, intro=None, hist_file=None, on_finished=None, **kwargs):
         self.kwargs = dict(kwargs)
-        self.shell_cls = kwargs
+        self.shell_cls = shell_cls
         self.parent = kwargs.pop("parent", None)
 
-        super(CustomShell, self).__init__(**kwargs)
+        # Commands that are imported the first time they are used. Maps command names to module:function paths
+        self.lazy_commands = {}
 
-        # re-cast the click shell as a ClickSubShell so all of the new methods are in scope
-        self.shell.__class__ = shell_cls
-        self.shell.prompt = (self.parent.shell.prompt if self.parent else "") + self.name + " > "
+        # The click shell is built the first time the group is invoked. See the shell property. The prompt argument
+        # is ignored because the prompt is built from the names of the parent shells
+        self._shell = None
+        self._shell_args = {"intro": intro, "hist_file": hist_file, "on_finished": on_finished}
 
-        # inherit all commands from the root scope
-        self.inherit_root_commands()
+        # Skip Shell.__init__, which builds the click shell straight away
+        kwargs["invoke_without_command"] = True
+        click.Group.__init__(self, **kwargs)
 
-    def inherit_root_commands(self, ctx=None):
-        """Inherit commands from the root scope."""
+        # The shell inherits the commands registered in the root scope so far, not the menus registered after it
+        self.root_commands = self.find_root().list_commands(None)
+
+    @property
+    def shell(self):
+        """Build the click shell and its command table the first time it's used and cache it."""
+        if self._shell is None:
+            shell = ClickShell(hist_file=self._shell_args["hist_file"], on_finished=self._shell_args["on_finished"])
+            shell.intro = self._shell_args["intro"]
+
+            # re-cast the click shell as a ClickSubShell so all of the new methods are in scope
+            shell.__class__ = self.shell_cls
+            shell.prompt = (self.parent.shell.prompt if self.parent else "") + self.name + " > "
+            self._shell = shell
+
+            # inherit all commands from the root scope, then add the group's own commands
+            self.inherit_root_commands()
+
+            for name, command in self.commands.items():
+                shell.add_command(command, name)
+
+        return self._shell
+
+    def add_command(self, cmd, name=None):
+        click.Group.add_command(self, cmd, name)
+
+        # Commands added after the click shell was built are added to it as well
+        if self._shell is not None:
+            self._shell.add_command(cmd, name or cmd.name)
+
+    def find_root(self):
+        """Return the group of the root scope."""
         root = self
 
         while root.parent is not None:
             root = root.parent
 
-        if root is not None:
-            for name in root.list_commands(ctx):
-                command = root.get_command(ctx, name)
-                self.shell.add_command(command, command.name)
+        return root
+
+    def inherit_root_commands(self, ctx=None):
+        """Inherit the commands that were registered in the root scope when the group was created."""
+        root = self.find_root()
+
+        for name in self.root_commands:
+            command = root.get_command(ctx, name)
+            self.shell.add_command(command, command.name)
+
+        self.shell.root = root.shell
+
+    def add_lazy_commands(self, commands):
+        """Add commands that are only imported when they are first used, e.g. when a user enters a module."""
+        self.lazy_commands.update(commands)
+
+    def load_command(self, name):
+        """Import a lazily added command and add it to the group. Returns the command or None if it's unknown."""
+        if name in self.commands:
+            return self.commands[name]
+
+        if name not in self.lazy_commands:
+            return None
+
+        module_name, function = self.lazy_commands[name].split(":")
+        command = getattr(import_module(module_name), function)
+        self.add_command(command, name)
+
+        return command
+
+    def list_commands(self, ctx):
+        return sorted(set(self.commands) | set(self.lazy_commands))
 
-        self.shell.root = root and root.shell
+    def get_command(self, ctx, name):
+        return self.load_command(name)
 
     def subshell(self, *args, **kwargs):
         """Create a new decorator, like click.group that also creates a shell."""
@@ -55,9 +55,16 @@ setup(
     packages=find_namespace_packages(include=["dorothy*"]),
     include_package_data=True,
     install_requires=open("requirements.txt", "r").read(),
+    extras_require={
+        # Optional dependency for the asyncio Okta client (dorothy.async_client), e.g. used by find-users-without-mfa
+        "async": ["aiohttp>=3.7"],
+        # Optional dependency for zstd compression of saved data (dorothy.core.write_json_file)
+        "zstd": ["zstandard"],
+    },
     entry_points={
         "console_scripts": [
             "dorothy=dorothy.main:dorothy_shell",  # this registers a command line tool "dorothy"
+            "dorothy-daemon=dorothy.daemon:cli",  # optional daemon that keeps Dorothy set up between commands
         ],
     },
 )
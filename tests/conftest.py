@@ -0,0 +1,115 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Fixtures shared by Dorothy's tests
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+from dorothy.cache import ResultCache
+from dorothy.config import load_settings
+from dorothy.core import OktaOrg, setup_session_instance
+from dorothy.main import ADMIN_ROLES, POLICY_TYPES, ROOT_DIR, Dorothy
+from dorothy.store import DataStore
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent.parent / "benchmarks"
+
+
+@pytest.fixture
+def config_dir(tmp_path):
+    path = tmp_path / "config"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    return tmp_path / "data"
+
+
+@pytest.fixture
+def write_profile(config_dir):
+    """Write a configuration profile with a stored API token to the config directory and return it"""
+
+    def write(profile_id, okta_url=None):
+        config = {
+            "id": profile_id,
+            "description": f"Profile {profile_id}",
+            "okta_url": okta_url or f"https://{profile_id}.okta.example/api/v1",
+            "api_token": f"token-{profile_id}",
+        }
+        with open(config_dir / f"{profile_id}.json", "w") as f:
+            json.dump(config, f)
+        return config
+
+    return write
+
+
+@pytest.fixture
+def make_dorothy(config_dir, data_dir):
+    """Create the object that is passed to Dorothy's commands for a configuration profile"""
+
+    def make(config, es=None):
+        settings = load_settings(config)
+        store = DataStore.for_profile(data_dir, config["id"])
+
+        return Dorothy(
+            okta=OktaOrg(config["api_token"], config["okta_url"]),
+            base_url=config["okta_url"],
+            api_token=config["api_token"],
+            root_dir=ROOT_DIR,
+            data_dir=data_dir,
+            config_dir=config_dir,
+            admin_roles=ADMIN_ROLES,
+            policy_types=POLICY_TYPES,
+            profile_id=config["id"],
+            session=setup_session_instance(config["okta_url"], max_workers=settings["max_workers"]),
+            settings=settings,
+            store=store,
+            cache=ResultCache(store, max_age=settings["cache_max_age"]),
+            es=es,
+        )
+
+    return make
+
+
+@pytest.fixture
+def okta_simulator():
+    """Start simulated Okta orgs, which are stopped after the test. See benchmarks/okta_simulator.py"""
+
+    sys.path.insert(0, str(BENCHMARKS_DIR))
+    from okta_simulator import OktaSimulator, SyntheticOrg
+
+    simulators = []
+
+    def start(users=10):
+        simulator = OktaSimulator(SyntheticOrg(users=users, groups=5))
+        simulator.start()
+        simulators.append(simulator)
+        return simulator
+
+    yield start
+
+    for simulator in simulators:
+        simulator.stop()
+    sys.path.remove(str(BENCHMARKS_DIR))
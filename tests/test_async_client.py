@@ -0,0 +1,120 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Tests for retrying requests sent with the asyncio Okta client
+
+import asyncio
+import socket
+from types import SimpleNamespace
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+
+import dorothy.async_client as async_client  # noqa: E402
+from dorothy.async_client import AsyncOktaClient  # noqa: E402
+from dorothy.modules.discovery.find_users_without_mfa import list_user_factors_async  # noqa: E402
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 2\r\nConnection: close\r\n\r\n[]"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(async_client, "backoff_wait", lambda retries: 0)
+
+
+async def flaky_server(disconnects):
+    """Start a server that closes the first connections without responding. Returns the server and the request count"""
+
+    requests = []
+
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        requests.append(1)
+        if len(requests) > disconnects:
+            writer.write(RESPONSE)
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, requests
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_retry_after_disconnect():
+    async def run():
+        server, requests = await flaky_server(disconnects=2)
+        port = server.sockets[0].getsockname()[1]
+
+        async with server, AsyncOktaClient(f"http://127.0.0.1:{port}/api/v1", "token") as client:
+            data, _ = await client.request("GET", "/users")
+
+        return data, requests, client.metrics.session.endpoints["GET /api/v1/users"]
+
+    data, requests, metrics = asyncio.run(run())
+
+    assert data == []
+    assert len(requests) == 3
+    # aiohttp can also retry a request itself when a reused connection was closed, without an attempt being recorded
+    assert metrics.failed >= 1
+    assert metrics.requests == metrics.failed + 1
+
+
+def test_disconnect_not_retried_for_post():
+    async def run():
+        server, requests = await flaky_server(disconnects=1)
+        port = server.sockets[0].getsockname()[1]
+
+        async with server, AsyncOktaClient(f"http://127.0.0.1:{port}/api/v1", "token") as client:
+            with pytest.raises(aiohttp.ClientConnectionError):
+                await client.request("POST", "/users/00u1/lifecycle/suspend", payload={})
+
+        return requests
+
+    assert len(asyncio.run(run())) == 1
+
+
+def test_connect_error_retried_until_exhausted():
+    async def run():
+        async with AsyncOktaClient(f"http://127.0.0.1:{closed_port()}/api/v1", "token") as client:
+            with pytest.raises(aiohttp.ClientConnectorError):
+                await client.request("POST", "/users/00u1/lifecycle/suspend", payload={})
+
+        return client.metrics.session
+
+    metrics = asyncio.run(run())
+
+    assert metrics.requests == async_client.MAX_RETRIES + 1
+
+
+def test_list_user_factors_async_is_cancellable():
+    class Client:
+        async def list_factors(self, user_id):
+            raise asyncio.CancelledError
+
+    ctx = SimpleNamespace(obj=SimpleNamespace(cache=SimpleNamespace(get=lambda kind, obj: None), es=None))
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(list_user_factors_async(ctx, Client(), {"id": "00u1"}))
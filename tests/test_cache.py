@@ -0,0 +1,68 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Tests for the result cache of roles and MFA factors
+
+from types import SimpleNamespace
+
+from dorothy.cache import ResultCache
+from dorothy.core import assign_admin_role
+
+USER = {"id": "00u1", "lastUpdated": "2024-01-01T00:00:00.000Z"}
+GROUP = {"id": "00g1", "lastUpdated": "2024-01-01T00:00:00.000Z"}
+
+
+def test_cache_is_disabled_by_default(data_dir, write_profile, make_dorothy):
+    obj = make_dorothy(write_profile("a"))
+
+    obj.cache.put("roles", USER, [])
+    assert obj.cache.get("roles", USER) is None
+    assert obj.store.get_result("roles", USER["id"]) is None
+
+
+def test_assign_role_to_group_clears_cached_roles(data_dir, write_profile, make_dorothy, okta_simulator):
+    simulator = okta_simulator()
+    obj = make_dorothy(write_profile("a", okta_url=f"{simulator.base_url}/api/v1"))
+    obj.cache = ResultCache(obj.store, max_age=24)
+
+    obj.cache.put("roles", USER, [])
+    obj.cache.put("roles", GROUP, [])
+    obj.cache.put("factors", USER, [])
+
+    # The user's cached roles are stale once a group they are a member of is assigned a role
+    assign_admin_role(SimpleNamespace(obj=obj), GROUP["id"], "SUPER_ADMIN", "group")
+
+    assert obj.cache.get("roles", USER) is None
+    assert obj.cache.get("roles", GROUP) is None
+    assert obj.cache.get("factors", USER) == []
+
+
+def test_assign_role_to_user_invalidates_only_the_user(data_dir, write_profile, make_dorothy, okta_simulator):
+    simulator = okta_simulator()
+    obj = make_dorothy(write_profile("a", okta_url=f"{simulator.base_url}/api/v1"))
+    obj.cache = ResultCache(obj.store, max_age=24)
+
+    obj.cache.put("roles", USER, [])
+    obj.cache.put("roles", GROUP, [])
+
+    assign_admin_role(SimpleNamespace(obj=obj), USER["id"], "SUPER_ADMIN", "user")
+
+    assert obj.cache.get("roles", USER) is None
+    assert obj.cache.get("roles", GROUP) == []
@@ -0,0 +1,85 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Tests for saving and resuming the checkpoints of long-running checks
+
+import json
+from types import SimpleNamespace
+
+from dorothy.checkpoint import Checkpoint
+
+USERS = [{"id": f"00u{i}"} for i in range(10)]
+
+
+def context(data_dir):
+    store = SimpleNamespace(objects=lambda table: USERS)
+    return SimpleNamespace(obj=SimpleNamespace(data_dir=data_dir, profile_id="a", store=store))
+
+
+def test_results_are_appended(data_dir):
+    ctx = context(data_dir)
+    checkpoint = Checkpoint.start(ctx, "find_admins", {"type": "objects", "objects": USERS}, USERS)
+
+    for user in USERS[:4]:
+        checkpoint.advance(user)
+        checkpoint.save()
+
+    # Only the position is written to the checkpoint file. The results and objects are written once
+    with open(checkpoint.file_path, "r") as f:
+        saved = json.load(f)
+    assert saved["source"] == {"type": "objects"}
+    assert "results" not in saved
+    with open(checkpoint.results_path, "r") as f:
+        assert [json.loads(line) for line in f] == USERS[:4]
+
+    loaded = Checkpoint.load(ctx, "find_admins")
+    assert loaded.processed == 4
+    assert loaded.results == USERS[:4]
+    assert list(loaded.objects) == USERS[4:]
+
+    for user in loaded.objects:
+        loaded.advance(user)
+    loaded.save()
+
+    assert Checkpoint.load(ctx, "find_admins").results == USERS
+
+    loaded.delete()
+    assert not any(data_dir.iterdir())
+
+
+def test_results_of_interrupted_save_are_ignored(data_dir):
+    ctx = context(data_dir)
+    checkpoint = Checkpoint.start(ctx, "find_admins", {"type": "store", "table": "users"}, USERS)
+
+    checkpoint.advance(USERS[0])
+    checkpoint.save()
+
+    # E.g. Dorothy was killed after appending the results but before the checkpoint file was replaced
+    with open(checkpoint.results_path, "a") as f:
+        f.write(json.dumps(USERS[1]) + "\n")
+
+    loaded = Checkpoint.load(ctx, "find_admins")
+    assert loaded.results == USERS[:1]
+
+    loaded.advance(USERS[2])
+    loaded.save()
+
+    with open(checkpoint.results_path, "r") as f:
+        assert [json.loads(line) for line in f] == [USERS[0], USERS[2]]
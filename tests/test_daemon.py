@@ -0,0 +1,59 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Tests for running commands for more than one configuration profile in the Dorothy daemon
+
+import dorothy.main
+from dorothy.daemon import DorothyDaemon
+
+
+def test_interleaved_profiles(monkeypatch, tmp_path, config_dir, data_dir, write_profile, okta_simulator, capsys):
+    monkeypatch.setattr(dorothy.main, "CONFIG_DIR", config_dir)
+    monkeypatch.setattr(dorothy.main, "DATA_DIR", data_dir)
+
+    simulators = {"a": okta_simulator(), "b": okta_simulator()}
+    for profile_id, simulator in simulators.items():
+        write_profile(profile_id, okta_url=f"{simulator.base_url}/api/v1")
+
+    daemon = DorothyDaemon(socket_path=tmp_path / "dorothy.sock")
+    requests = {"a": 0, "b": 0}
+
+    for profile_id in ["a", "b", "a", "b"]:
+        obj, error = daemon.profile(profile_id)
+        assert error is None
+
+        assert daemon.invoke(obj, ["whoami"]) == 0
+        requests[profile_id] = simulators[profile_id].requests
+        # Each command only sends requests to the Okta org of its own profile
+        assert {p: s.requests for p, s in simulators.items()} == requests
+
+        capsys.readouterr()
+        assert daemon.invoke(obj, ["manage-config", "show-current"]) == 0
+        assert simulators[profile_id].base_url in capsys.readouterr().out
+
+        # A command that switches profiles would change the profile of the next command run for this one
+        assert daemon.invoke(obj, ["manage-config", "load-profile"]) == 0
+        assert "can't be created, loaded or deleted" in capsys.readouterr().out
+        assert obj.profile_id == profile_id
+        assert obj.base_url == f"{simulators[profile_id].base_url}/api/v1"
+        assert obj.store.file_path.name == f"{profile_id}.db"
+
+    assert all(simulator.requests for simulator in simulators.values())
+    daemon.close()
@@ -0,0 +1,60 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Tests for switching configuration profiles with the manage-config commands
+
+from click.testing import CliRunner
+
+from dorothy.modules.manage_config import load_profile
+
+
+class FakeIndexer:
+    """Stand-in for the bulk indexer that records whether it was closed"""
+
+    def __init__(self):
+        self.closed = False
+
+    def add(self, doc_id, doc):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_load_profile_switches_profile(write_profile, make_dorothy):
+    obj = make_dorothy(write_profile("a"), es=FakeIndexer())
+    old_indexer, old_session = obj.es, obj.session
+    config = write_profile("b")
+    (obj.config_dir / "a.json").unlink()
+
+    # Choose the only profile and don't index logs in Elasticsearch
+    result = CliRunner().invoke(load_profile, input="1\nn\n", obj=obj)
+
+    assert result.exception is None, result.output
+    assert obj.profile_id == "b"
+    assert obj.base_url == obj.okta.base_url == config["okta_url"]
+    assert obj.api_token == obj.okta.api_token == config["api_token"]
+    assert obj.store.file_path.name == "b.db"
+    # The indexer of the previous profile is flushed and replaced
+    assert old_indexer.closed
+    assert obj.es is None
+    # The new tenant gets its own session instance with the retrying adapter mounted on its host
+    assert obj.session is not old_session
+    assert obj.session.get_adapter("https://b.okta.example/api/v1/users").max_retries.total == 3
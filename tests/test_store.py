@@ -0,0 +1,43 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Tests for storing harvested Okta objects in the data store
+
+import pytest
+
+import dorothy.store
+from dorothy.store import DataStore
+
+
+@pytest.mark.parametrize("upsert", [True, False])
+def test_save_objects_keeps_rowid(monkeypatch, data_dir, upsert):
+    monkeypatch.setattr(dorothy.store, "UPSERT_SUPPORTED", upsert)
+    store = DataStore.for_profile(data_dir, "a")
+
+    users = [{"id": f"00u{i}", "status": "ACTIVE", "profile": {"login": f"user{i}@example.com"}} for i in range(3)]
+    store.save_objects("users", users)
+
+    # Updating an object doesn't move it to the end of the table, so checkpoints can resume by position
+    updated = dict(users[0], status="SUSPENDED")
+    store.save_objects("users", [updated, {"id": "00u3", "status": "ACTIVE"}])
+
+    assert [user["id"] for user in store.iter_objects("users")] == ["00u0", "00u1", "00u2", "00u3"]
+    assert store.get_object("users", "00u0") == updated
+    assert store.count_objects("users") == 4
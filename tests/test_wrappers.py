@@ -0,0 +1,91 @@
+#
+# Licensed to Elasticsearch under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+#
+
+
+# Tests for the commands available in Dorothy's shell and its module menus
+
+from types import SimpleNamespace
+
+import pytest
+from click.testing import CliRunner
+from click_shell.core import ClickShell
+
+from dorothy.main import dorothy_shell
+
+GLOBAL_COMMANDS = ["clear", "exit", "help", "list-modules", "profile", "quit", "stats", "whoami"]
+NAVIGATION_COMMANDS = ["back", "main"]
+
+# Each menu inherits the commands of the main menu that were registered before it, including earlier menus
+SHELL_COMMANDS = {
+    "defense-evasion": [],
+    "discovery": ["defense-evasion"],
+    "impact": ["defense-evasion", "discovery"],
+    "manage-config": [
+        "change-setting",
+        "clear-cache",
+        "create-new-profile",
+        "defense-evasion",
+        "delete-profile",
+        "discovery",
+        "impact",
+        "load-profile",
+        "persistence",
+        "show-current",
+        "show-settings",
+    ],
+    "persistence": ["defense-evasion", "discovery", "impact"],
+}
+
+
+def shell_commands(group):
+    """Return the commands of a menu's shell, leaving out module commands that are imported when they're first used"""
+
+    names = [name[3:] for name in ClickShell.get_names(group.shell) if name.startswith("do_")]
+    return sorted(name for name in names if name not in group.lazy_commands)
+
+
+def help_commands(args):
+    result = CliRunner().invoke(dorothy_shell, args + ["--help"], obj=SimpleNamespace(es=None))
+    commands = result.output.split("Commands:\n")[1]
+    return [line.split()[0] for line in commands.splitlines() if line.strip()]
+
+
+def test_main_menu_commands():
+    assert shell_commands(dorothy_shell) == sorted(GLOBAL_COMMANDS + list(SHELL_COMMANDS))
+    assert help_commands([]) == sorted(set(GLOBAL_COMMANDS) - {"exit", "help", "quit"} | set(SHELL_COMMANDS))
+
+
+@pytest.mark.parametrize("name", sorted(SHELL_COMMANDS))
+def test_menu_commands(name):
+    assert shell_commands(dorothy_shell.commands[name]) == sorted(
+        GLOBAL_COMMANDS + NAVIGATION_COMMANDS + SHELL_COMMANDS[name]
+    )
+
+
+def test_menu_help_lists_module_commands():
+    assert help_commands(["manage-config"]) == [
+        "change-setting",
+        "clear-cache",
+        "create-new-profile",
+        "delete-profile",
+        "load-profile",
+        "show-current",
+        "show-settings",
+    ]
+    assert "find-admins" in help_commands(["discovery"])